@@ -47,9 +47,6 @@ vector_stack = VectorStoreStack(app, "VectorStoreStack")
 eks_stack = EKSStack(app, "EKSStack")
 cloudfront_stack = CloudFrontStack(app, "CloudFrontStack")
 
-# Server deployment
-eks_server_stack = EKSServerStack(app, "EKSServerStack")
-
 # File Upload Process
 file_upload_stack = FileUploadStack(app, "FileUploadStack")
 
@@ -57,17 +54,30 @@ file_upload_stack = FileUploadStack(app, "FileUploadStack")
 file_chat_stack = FileChatStack(app, "FileChatStack")
 
 # Create OpenSearch Vector Store Stack
+# Only scanned, clean files (promoted to the final bucket) are ingested
 opensearch_stack = OpenSearchStack(app, "OpenSearchStack",
-    upload_bucket=file_upload_stack.upload_bucket,                         
+    upload_bucket=file_upload_stack.final_bucket,
 )
 # Create Bedrock Knowledge Base (needs bucket + OpenSearch)
 bedrock_kb_stack = BedrockKnowledgeBaseStack(app, "KnowledgeBaseStack",
-    upload_bucket=file_upload_stack.upload_bucket,
+    upload_bucket=file_upload_stack.final_bucket,
     collection_arn=opensearch_stack.collection.attr_arn,
     bedrock_role_arn=opensearch_stack.bedrock_role.role_arn,
     vector_index_name=opensearch_stack.vector_index_name
 )
 
+# Server deployment
+eks_server_stack = EKSServerStack(app, "EKSServerStack",
+    vpc=eks_stack.vpc,
+    cluster=eks_stack.cluster,
+    document_metadata_table=file_upload_stack.document_metadata_table,
+    chat_message_table=file_chat_stack.chat_message_table,
+    answer_cache_table=file_chat_stack.answer_cache_table,
+    upload_bucket=file_upload_stack.upload_bucket,
+    knowledge_base_id=bedrock_kb_stack.knowledge_base_id,
+    knowledge_base_arn=bedrock_kb_stack.knowledge_base_arn
+)
+
 # AppSync API for users to talk with documents
 appsync_stack = AppSyncStack(app, "AppSyncStack",
     user_pool=cognito_stack.user_pool,
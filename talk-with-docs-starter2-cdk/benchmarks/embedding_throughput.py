@@ -0,0 +1,100 @@
+# benchmarks/embedding_throughput.py
+# Ingestion embedding throughput: sequential (concurrency 1, the previous
+# behaviour) vs. the bounded thread pool in `EmbeddingCache.embed_iter`.
+#
+# The fake embedder sleeps --embed-ms per call and throttles like Bedrock:
+# once more than --quota calls are in flight, the extra calls raise
+# ThrottlingException and go through `retry_throttled`. Upserts are counted,
+# not sent.
+#
+# Usage (from talk-with-docs-starter2-cdk/):
+#   python -m benchmarks.embedding_throughput --chunks 2000 --embed-ms 40 --quota 16
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from utils.embedding_cache import EmbeddingCache, retry_throttled  # noqa: E402
+
+
+class FakeEmbedder:
+    def __init__(self, embed_ms: float, quota: int, dims: int):
+        self.delay = embed_ms / 1000
+        self.quota = quota
+        self.dims = dims
+        self.in_flight = 0
+        self.calls = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str):
+        with self._lock:
+            self.calls += 1
+            if self.in_flight >= self.quota:
+                self.throttled += 1
+                raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}},
+                                  "InvokeModel")
+            self.in_flight += 1
+        try:
+            time.sleep(self.delay)
+            return [float(len(text) % 7)] * self.dims
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def run(concurrency: int, args) -> dict:
+    fake = FakeEmbedder(args.embed_ms, args.quota, args.dims)
+    cache = EmbeddingCache("bench", retry_throttled(fake, max_retries=args.max_retries,
+                                                   base_delay=args.embed_ms / 1000))
+    chunks = [f"chunk {i} " + "lorem ipsum " * 50 for i in range(args.chunks)]
+
+    upserts = 0
+    first_upsert = None
+    batch = []
+    start = time.perf_counter()
+    for i, values in cache.embed_iter(chunks, concurrency=concurrency):
+        batch.append({"id": f"doc-{i}", "values": values})
+        if len(batch) >= args.batch:
+            upserts += 1
+            first_upsert = first_upsert or time.perf_counter() - start
+            batch = []
+    if batch:
+        upserts += 1
+        first_upsert = first_upsert or time.perf_counter() - start
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "chunks_per_sec": round(args.chunks / elapsed, 1),
+        "first_upsert_ms": round(first_upsert * 1000, 1),
+        "upserts": upserts,
+        "calls": fake.calls,
+        "throttled": fake.throttled,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput: sequential vs. bounded thread pool")
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--embed-ms", type=float, default=40, help="latency of one embedding call")
+    parser.add_argument("--quota", type=int, default=16, help="concurrent calls allowed before throttling")
+    parser.add_argument("--max-retries", type=int, default=10, help="retries per throttled call")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--batch", type=int, default=100, help="vectors per upsert")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    for concurrency in args.concurrency:
+        result = run(concurrency, args)
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# benchmarks/guardduty_findings.py
+# GuardDuty findings throughput: one invocation per EventBridge event with a
+# single update (previous trigger) vs. SQS batches with parallel conditional
+# updates (lambda/guardduty_findings/handler.py).
+#
+# DynamoDB is an in-memory stand-in that sleeps --ddb-ms per UpdateItem and
+# evaluates the handler's idempotency condition. Per-invocation overhead
+# (--invoke-ms) models the Lambda round trip each direct event pays. A
+# fraction of findings (--duplicates) is redelivered to exercise idempotency.
+#
+# Usage (from talk-with-docs-starter2-cdk/):
+#   python -m benchmarks.guardduty_findings --findings 2000 --ddb-ms 8 --invoke-ms 20
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+os.environ.setdefault("DDB_TABLE", "DocumentMetadata")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # one line per batch otherwise
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from guardduty_findings import handler  # noqa: E402
+
+
+class LocalDynamoDB:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.items = {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def update_item(self, TableName, Key, UpdateExpression, ConditionExpression, ExpressionAttributeValues):
+        time.sleep(self.latency)
+        document_id = Key["document_id"]["S"]
+        finding = ExpressionAttributeValues[":f"]["S"]
+        updated_at = ExpressionAttributeValues[":t"]["S"]
+        with self._lock:
+            self.calls += 1
+            item = self.items.get(document_id, {})
+            if "scan_finding_id" in item and (item["scan_finding_id"] == finding
+                                              or item["scan_updated_at"] > updated_at):
+                raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "UpdateItem")
+            self.items[document_id] = {
+                "scan_status": ExpressionAttributeValues[":s"]["S"],
+                "scan_finding_id": finding,
+                "scan_updated_at": updated_at,
+            }
+
+
+def finding_event(i: int) -> dict:
+    return {
+        "id": f"event-{i}",
+        "detail": {
+            "id": f"finding-{i}",
+            "updatedAt": f"2025-06-01T00:00:{i % 60:02d}.{i:06d}Z",
+            "resource": {"resourceDetails": {"s3Bucket": {"objectKey": f"user/doc-{i}/file.pdf"}}},
+            "service": {"additionalInfo": {"malwareProtection": {
+                "scanResultDetails": {"scanResult": "NO_THREATS_FOUND"}}}},
+        },
+    }
+
+
+def workload(args):
+    rng = random.Random(7)
+    events = [finding_event(i) for i in range(args.findings)]
+    events += [events[i] for i in rng.sample(range(args.findings), int(args.findings * args.duplicates))]
+    rng.shuffle(events)
+    return events
+
+
+def run_direct(events, args) -> dict:
+    handler.dynamodb = LocalDynamoDB(args.ddb_ms)
+    start = time.perf_counter()
+    for event in events:
+        time.sleep(args.invoke_ms / 1000)
+        handler.main(event, None)
+    elapsed = time.perf_counter() - start
+    return {"mode": "direct", "invocations": len(events), "seconds": round(elapsed, 2),
+            "findings_per_sec": round(len(events) / elapsed, 1), "ddb_calls": handler.dynamodb.calls}
+
+
+def run_batched(events, args) -> dict:
+    handler.dynamodb = LocalDynamoDB(args.ddb_ms)
+    handler.UPDATE_CONCURRENCY = args.concurrency
+    invocations = 0
+    failures = 0
+    start = time.perf_counter()
+    for i in range(0, len(events), args.batch):
+        records = [{"messageId": f"m-{i + j}", "body": json.dumps(e)}
+                   for j, e in enumerate(events[i:i + args.batch])]
+        time.sleep(args.invoke_ms / 1000)
+        failures += len(handler.process_batch(records)["batchItemFailures"])
+        invocations += 1
+    elapsed = time.perf_counter() - start
+    return {"mode": "batched", "invocations": invocations, "seconds": round(elapsed, 2),
+            "findings_per_sec": round(len(events) / elapsed, 1), "ddb_calls": handler.dynamodb.calls,
+            "failures": failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GuardDuty findings: direct vs. SQS-batched processing")
+    parser.add_argument("--findings", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.05, help="fraction redelivered")
+    parser.add_argument("--ddb-ms", type=float, default=8, help="UpdateItem latency")
+    parser.add_argument("--invoke-ms", type=float, default=20, help="per-invocation overhead")
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    events = workload(args)
+    for run in (run_direct, run_batched):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            result = run(events, args)  # the handler logs one line per batch
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
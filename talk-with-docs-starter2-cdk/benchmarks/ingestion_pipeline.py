@@ -0,0 +1,445 @@
+# benchmarks/ingestion_pipeline.py
+# End-to-end ingestion throughput: `upload_vectorize_handler.ingest` (extract
+# -> chunk -> embed -> upsert) over a corpus of synthetic PDFs (--documents x
+# --pages) and/or real files (--pdf, files or directories).
+#
+# The handler itself runs; its module globals are pointed at local fakes:
+#   - S3: ranged GETs taking --s3-ms plus the part's size at --s3-mbps
+#   - docs table (chunk manifests, status): --ddb-ms per call
+#   - embeddings: --embed-ms per call (+/- --embed-jitter), --dims floats
+#   - vector store: --upsert-ms per batch plus --upsert-vector-us per vector
+# and the utils it calls (iter_object/open_object, iter_pages, iter_chunks,
+# chunk_digest, EmbeddingCache.embed_iter, VectorUpserter) are wrapped to time
+# each stage. PDFs are read through open_object, so their `download` is the
+# time page extraction waited for byte ranges.
+#
+# One line per (--concurrency, --chunk-chars) combination: pages/sec,
+# chunks/sec, peak RSS (and its growth over the run), and where the ingesting
+# thread spent its time. Stages overlap (S3 prefetch, embedding and upsert
+# threads), so a stage's time is how long the pipeline waited on it, and the
+# stages (plus `other`: manifest and status writes, vector metadata) add up
+# to the wall time. Memory the allocator kept from an earlier
+# configuration counts towards later ones; for clean RSS numbers run one
+# combination per process.
+#
+# Needs the Lambda's own dependencies: pip install -r benchmarks/requirements.txt
+#
+# Usage (from talk-with-docs-starter2-cdk/):
+#   python -m benchmarks.ingestion_pipeline --documents 20 --pages 30 --concurrency 1 8 16
+#   python -m benchmarks.ingestion_pipeline --documents 0 --pdf ~/papers --chunk-chars 1000 4000
+import argparse
+import gc
+import io
+import os
+import random
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+os.environ.setdefault("TABLE_NAME", "docs")
+os.environ.setdefault("PINECONE_SECRET_NAME", "bench/pinecone")
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("LOG_LEVEL", "WARNING")  # one line per document otherwise
+
+try:
+    import upload_vectorize_handler as handler
+except ImportError as e:
+    raise SystemExit(f"{e}: pip install -r benchmarks/requirements.txt")
+from utils.chunk_manifest import chunk_digest  # noqa: E402
+from utils.embedding_cache import EmbeddingCache  # noqa: E402
+from utils.s3_stream import S3_CACHED_PARTS, S3_PREFETCH_PARTS, S3RangeReader, iter_object  # noqa: E402
+from utils.text_extraction import iter_chunks, iter_pages  # noqa: E402
+from utils.vector_upsert import UPSERT_CONCURRENCY, VectorUpserter  # noqa: E402
+
+WORDS = (
+    "agreement party notice termination clause section liability payment invoice period "
+    "service provider customer obligation warranty data processing security incident report "
+    "schedule annex amendment renewal term fee confidential information breach remedy "
+    "damages indemnity insurance compliance audit record retention delivery acceptance "
+    "milestone deadline review approval request change order scope budget forecast risk"
+).split()
+
+
+# --- Corpus -------------------------------------------------------------------
+
+def synthetic_page(rng: random.Random, words: int, line_words: int = 14) -> list:
+    """Lines of text; an empty line separates paragraphs."""
+    lines = []
+    while words > 0:
+        for _ in range(rng.randint(3, 8)):
+            n = min(line_words, words)
+            lines.append(" ".join(rng.choice(WORDS) for _ in range(n)))
+            words -= n
+            if words <= 0:
+                break
+        lines.append("")
+    return lines
+
+
+def synthetic_pdf(pages: list) -> bytes:
+    """A minimal PDF (Helvetica text, one content stream per page)."""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            b" ".join(b"%d 0 R" % (4 + 2 * i) for i in range(len(pages))), len(pages)),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i, lines in enumerate(pages):
+        text = b"".join(
+            b"(" + line.encode("latin-1").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+            + b") Tj T*\n"
+            for line in lines
+        )
+        stream = b"BT /F1 10 Tf 12 TL 56 740 Td\n" + text + b"ET"
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (5 + 2 * i))
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def build_corpus(args) -> dict:
+    """S3 key -> bytes, keyed `{user}/{file_id}/{filename}` like uploads."""
+    corpus = {}
+    for i in range(args.documents):
+        rng = random.Random(i)
+        pages = [synthetic_page(rng, args.words_per_page) for _ in range(args.pages)]
+        corpus[f"user-1/synthetic-{i}/synthetic-{i}.pdf"] = synthetic_pdf(pages)
+
+    paths = []
+    for path in args.pdf:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith((".pdf", ".txt")))
+        else:
+            paths.append(path)
+    for i, path in enumerate(paths):
+        with open(path, "rb") as f:
+            corpus[f"user-1/real-{i}/{os.path.basename(path)}"] = f.read()
+    return corpus
+
+
+# --- Fake backends ------------------------------------------------------------
+
+class FakeBody:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read(self) -> bytes:
+        return self.data
+
+
+class FakeS3:
+    def __init__(self, objects: dict, latency_ms: float, mbps: float):
+        self.objects = objects
+        self.latency = latency_ms / 1000
+        self.bytes_per_second = mbps * 1024 * 1024
+        self.gets = 0
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return {"ContentLength": len(self.objects[Key]), "ETag": '"bench"'}
+
+    def get_object(self, Bucket, Key, Range, IfMatch=None, **kwargs):
+        start, end = (int(v) for v in Range[len("bytes="):].split("-"))
+        data = self.objects[Key][start:end + 1]
+        time.sleep(self.latency + len(data) / self.bytes_per_second)
+        self.gets += 1
+        return {"Body": FakeBody(data)}
+
+
+class FakeEmbedder:
+    def __init__(self, embed_ms: float, jitter: float, dims: int):
+        self.delay = embed_ms / 1000
+        self.jitter = jitter
+        self.dims = dims
+        self.calls = 0
+        self._rng = random.Random(7)
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str):
+        with self._lock:
+            self.calls += 1
+            factor = self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+        time.sleep(self.delay * factor)
+        return [float(len(text) % 7)] * self.dims
+
+
+class FakeTable:
+    """The docs table: chunk manifests and the document's status."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.items = {}
+
+    def get_item(self, Key, **kwargs):
+        time.sleep(self.latency)
+        item = self.items.get((Key["pk"], Key["sk"]))
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item, **kwargs):
+        time.sleep(self.latency)
+        self.items[(Item["pk"], Item["sk"])] = Item
+
+    def update_item(self, Key, **kwargs):
+        time.sleep(self.latency)
+
+
+class FakeIndex:
+    def __init__(self, batch_ms: float, vector_us: float):
+        self.batch_latency = batch_ms / 1000
+        self.vector_latency = vector_us / 1e6
+        self.vectors = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors, **kwargs):
+        time.sleep(self.batch_latency + len(vectors) * self.vector_latency)
+        with self._lock:
+            self.vectors += len(vectors)
+
+    def list(self, prefix: str):
+        # A first upload: nothing from an earlier version to clean up
+        return iter(())
+
+    def delete(self, ids, **kwargs):
+        time.sleep(self.batch_latency)
+
+
+# --- Measurement --------------------------------------------------------------
+
+class StageClock:
+    """Seconds the ingesting thread spent in each stage."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.items = defaultdict(int)
+
+    def iterate(self, name: str, iterable):
+        """Time each next() of `iterable` (including any stages it pulls from)."""
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.seconds[name] += time.perf_counter() - start
+                return
+            self.seconds[name] += time.perf_counter() - start
+            self.items[name] += 1
+            yield item
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] += time.perf_counter() - start
+
+    def exclusive(self) -> dict:
+        # download < extract < chunk are nested iterators
+        s = self.seconds
+        return {
+            "download": s["download"],
+            "extract": s["extract"] - s["download"],
+            "chunk": s["chunk"] - s["extract"],
+            "digest": s["digest"],
+            "embed": s["embed"],
+            "upsert": s["upsert"],
+        }
+
+
+def _status_kb(field: str):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> None:
+    # Linux: resets VmHWM, so each configuration reports its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb() -> float:
+    kb = _status_kb("VmHWM")
+    if kb is None:
+        # Process-lifetime peak (kB on Linux, bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        kb = peak / 1024 if sys.platform == "darwin" else peak
+    return kb / 1024
+
+
+def rss_mb() -> float:
+    kb = _status_kb("VmRSS")
+    return kb / 1024 if kb is not None else peak_rss_mb()
+
+
+# --- Pipeline -----------------------------------------------------------------
+
+class TimedEmbeddingCache(EmbeddingCache):
+    def __init__(self, clock: StageClock, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.clock = clock
+
+    def embed_iter(self, texts, concurrency: int = 1):
+        return self.clock.iterate("embed", super().embed_iter(texts, concurrency))
+
+
+def timed_upserter(clock: StageClock, concurrency: int):
+    class TimedUpserter(VectorUpserter):
+        def __init__(self, index, **kwargs):
+            super().__init__(index, concurrency=concurrency, **kwargs)
+
+        def add(self, vector: dict) -> None:
+            with clock.stage("upsert"):
+                super().add(vector)
+
+        def flush(self) -> None:
+            with clock.stage("upsert"):
+                super().flush()
+    return TimedUpserter
+
+
+def timed_range_reader(clock: StageClock):
+    class TimedRangeReader(S3RangeReader):
+        def readinto(self, buffer):
+            with clock.stage("download"):
+                return super().readinto(buffer)
+    return TimedRangeReader
+
+
+def timed_call(clock: StageClock, name: str, fn):
+    def call(*args, **kwargs):
+        with clock.stage(name):
+            return fn(*args, **kwargs)
+    return call
+
+
+def wire_handler(clock: StageClock, corpus: dict, args, chunk_chars: int, concurrency: int) -> dict:
+    """Point the handler's module globals at the fakes, with the stage clock
+    around the utils it calls; returns the fakes."""
+    fakes = {
+        "s3": FakeS3(corpus, args.s3_ms, args.s3_mbps),
+        "table": FakeTable(args.ddb_ms),
+        "embedder": FakeEmbedder(args.embed_ms, args.embed_jitter, args.dims),
+        "index": FakeIndex(args.upsert_ms, args.upsert_vector_us),
+    }
+    handler.s3 = fakes["s3"]
+    handler.table = fakes["table"]
+    # Fresh per run: every chunk is a miss
+    handler.embedding_cache = TimedEmbeddingCache(clock, "bench", fakes["embedder"])
+    handler.EMBED_CONCURRENCY = concurrency
+    handler.EMBED_WINDOW = args.window
+    handler.iter_object = lambda *a, **kw: clock.iterate(
+        "download", iter_object(*a, part_size=args.part_size, **kw))
+    handler.open_object = lambda s3, bucket, key, version_id=None: io.BufferedReader(
+        timed_range_reader(clock)(s3, bucket, key, version_id, args.part_size,
+                                  S3_PREFETCH_PARTS, S3_CACHED_PARTS),
+        buffer_size=64 * 1024
+    )
+    handler.iter_pages = lambda parts, filename: clock.iterate("extract", iter_pages(parts, filename))
+    handler.iter_chunks = lambda pages: clock.iterate("chunk", iter_chunks(pages, max_chars=chunk_chars))
+    handler.chunk_digest = timed_call(clock, "digest", chunk_digest)
+    handler.VectorUpserter = timed_upserter(clock, args.upsert_concurrency)
+    return fakes
+
+
+def s3_record(key: str) -> dict:
+    return {"s3": {"bucket": {"name": "bench"}, "object": {"key": key}}}
+
+
+def run(corpus: dict, concurrency: int, chunk_chars: int, args) -> dict:
+    clock = StageClock()
+    fakes = wire_handler(clock, corpus, args, chunk_chars, concurrency)
+
+    gc.collect()
+    reset_peak_rss()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    for key in corpus:
+        handler.ingest(s3_record(key), fakes["index"])
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+
+    pages, chunks = clock.items["extract"], clock.items["chunk"]
+    result = {
+        "concurrency": concurrency,
+        "chunk_chars": chunk_chars,
+        "documents": len(corpus),
+        "pages": pages,
+        "chunks": chunks,
+        "seconds": round(elapsed, 2),
+        "pages_per_sec": round(pages / elapsed, 1),
+        "chunks_per_sec": round(chunks / elapsed, 1),
+        "peak_rss_mb": round(peak, 1),
+        "rss_growth_mb": round(peak - rss_before, 1),
+    }
+    stages = clock.exclusive()
+    stages["other"] = elapsed - sum(stages.values())  # manifest, metadata, DynamoDB writes
+    for stage, seconds in stages.items():
+        result[f"{stage}_s"] = round(seconds, 2)
+    result.update(embed_calls=fakes["embedder"].calls, vectors=fakes["index"].vectors,
+                  s3_gets=fakes["s3"].gets)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestion pipeline throughput: extract, chunk, embed, upsert")
+    parser.add_argument("--documents", type=int, default=20, help="synthetic PDFs")
+    parser.add_argument("--pages", type=int, default=30, help="pages per synthetic PDF")
+    parser.add_argument("--words-per-page", type=int, default=500)
+    parser.add_argument("--pdf", nargs="*", default=[], help="real PDF/text files or directories to add")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 16], help="EMBED_CONCURRENCY")
+    parser.add_argument("--chunk-chars", type=int, nargs="+", default=[4000], help="CHUNK_MAX_CHARS")
+    parser.add_argument("--window", type=int, default=256, help="EMBED_WINDOW")
+    parser.add_argument("--upsert-concurrency", type=int, default=UPSERT_CONCURRENCY)
+    parser.add_argument("--part-size", type=int, default=8 * 1024 * 1024, help="S3_PART_SIZE")
+    parser.add_argument("--s3-ms", type=float, default=20, help="latency of one ranged GET")
+    parser.add_argument("--ddb-ms", type=float, default=5, help="latency of one docs-table call")
+    parser.add_argument("--s3-mbps", type=float, default=80, help="download speed, MB/s")
+    parser.add_argument("--embed-ms", type=float, default=40, help="latency of one embedding call")
+    parser.add_argument("--embed-jitter", type=float, default=0.3, help="+/- share of --embed-ms")
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--upsert-ms", type=float, default=60, help="latency of one upsert batch")
+    parser.add_argument("--upsert-vector-us", type=float, default=300, help="added per vector in a batch")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args)
+    if not corpus:
+        raise SystemExit("Empty corpus: use --documents and/or --pdf")
+    if any(key.lower().endswith(".pdf") for key in corpus):
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            raise SystemExit("PDF extraction needs pypdf: pip install -r benchmarks/requirements.txt")
+    print(f"corpus_documents={len(corpus)}  corpus_mb={round(sum(map(len, corpus.values())) / 2 ** 20, 1)}")
+
+    for chunk_chars in args.chunk_chars:
+        for concurrency in args.concurrency:
+            result = run(corpus, concurrency, chunk_chars, args)
+            print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/vector_index.py
+# Local (in-process NumPy) vs. remote vector-store retrieval latency.
+#
+# The remote path is modelled as a round trip of --remote-ms plus the same
+# top-k search, which is what `chat_handler.query_pinecone` pays per chat turn
+# for a cold document.
+#
+# Usage (from talk-with-docs-starter2-cdk/):
+#   python -m benchmarks.vector_index --chunks 3000 --dims 1536 --remote-ms 40
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lambda"))
+
+import numpy as np  # noqa: E402
+
+from utils.vector_index import LocalVectorIndex  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def synthetic_document(chunks: int, dims: int):
+    rng = np.random.default_rng(7)
+    vectors = rng.standard_normal((chunks, dims), dtype=np.float32)
+    ids = [f"doc-{i}" for i in range(chunks)]
+    metadata = [{"doc_id": "doc", "text": f"chunk {i} " * 40} for i in range(chunks)]
+    return ids, vectors, metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local vs. remote vector retrieval latency")
+    parser.add_argument("--chunks", type=int, default=3000)
+    parser.add_argument("--dims", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--remote-ms", type=float, default=40, help="modelled remote round trip")
+    args = parser.parse_args()
+
+    document = synthetic_document(args.chunks, args.dims)
+    index = LocalVectorIndex(loader=lambda doc_id: document)
+
+    start = time.perf_counter()
+    index.warm("doc")
+    load_ms = (time.perf_counter() - start) * 1000
+
+    queries = [[random.gauss(0, 1) for _ in range(args.dims)] for _ in range(args.queries)]
+
+    local = []
+    for q in queries:
+        start = time.perf_counter()
+        index.query("doc", q, args.top_k)
+        local.append((time.perf_counter() - start) * 1000)
+
+    remote = []
+    for q in queries[: max(1, args.queries // 10)]:
+        start = time.perf_counter()
+        time.sleep(args.remote_ms / 1000)
+        index.query("doc", q, args.top_k)
+        remote.append((time.perf_counter() - start) * 1000)
+
+    print(f"document: {args.chunks} chunks x {args.dims} dims, "
+          f"{index.stats()['bytes'] / 1e6:.1f} MB resident, load {load_ms:.1f} ms")
+    for name, samples in (("local", local), ("remote", remote)):
+        print(f"{name:>6}: p50={percentile(samples, 50):.2f} ms  "
+              f"p99={percentile(samples, 99):.2f} ms  n={len(samples)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,126 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
 import json
-import boto3
+import threading
 from datetime import datetime
-from pinecone import Pinecone
+
+import boto3
+from utils.cold_start import ColdStartTimer
+from utils.context_packing import pack_context
+from utils.embedding_cache import EmbeddingCache, titan_embedder
+from utils.logs import get_logger, log_invocation
+from utils.secrets_cache import CachedSecret, SecretClient, lazy
+
+# Nothing below talks to the network at import time: clients are built on
+# first use, and a cold container starts building the Pinecone client in the
+# background while the question is being embedded.
+cold_start = ColdStartTimer(started=_IMPORT_STARTED)
+log = get_logger("chat_handler")
 
 # === Load config ===
 TABLE_NAME = os.environ["TABLE_NAME"]
 PINECONE_SECRET_NAME = os.environ["PINECONE_SECRET_NAME"]
 PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "talk-with-docs")
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v1"
+CONTEXT_CANDIDATES = int(os.environ.get("CONTEXT_CANDIDATES", "12"))  # packed down in generate_claude_response
+PINECONE_FETCH_BATCH = 100
 
 # === AWS clients ===
-secrets_client = boto3.client("secretsmanager")
-bedrock_runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
-dynamodb = boto3.resource("dynamodb")
-table = dynamodb.Table(TABLE_NAME)
+@lazy
+def bedrock_runtime():
+    with cold_start.phase("bedrock_client"):
+        return boto3.client("bedrock-runtime", region_name="us-east-1")
+
+@lazy
+def table():
+    with cold_start.phase("dynamodb_resource"):
+        return boto3.resource("dynamodb").Table(TABLE_NAME)
+
+# === Pinecone (rebuilt if the API key is rotated) ===
+pinecone_secret = CachedSecret(PINECONE_SECRET_NAME)
+
+def build_pinecone_index(api_key):
+    with cold_start.phase("pinecone_client"):
+        from pinecone import Pinecone  # heavy import, only paid on first use
+        return Pinecone(api_key=api_key).Index(PINECONE_INDEX_NAME)
+
+index = SecretClient(pinecone_secret, build_pinecone_index)
+
+# === Embedding cache (shared with the ingestion Lambda) ===
+@lazy
+def embedding_cache():
+    return EmbeddingCache(
+        EMBEDDING_MODEL_ID,
+        titan_embedder(bedrock_runtime(), EMBEDDING_MODEL_ID),
+        table_name=os.environ.get("EMBEDDING_CACHE_TABLE")
+    )
 
-# === Initialize Pinecone ===
-pinecone_api_key = secrets_client.get_secret_value(SecretId=PINECONE_SECRET_NAME)["SecretString"]
-pc = Pinecone(api_key=pinecone_api_key)
-index = pc.Index(PINECONE_INDEX_NAME)
+cold_start.mark("import", _IMPORT_STARTED)
 
 # === Helpers ===
 def embed_text(text: str):
-    response = bedrock_runtime.invoke_model(
-        modelId="amazon.titan-embed-text-v1",
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps({ "inputText": text })
-    )
-    body = json.loads(response["body"].read())
-    return body["embedding"]
+    return embedding_cache().embed(text)
+
+def load_document_vectors(doc_id):
+    # Chunks are upserted as `{doc_id}-{digest}`
+    ids = [vector_id for page in index().list(prefix=f"{doc_id}-") for vector_id in page]
+    found, values, metadata = [], [], []
+    for i in range(0, len(ids), PINECONE_FETCH_BATCH):
+        fetched = index().fetch(ids=ids[i:i + PINECONE_FETCH_BATCH]).vectors
+        for vector_id in ids[i:i + PINECONE_FETCH_BATCH]:
+            vector = fetched.get(vector_id)
+            if vector is None:  # deleted since listing
+                continue
+            found.append(vector_id)
+            values.append(vector.values)
+            metadata.append(vector.metadata or {})
+    return found, values, metadata
+
+# Hot documents are served from memory; see utils/vector_index.py
+@lazy
+def local_index():
+    with cold_start.phase("vector_index"):
+        from utils.vector_index import LocalVectorIndex  # pulls in numpy
+        return LocalVectorIndex(loader=load_document_vectors)
+
+def warm_clients():
+    try:
+        with cold_start.phase("pinecone_secret"):
+            pinecone_secret.get()
+        index()
+        local_index()
+        table()
+    except Exception:
+        # The request path builds whatever is missing and surfaces the error
+        log.exception("client_warm_up_failed")
+
+start_warm_up = lazy(lambda: threading.Thread(target=warm_clients, daemon=True).start())
 
 def query_pinecone(embedding, doc_id):
-    results = index.query(
+    matches = local_index().query(doc_id, embedding, CONTEXT_CANDIDATES)
+    if matches is not None:
+        return matches
+
+    # Cold document: answer from Pinecone and load it locally while Claude generates
+    local_index().warm_async(doc_id)
+    results = index.call(lambda pinecone_index: pinecone_index.query(
         vector=embedding,
-        top_k=5,
+        top_k=CONTEXT_CANDIDATES,
         include_metadata=True,
+        include_values=True,  # lets context packing compare chunks by vector
         filter={"doc_id": {"$eq": doc_id}}
-    )
+    ))
     return results["matches"]
 
 def generate_claude_response(context_chunks, user_message):
-    context = "\n---\n".join(c["metadata"]["text"] for c in context_chunks)
+    packed, report = pack_context(context_chunks)
+    log.info("context_packed", **report)
+    context = "\n---\n".join(c["metadata"]["text"] for c in packed)
     prompt = f"Context:\n{context}\n\nUser: {user_message}\nAssistant:"
 
-    response = bedrock_runtime.invoke_model(
+    response = bedrock_runtime().invoke_model(
         modelId="anthropic.claude-3-sonnet-20240229-v1:0",
         contentType="application/json",
         accept="application/json",
@@ -58,26 +134,34 @@ def generate_claude_response(context_chunks, user_message):
     return content["content"][0]["text"]
 
 # === Lambda handler ===
+@log_invocation
 def main(event, context):
     user_sub = event["identity"]["sub"]
     doc_id = event["arguments"]["documentId"]
     message = event["arguments"]["message"]
 
-    # 1. Embed the user message
-    user_embedding = embed_text(message)
+    try:
+        # Cold container: build the Pinecone/DynamoDB clients while embedding
+        start_warm_up()
 
-    # 2. Search Pinecone for relevant context
-    chunks = query_pinecone(user_embedding, doc_id)
+        # 1. Embed the user message
+        user_embedding = embed_text(message)
 
-    # 3. Generate a response using Claude
-    response_text = generate_claude_response(chunks, message)
+        # 2. Search Pinecone for relevant context
+        chunks = query_pinecone(user_embedding, doc_id)
 
-    # 4. Save to DynamoDB
-    table.put_item(Item={
-        "pk": user_sub,
-        "sk": f"chat#{doc_id}#{datetime.utcnow().isoformat()}",
-        "message": message,
-        "response": response_text
-    })
+        # 3. Generate a response using Claude
+        response_text = generate_claude_response(chunks, message)
+
+        # 4. Save to DynamoDB
+        table().put_item(Item={
+            "pk": user_sub,
+            "sk": f"chat#{doc_id}#{datetime.utcnow().isoformat()}",
+            "message": message,
+            "response": response_text
+        })
+    finally:
+        # Failed first invocations are often the slow ones, so report those too
+        cold_start.report()
 
     return response_text
@@ -1,33 +1,112 @@
 import os
 import boto3
 import json
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
+from utils.logs import get_logger, log_invocation
 
-ddb = boto3.resource("dynamodb")
-table = ddb.Table(os.environ["DDB_TABLE"])
+# Findings arrive through SQS in batches (GuardDutyFindingsQueue). Each one
+# becomes a conditional update, run in parallel, that is:
+#   - idempotent: a redelivered finding (same id) is a no-op
+#   - ordered: an older finding never overwrites a newer verdict
+# Only the messages whose update failed are reported back for retry.
+# A plain EventBridge event (the previous direct trigger) is still accepted.
 
-def main(event, context):
-    print("Event:", json.dumps(event))
+log = get_logger("guardduty_findings")
 
-    findings = event.get("detail", {}).get("service", {}).get("additionalInfo", {}).get("malwareProtection", {})
-    s3_metadata = event.get("detail", {}).get("resource", {}).get("resourceDetails", {}).get("s3Bucket", {})
-    object_key = s3_metadata.get("objectKey")
-    bucket_name = s3_metadata.get("bucketName")
+TABLE_NAME = os.environ["DDB_TABLE"]
+UPDATE_CONCURRENCY = int(os.environ.get("UPDATE_CONCURRENCY", "16"))
+
+# Low-level client: unlike boto3 resources it is safe to share between threads
+dynamodb = boto3.client("dynamodb", config=Config(max_pool_connections=UPDATE_CONCURRENCY))
 
+
+def parse_finding(event):
+    """(finding_id, document_id, status, updated_at) or None if not applicable."""
+    detail = event.get("detail", {})
+    findings = detail.get("service", {}).get("additionalInfo", {}).get("malwareProtection", {})
+    s3_metadata = detail.get("resource", {}).get("resourceDetails", {}).get("s3Bucket", {})
+    object_key = s3_metadata.get("objectKey")
     status = findings.get("scanResultDetails", {}).get("scanResult")
 
     # Extract document_id from S3 object key
     try:
         # assuming key is like userid/document_id/filename.pdf
         document_id = object_key.split("/")[1]
-    except Exception as e:
-        print("Failed to parse document ID:", e)
-        return
+    except Exception:
+        log.warning("document_id_unparsed", object_key=object_key)
+        return None
+
+    finding_id = detail.get("id") or event.get("id")
+    updated_at = detail.get("updatedAt") or detail.get("service", {}).get("eventLastSeen") or event.get("time", "")
+    return finding_id, document_id, status, updated_at
 
-    # Update DynamoDB
-    table.update_item(
-        Key={"document_id": document_id},
-        UpdateExpression="SET scan_status = :s",
-        ExpressionAttributeValues={":s": status}
-    )
 
-    return {"message": "Scan result processed", "status": status}
+def apply_finding(finding_id, document_id, status, updated_at):
+    """Returns "updated" or "skipped" (duplicate or out of date)."""
+    try:
+        dynamodb.update_item(
+            TableName=TABLE_NAME,
+            Key={"document_id": {"S": document_id}},
+            UpdateExpression="SET scan_status = :s, scan_finding_id = :f, scan_updated_at = :t",
+            ConditionExpression=(
+                "attribute_not_exists(scan_finding_id) OR "
+                "(scan_finding_id <> :f AND (attribute_not_exists(scan_updated_at) OR scan_updated_at <= :t))"
+            ),
+            ExpressionAttributeValues={
+                ":s": {"S": status or "UNKNOWN"},
+                ":f": {"S": finding_id},
+                ":t": {"S": updated_at},
+            }
+        )
+        return "updated"
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return "skipped"
+        raise
+
+
+def process_batch(records):
+    failures = []
+    by_finding = {}  # finding id -> (finding, [message ids]); duplicates in a batch run once
+    for record in records:
+        try:
+            finding = parse_finding(json.loads(record["body"]))
+        except (KeyError, ValueError) as e:
+            log.warning("malformed_message", message_id=record.get("messageId"), error=str(e))
+            failures.append(record["messageId"])  # ends up in the DLQ for inspection
+            continue
+        if finding is None:
+            continue
+        entry = by_finding.setdefault(finding[0], (finding, []))
+        entry[1].append(record["messageId"])
+
+    counts = {"updated": 0, "skipped": 0, "failed": 0}
+    if by_finding:
+        with ThreadPoolExecutor(max_workers=min(UPDATE_CONCURRENCY, len(by_finding))) as pool:
+            futures = {pool.submit(apply_finding, *finding): message_ids
+                       for finding, message_ids in by_finding.values()}
+            for future, message_ids in futures.items():
+                try:
+                    counts[future.result()] += 1
+                except Exception:
+                    log.exception("scan_result_update_failed", message_ids=message_ids)
+                    counts["failed"] += 1
+                    failures.extend(message_ids)
+
+    log.info("batch_processed", messages=len(records), **counts)
+    return {"batchItemFailures": [{"itemIdentifier": message_id} for message_id in failures]}
+
+
+@log_invocation
+def main(event, context):
+    if "Records" in event:
+        return process_batch(event["Records"])
+
+    # Direct EventBridge invocation
+    finding = parse_finding(event)
+    if finding is None:
+        return
+    result = apply_finding(*finding)
+    return {"message": "Scan result processed", "status": finding[2], "result": result}
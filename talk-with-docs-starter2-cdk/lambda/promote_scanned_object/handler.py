@@ -0,0 +1,116 @@
+import os
+import boto3
+import json
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from utils.logs import get_logger, log_invocation
+
+# Moves an upload out of the raw bucket once GuardDuty has scanned it:
+#   NO_THREATS_FOUND -> server-side copy to FINAL_BUCKET, set final_s3_key
+#   THREATS_FOUND    -> copy to QUARANTINE_BUCKET, delete from the upload
+#                       (and final) bucket
+#   anything else    -> left where it is (UNSUPPORTED, ACCESS_DENIED, FAILED)
+#
+# Both outcomes bump the document's `ingest_version`, which the server's
+# answer cache uses to stop serving answers about the previous content.
+#
+# Copies never pass through the Lambda: objects above COPY_MULTIPART_THRESHOLD
+# are copied as parallel UploadPartCopy requests (COPY_CONCURRENCY parts of
+# COPY_PART_SIZE at a time), smaller ones with a single CopyObject.
+# Scan results arrive through SQS; only failed records are retried.
+
+log = get_logger("promote_scanned_object")
+
+MB = 1024 * 1024
+FINAL_BUCKET = os.environ["FINAL_BUCKET"]
+QUARANTINE_BUCKET = os.environ["QUARANTINE_BUCKET"]
+TABLE_NAME = os.environ["DDB_TABLE"]
+COPY_CONCURRENCY = int(os.environ.get("COPY_CONCURRENCY", "10"))
+
+transfer_config = TransferConfig(
+    multipart_threshold=int(os.environ.get("COPY_MULTIPART_THRESHOLD", str(64 * MB))),
+    multipart_chunksize=int(os.environ.get("COPY_PART_SIZE", str(64 * MB))),
+    max_concurrency=COPY_CONCURRENCY
+)
+
+s3 = boto3.client("s3", config=Config(max_pool_connections=COPY_CONCURRENCY + 2))
+table = boto3.resource("dynamodb").Table(TABLE_NAME)
+
+
+def parse_scan_result(event):
+    detail = event["detail"]
+    s3_object = detail["s3ObjectDetails"]
+    return (
+        s3_object["bucketName"],
+        s3_object["objectKey"],
+        s3_object.get("versionId"),
+        detail["scanResultDetails"]["scanResultStatus"]
+    )
+
+
+def copy_to(bucket, key, version_id, destination):
+    source = {"Bucket": bucket, "Key": key}
+    if version_id:
+        source["VersionId"] = version_id
+    s3.copy(source, destination, key, Config=transfer_config)
+
+
+def is_latest_version(bucket, key, version_id):
+    if not version_id:
+        return True
+    return s3.head_object(Bucket=bucket, Key=key).get("VersionId") == version_id
+
+
+def promote(bucket, key, version_id, status):
+    # assuming key is like userid/document_id/filename.pdf
+    document_id = key.split("/")[1]
+
+    if status == "NO_THREATS_FOUND":
+        # A newer upload of the same key gets its own scan result
+        if not is_latest_version(bucket, key, version_id):
+            log.info("promotion_superseded", s3_key=key, version_id=version_id)
+            return "superseded"
+        copy_to(bucket, key, version_id, FINAL_BUCKET)
+        table.update_item(
+            Key={"document_id": document_id},
+            # GuardDuty findings (guardduty_findings) only cover threats, so the
+            # clean verdict is recorded here
+            UpdateExpression="SET final_s3_key = :k, processing_status = :p, scan_status = :s "
+                             "ADD ingest_version :one",
+            ExpressionAttributeValues={":k": key, ":p": "PROMOTED", ":s": status, ":one": 1}
+        )
+        return "promoted"
+
+    if status == "THREATS_FOUND":
+        copy_to(bucket, key, version_id, QUARANTINE_BUCKET)
+        delete_args = {"VersionId": version_id} if version_id else {}
+        s3.delete_object(Bucket=bucket, Key=key, **delete_args)
+        s3.delete_object(Bucket=FINAL_BUCKET, Key=key)  # in case an earlier version was promoted
+        table.update_item(
+            Key={"document_id": document_id},
+            UpdateExpression="SET processing_status = :p, scan_status = :s "
+                             "REMOVE final_s3_key ADD ingest_version :one",
+            ExpressionAttributeValues={":p": "QUARANTINED", ":s": status, ":one": 1}
+        )
+        return "quarantined"
+
+    log.warning("promotion_skipped", s3_key=key, scan_status=status)
+    return "skipped"
+
+
+@log_invocation
+def main(event, context):
+    if "Records" not in event:
+        # Direct EventBridge invocation
+        return promote(*parse_scan_result(event))
+
+    failures = []
+    for record in event["Records"]:
+        try:
+            bucket, key, version_id, status = parse_scan_result(json.loads(record["body"]))
+            result = promote(bucket, key, version_id, status)
+            log.info("promotion_processed", s3_key=key, version_id=version_id, result=result)
+        except Exception:
+            log.exception("promotion_failed", message_id=record.get("messageId"))
+            failures.append({"itemIdentifier": record["messageId"]})
+    return {"batchItemFailures": failures}
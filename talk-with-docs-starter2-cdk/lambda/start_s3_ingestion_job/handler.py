@@ -1,22 +1,184 @@
 import os
 import boto3
+import json
+import time
 import uuid
+from botocore.exceptions import ClientError
+from utils.logs import get_logger, log_invocation
+
+# S3 "Object Created" events arrive through SQS with a batching window, so a
+# burst of uploads reaches this Lambda as one batch and starts one ingestion
+# job. A data source can only run one job at a time: a lease item in
+# INGESTION_JOBS_TABLE records the running job, and while it runs new
+# messages are returned as batch item failures. SQS redelivers them after
+# the visibility timeout and they start the follow-up job once the lease is
+# free. Each job gets an item with its counts and status, and every document
+# it covered gets an item (pk "document#<key>", sk "job#<id>") pointing at
+# the job, so "was this document ingested?" is one query. Messages that
+# can't be parsed are logged and dropped rather than retried.
+
+log = get_logger("start_s3_ingestion_job")
 
 bedrock = boto3.client("bedrock-agent")
+dynamodb = boto3.resource("dynamodb")
+
+KNOWLEDGE_BASE_ID = os.environ["KNOWLEDGE_BASE_ID"]
+DATA_SOURCE_ID = os.environ["DATA_SOURCE_ID"]
+table = dynamodb.Table(os.environ["INGESTION_JOBS_TABLE"])
+
+# Upper bound on a job; a lease older than this is considered abandoned.
+# Until the job id is recorded the lease only covers the start call, so a
+# crashed invocation doesn't block ingestion for the full job lease.
+LEASE_SECONDS = int(os.environ.get("INGESTION_LEASE_SECONDS", "3600"))
+START_LEASE_SECONDS = 300
+JOB_RECORD_TTL_DAYS = int(os.environ.get("INGESTION_JOB_TTL_DAYS", "30"))
+RUNNING_STATUSES = {"STARTING", "IN_PROGRESS", "STOPPING"}
+
+LEASE_KEY = {"pk": f"datasource#{DATA_SOURCE_ID}", "sk": "lease"}
+
+
+def parse_documents(records):
+    """(document keys, the records they came from); malformed records are left out."""
+    documents = set()
+    valid = []
+    for record in records:
+        try:
+            detail = json.loads(record["body"])["detail"]
+            documents.add(detail["object"]["key"])
+            valid.append(record)
+        except (KeyError, TypeError, ValueError) as e:
+            # Redelivery can't fix it; acknowledging drops it instead of
+            # cycling it through every batch until it reaches the DLQ
+            log.warning("malformed_message_dropped", message_id=record.get("messageId"), error=str(e))
+    return documents, valid
 
-def main(event, context):
-    print("Event received:", event)
 
-    knowledge_base_id = os.environ["KNOWLEDGE_BASE_ID"]
-    data_source_id = os.environ["DATA_SOURCE_ID"]
+def record_job(job_id, status, documents, message_count, now):
+    expires_at = now + JOB_RECORD_TTL_DAYS * 86400
+    table.put_item(Item={
+        "pk": LEASE_KEY["pk"],
+        "sk": f"job#{job_id}",
+        "status": status,
+        "document_count": len(documents),
+        "message_count": message_count,
+        "started_at": now,
+        "expires_at": expires_at
+    })
+    # One item per document: a batch of long keys wouldn't fit in the job item
+    with table.batch_writer() as batch:
+        for key in sorted(documents):
+            batch.put_item(Item={
+                "pk": f"document#{key}",
+                "sk": f"job#{job_id}",
+                "job_id": job_id,
+                "data_source_id": DATA_SOURCE_ID,
+                "started_at": now,
+                "expires_at": expires_at
+            })
 
+
+def acquire_lease(owner, now):
     try:
-        response = bedrock.start_ingestion_job(
-            knowledgeBaseId=knowledge_base_id,
-            dataSourceId=data_source_id,
-            # clientToken=f"{uuid.uuid4()}"
+        table.put_item(
+            Item={**LEASE_KEY, "owner": owner, "acquired_at": now, "lease_expires_at": now + START_LEASE_SECONDS},
+            ConditionExpression="attribute_not_exists(pk) OR lease_expires_at < :now",
+            ExpressionAttributeValues={":now": now}
         )
-        print("Ingestion job started:", response)
-    except Exception as e:
-        print("Failed to start ingestion job:", str(e))
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
         raise
+
+
+def release_lease(owner):
+    try:
+        table.delete_item(
+            Key=LEASE_KEY,
+            ConditionExpression="#o = :o",
+            ExpressionAttributeNames={"#o": "owner"},
+            ExpressionAttributeValues={":o": owner}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+
+
+def running_job():
+    """Job id holding the lease if it is still running; frees a finished lease."""
+    lease = table.get_item(Key=LEASE_KEY, ConsistentRead=True).get("Item")
+    if not lease:
+        return None
+    job_id = lease.get("job_id")
+    if not job_id:
+        return lease["owner"]  # another invocation is starting its job right now
+
+    job = bedrock.get_ingestion_job(
+        knowledgeBaseId=KNOWLEDGE_BASE_ID,
+        dataSourceId=DATA_SOURCE_ID,
+        ingestionJobId=job_id
+    )["ingestionJob"]
+    if job["status"] in RUNNING_STATUSES:
+        return job_id
+
+    table.update_item(
+        Key={"pk": LEASE_KEY["pk"], "sk": f"job#{job_id}"},
+        UpdateExpression="SET #s = :s, #st = :st, finished_at = :t",
+        ExpressionAttributeNames={"#s": "status", "#st": "statistics"},
+        ExpressionAttributeValues={
+            ":s": job["status"],
+            ":st": json.dumps(job.get("statistics", {})),
+            ":t": int(time.time())
+        }
+    )
+    release_lease(lease["owner"])
+    return None
+
+
+@log_invocation
+def main(event, context):
+    records = event.get("Records", [])
+    documents, valid = parse_documents(records)
+    if not documents:
+        return {"batchItemFailures": []}
+
+    retry_later = {"batchItemFailures": [{"itemIdentifier": r["messageId"]} for r in valid]}
+
+    active = running_job()
+    if active:
+        log.info("ingestion_deferred", reason="job_running", job_id=active, documents=len(documents))
+        return retry_later
+
+    owner = str(uuid.uuid4())
+    now = int(time.time())
+    if not acquire_lease(owner, now):
+        log.info("ingestion_deferred", reason="lease_taken", documents=len(documents))
+        return retry_later
+
+    try:
+        job = bedrock.start_ingestion_job(
+            knowledgeBaseId=KNOWLEDGE_BASE_ID,
+            dataSourceId=DATA_SOURCE_ID,
+            clientToken=owner
+        )["ingestionJob"]
+    except ClientError as e:
+        release_lease(owner)
+        if e.response["Error"]["Code"] == "ConflictException":
+            # Started outside this scheduler (console, CLI); try again later
+            log.info("ingestion_deferred", reason="conflict", error=str(e), documents=len(documents))
+            return retry_later
+        raise
+    except Exception:
+        release_lease(owner)
+        raise
+
+    job_id = job["ingestionJobId"]
+    table.update_item(
+        Key=LEASE_KEY,
+        UpdateExpression="SET job_id = :j, lease_expires_at = :e",
+        ExpressionAttributeValues={":j": job_id, ":e": now + LEASE_SECONDS}
+    )
+    record_job(job_id, job.get("status", "STARTING"), documents, len(valid), now)
+
+    log.info("ingestion_started", job_id=job_id, documents=len(documents), messages=len(records))
+    return {"batchItemFailures": []}
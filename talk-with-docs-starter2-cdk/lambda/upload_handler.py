@@ -2,6 +2,9 @@ import os
 import boto3
 import uuid
 from datetime import datetime
+from utils.logs import get_logger, log_invocation
+
+log = get_logger("upload_handler")
 
 s3 = boto3.client("s3")
 dynamodb = boto3.resource("dynamodb")
@@ -10,6 +13,7 @@ BUCKET_NAME = os.environ["BUCKET_NAME"]
 TABLE_NAME = os.environ["TABLE_NAME"]
 table = dynamodb.Table(TABLE_NAME)
 
+@log_invocation
 def main(event, context):
     filename = event["arguments"]["filename"]
     user_sub = event["identity"]["sub"]
@@ -32,6 +36,7 @@ def main(event, context):
         "status": "uploading"
     })
 
+    log.info("upload_url_issued", file_id=file_id, user_sub=user_sub)
     return {
         "uploadUrl": url,
         "fileId": file_id,
@@ -1,49 +1,120 @@
 import os
 import boto3
-import json
+from itertools import islice
 from pinecone import Pinecone
-from langchain.embeddings import BedrockEmbeddings  # Simplified example
-from utils.text_extraction import extract_text  # You would implement this
+from utils.chunk_manifest import chunk_digest, chunk_vector_id, is_newer, load_manifest, save_manifest
+from utils.embedding_cache import EmbeddingCache, titan_embedder
+from utils.logs import get_logger, log_invocation
+from utils.s3_stream import iter_object, open_object
+from utils.secrets_cache import CachedSecret, SecretClient
+from utils.text_extraction import is_pdf, iter_chunks, iter_pages
+from utils.vector_upsert import VectorUpserter, chunk_metadata, delete_vectors
+
+log = get_logger("upload_vectorize_handler")
 
 s3 = boto3.client("s3")
 dynamodb = boto3.resource("dynamodb")
-secrets = boto3.client("secretsmanager")
+bedrock_runtime = boto3.client("bedrock-runtime", region_name="us-east-1")
 
 TABLE_NAME = os.environ["TABLE_NAME"]
 PINECONE_SECRET_NAME = os.environ["PINECONE_SECRET_NAME"]
+PINECONE_INDEX_NAME = os.environ.get("PINECONE_INDEX_NAME", "talk-with-docs")
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v1"
+EMBED_CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "8"))
+# Chunks held in memory at once: extracted, waiting for or being embedded
+EMBED_WINDOW = int(os.environ.get("EMBED_WINDOW", "256"))
 table = dynamodb.Table(TABLE_NAME)
 
+# Re-uploaded files re-use the embeddings of unchanged chunks
+embedding_cache = EmbeddingCache(
+    EMBEDDING_MODEL_ID,
+    titan_embedder(bedrock_runtime, EMBEDDING_MODEL_ID),
+    table_name=os.environ.get("EMBEDDING_CACHE_TABLE")
+)
+
+# One secret fetch and one Pinecone client per container, not per record
+pinecone_secret = CachedSecret(PINECONE_SECRET_NAME)
+pinecone_index = SecretClient(pinecone_secret, lambda api_key: Pinecone(api_key=api_key).Index(PINECONE_INDEX_NAME))
+
+def stale_vector_ids(index, file_id, manifest, digests):
+    if manifest.exists:
+        return [chunk_vector_id(file_id, d) for d in manifest.digests - digests]
+    # Ingested before manifests existed (positional `{file_id}-{i}` ids):
+    # list what is in the index instead
+    keep = {chunk_vector_id(file_id, d) for d in digests}
+    return [vector_id for page in index.list(prefix=f"{file_id}-")
+            for vector_id in page if vector_id not in keep]
+
+def ingest(record, index):
+    bucket = record["s3"]["bucket"]["name"]
+    key = record["s3"]["object"]["key"]
+    version_id = record["s3"]["object"].get("versionId")
+    sequencer = record["s3"]["object"].get("sequencer")
+    user_sub, file_id, filename = key.split("/", 2)
+
+    # Chunks already in the index from a previous version of this file
+    manifest = load_manifest(table, user_sub, file_id)
+    if not is_newer(sequencer, manifest.sequencer):
+        log.info("ingest_skipped", s3_key=key, reason="newer_version_ingested")
+        return
+
+    # Read the object in ranged parts and chunk it as pages arrive; later
+    # parts download while earlier pages are extracted and embedded. PDFs are
+    # read through a seekable reader, since pypdf starts at the end of the file
+    if is_pdf(filename):
+        source = open_object(s3, bucket, key, version_id=version_id)
+    else:
+        source = iter_object(s3, bucket, key, version_id=version_id)
+    chunks = iter_chunks(iter_pages(source, filename))
+
+    # Embed in parallel only the chunks the index doesn't have yet;
+    # batches are upserted in the background as they fill up
+    digests = set()
+    with VectorUpserter(index) as upserter:
+        while True:
+            window = list(islice(chunks, EMBED_WINDOW))
+            if not window:
+                break
+            fresh = []
+            for chunk in window:
+                digest = chunk_digest(file_id, chunk.text)
+                if digest not in digests and digest not in manifest.digests:
+                    fresh.append((digest, chunk))
+                digests.add(digest)
+
+            texts = [chunk.text for _, chunk in fresh]
+            for i, values in embedding_cache.embed_iter(texts, concurrency=EMBED_CONCURRENCY):
+                digest, chunk = fresh[i]
+                upserter.add({
+                    "id": chunk_vector_id(file_id, digest),
+                    "values": values,
+                    "metadata": chunk_metadata(file_id, user_sub, chunk.text, chunk.page)
+                })
+
+    if not digests:
+        raise Exception("Text extraction failed")
+
+    # Drop chunks that disappeared, only after the new ones are in place
+    deleted = delete_vectors(index, stale_vector_ids(index, file_id, manifest, digests))
+    if not save_manifest(table, user_sub, file_id, digests, sequencer, version_id):
+        log.warning("manifest_superseded", file_id=file_id)
+
+    # Mark as processed
+    table.update_item(
+        Key={"pk": user_sub, "sk": f"doc#{file_id}"},
+        UpdateExpression="SET #s = :s",
+        ExpressionAttributeNames={"#s": "status"},
+        ExpressionAttributeValues={":s": "vectorized"}
+    )
+
+    log.info("ingested", file_id=file_id, **upserter.stats(),
+             chunks=len(digests), unchanged=len(digests & manifest.digests), deleted=deleted)
+
+@log_invocation
 def main(event, context):
     for record in event["Records"]:
-        bucket = record["s3"]["bucket"]["name"]
-        key = record["s3"]["object"]["key"]
-        user_sub, file_id, filename = key.split("/", 2)
-
-        # Download file from S3
-        obj = s3.get_object(Bucket=bucket, Key=key)
-        file_bytes = obj["Body"].read()
-
-        # Extract text (you'll implement this)
-        text = extract_text(file_bytes, filename)
-        if not text:
-            raise Exception("Text extraction failed")
-
-        # Get Pinecone API key
-        pinecone_key = secrets.get_secret_value(SecretId=PINECONE_SECRET_NAME)["SecretString"]
-        pc = Pinecone(api_key=pinecone_key)
-        index = pc.Index("talk-with-docs")
-
-        # Embed and upload
-        embedder = BedrockEmbeddings(model="amazon.titan-embed-text-v1")
-        chunks = text.split("\n\n")  # Simplistic chunking
-        vectors = [{"id": f"{file_id}-{i}", "values": embedder.embed(chunk)} for i, chunk in enumerate(chunks)]
-
-        index.upsert(vectors)
-
-        # Mark as processed
-        table.update_item(
-            Key={"pk": user_sub, "sk": f"doc#{file_id}"},
-            UpdateExpression="SET #s = :s",
-            ExpressionAttributeNames={"#s": "status"},
-            ExpressionAttributeValues={":s": "vectorized"}
-        )
+        # Retried once with a re-fetched key if Pinecone rejects it (rotation)
+        pinecone_index.call(lambda index: ingest(record, index))
+
+    log.info("invocation_stats", embedding_cache=embedding_cache.stats(),
+             pinecone_secret_fetches=pinecone_secret.fetches)
@@ -0,0 +1,98 @@
+# utils/chunk_manifest.py
+# Per-document record of which chunks are in the vector index, so a new
+# version of an upload only embeds and upserts what changed.
+#
+# Vector ids are content-addressed: `{doc_id}-{digest}` where digest is a
+# hash of the document id and the chunk's normalized text. The page number
+# is only stored as vector metadata, so inserting or removing a page leaves
+# the chunks around it with the same id; they are skipped, and only chunks
+# whose digest is gone from the new version are deleted from the index.
+# Identical chunks within a document share one vector.
+#
+# The digests are stored next to the document row in the docs table
+# (pk=user, sk=chunks#{doc_id}), packed 8 bytes per chunk to stay well under
+# DynamoDB's 400 KB item limit. The S3 event `sequencer` is stored with them
+# so a late event for an older version cannot overwrite a newer manifest.
+import hashlib
+from dataclasses import dataclass, field
+from typing import Optional, Set
+
+from botocore.exceptions import ClientError
+
+from .embedding_cache import normalize_text
+
+DIGEST_BYTES = 8
+SEQUENCER_WIDTH = 32
+
+
+def chunk_digest(doc_id: str, text: str) -> str:
+    key = f"{doc_id}\n{normalize_text(text)}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:DIGEST_BYTES * 2]
+
+
+def chunk_vector_id(doc_id: str, digest: str) -> str:
+    return f"{doc_id}-{digest}"
+
+
+def _pad_sequencer(sequencer: str) -> str:
+    # S3 sequencers are hex strings of varying length; right-pad with zeros so
+    # they compare correctly as plain strings (also inside DynamoDB conditions)
+    return sequencer.upper().ljust(SEQUENCER_WIDTH, "0")
+
+
+def is_newer(sequencer: Optional[str], than: Optional[str]) -> bool:
+    if not sequencer or not than:
+        return True
+    return _pad_sequencer(sequencer) > _pad_sequencer(than)
+
+
+@dataclass
+class ChunkManifest:
+    digests: Set[str] = field(default_factory=set)
+    sequencer: Optional[str] = None
+    version_id: Optional[str] = None
+    exists: bool = False
+
+
+def load_manifest(table, user_id: str, doc_id: str) -> ChunkManifest:
+    item = table.get_item(Key={"pk": user_id, "sk": f"chunks#{doc_id}"}).get("Item")
+    if not item:
+        return ChunkManifest()
+
+    raw = item.get("digests", b"")
+    raw = getattr(raw, "value", raw)  # boto3 Binary wrapper
+    digests = {raw[i:i + DIGEST_BYTES].hex() for i in range(0, len(raw), DIGEST_BYTES)}
+    return ChunkManifest(
+        digests=digests,
+        sequencer=item.get("sequencer"),
+        version_id=item.get("version_id"),
+        exists=True
+    )
+
+
+def save_manifest(table, user_id: str, doc_id: str, digests: Set[str],
+                  sequencer: Optional[str] = None, version_id: Optional[str] = None) -> bool:
+    """Store the digests; False if a newer version's manifest is already there."""
+    item = {
+        "pk": user_id,
+        "sk": f"chunks#{doc_id}",
+        "digests": b"".join(bytes.fromhex(d) for d in sorted(digests)),
+        "chunk_count": len(digests),
+    }
+    kwargs = {}
+    if sequencer:
+        item["sequencer"] = _pad_sequencer(sequencer)
+        kwargs = {
+            "ConditionExpression": "attribute_not_exists(sequencer) OR sequencer < :s",
+            "ExpressionAttributeValues": {":s": item["sequencer"]},
+        }
+    if version_id:
+        item["version_id"] = version_id
+
+    try:
+        table.put_item(Item=item, **kwargs)
+        return True
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") == "ConditionalCheckFailedException":
+            return False
+        raise
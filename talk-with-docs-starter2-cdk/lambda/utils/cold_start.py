@@ -0,0 +1,51 @@
+# utils/cold_start.py
+# Cold-start phase timing. With COLD_START_TIMING=1 the handler records how
+# long its imports and each lazy initialization took and logs one `cold_start`
+# event at the end of the first invocation in a container, whether or not it
+# succeeded:
+#   {"event": "cold_start", "import_ms": ..., "pinecone_client_ms": ..., "total_ms": ...}
+# Off by default; when disabled nothing is recorded or logged. Like any info
+# event it is subject to LOG_SAMPLE_RATE.
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from .logs import get_logger
+
+log = get_logger("cold_start")
+
+COLD_START_TIMING = os.environ.get("COLD_START_TIMING") == "1"
+
+
+class ColdStartTimer:
+    def __init__(self, started: Optional[float] = None, enabled: bool = COLD_START_TIMING):
+        self.enabled = enabled
+        self.started = started if started is not None else time.perf_counter()
+        self.phases = {}
+        self.reported = False
+        self._lock = threading.Lock()
+
+    def mark(self, name: str, since: float) -> None:
+        if self.enabled:
+            with self._lock:
+                self.phases[f"{name}_ms"] = round((time.perf_counter() - since) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.mark(name, start)
+
+    def report(self) -> None:
+        """Log the phases once, at the end of the first invocation."""
+        if not self.enabled or self.reported:
+            return
+        self.reported = True
+        with self._lock:
+            phases = dict(self.phases)
+        phases["total_ms"] = round((time.perf_counter() - self.started) * 1000, 1)
+        log.info("cold_start", **phases)
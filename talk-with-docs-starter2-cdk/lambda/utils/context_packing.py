@@ -0,0 +1,122 @@
+# utils/context_packing.py
+# Select which retrieved chunks go into the prompt.
+#
+# Overlapping or near-identical chunks inflate input tokens (latency and cost)
+# without adding information. Candidates are:
+#   1. dropped below CONTEXT_MIN_SCORE,
+#   2. picked greedily by maximal marginal relevance (MMR), skipping any chunk
+#      at least CONTEXT_DEDUP_THRESHOLD similar to one already picked,
+#   3. packed until CONTEXT_TOKEN_BUDGET or CONTEXT_MAX_CHUNKS is reached.
+#
+# The budget has to fit CONTEXT_MAX_CHUNKS full-size chunks: ingestion cuts
+# chunks at CHUNK_MAX_CHARS (~1000 tokens at the default 4000), and a PDF page
+# is often a single chunk, so a smaller budget would quietly pack fewer chunks
+# than the top-5 sent before packing. By default it is derived from the two;
+# set CONTEXT_TOKEN_BUDGET only to cap prompt size deliberately.
+#
+# Chunk-to-chunk similarity is the cosine of the chunk vectors when the match
+# carries them (`include_values=True`), otherwise word-set Jaccard.
+import math
+import os
+from typing import List, Optional, Tuple
+
+from .text_extraction import CHUNK_MAX_CHARS
+
+CONTEXT_MIN_SCORE = float(os.environ.get("CONTEXT_MIN_SCORE", "0.3"))
+CONTEXT_DEDUP_THRESHOLD = float(os.environ.get("CONTEXT_DEDUP_THRESHOLD", "0.95"))
+CONTEXT_MMR_LAMBDA = float(os.environ.get("CONTEXT_MMR_LAMBDA", "0.7"))
+CONTEXT_MAX_CHUNKS = int(os.environ.get("CONTEXT_MAX_CHUNKS", "5"))
+BASELINE_TOP_K = 5  # what was sent before packing: top-5 verbatim
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+# Room for CONTEXT_MAX_CHUNKS chunks of CHUNK_MAX_CHARS each
+CONTEXT_TOKEN_BUDGET = int(os.environ.get(
+    "CONTEXT_TOKEN_BUDGET", str((CHUNK_MAX_CHARS // 4 + 1) * CONTEXT_MAX_CHUNKS)
+))
+
+
+def _get(match, key):
+    # Pinecone ScoredVector objects and plain dicts (local index) both appear here
+    if isinstance(match, dict):
+        return match.get(key)
+    return getattr(match, key, None)
+
+
+class _Candidate:
+    def __init__(self, match):
+        self.match = match
+        self.text = (_get(match, "metadata") or {}).get("text", "")
+        self.score = float(_get(match, "score") or 0.0)
+        self.tokens = estimate_tokens(self.text)
+        self.words = set(self.text.lower().split())
+
+        values = _get(match, "values")
+        self.unit: Optional[List[float]] = None
+        if values is not None and len(values):
+            values = [float(v) for v in values]
+            norm = math.sqrt(sum(v * v for v in values)) or 1.0
+            self.unit = [v / norm for v in values]
+
+    def similarity(self, other: "_Candidate") -> float:
+        if self.unit is not None and other.unit is not None:
+            return sum(a * b for a, b in zip(self.unit, other.unit))
+        if not self.words or not other.words:
+            return 0.0
+        return len(self.words & other.words) / len(self.words | other.words)
+
+
+def pack_context(matches,
+                 token_budget: int = CONTEXT_TOKEN_BUDGET,
+                 min_score: float = CONTEXT_MIN_SCORE,
+                 dedup_threshold: float = CONTEXT_DEDUP_THRESHOLD,
+                 mmr_lambda: float = CONTEXT_MMR_LAMBDA,
+                 max_chunks: int = CONTEXT_MAX_CHUNKS) -> Tuple[list, dict]:
+    """Return (selected matches, report) for the given retrieval matches."""
+    candidates = sorted((_Candidate(m) for m in matches), key=lambda c: c.score, reverse=True)
+    baseline_tokens = sum(c.tokens for c in candidates[:BASELINE_TOP_K])
+
+    report = {
+        "candidates": len(candidates),
+        "dropped_low_score": 0,
+        "dropped_duplicates": 0,
+        "dropped_budget": 0,
+    }
+
+    pool = []
+    for c in candidates:
+        if not c.text or c.score < min_score:
+            report["dropped_low_score"] += 1
+        else:
+            pool.append(c)
+
+    selected: List[_Candidate] = []
+    used = 0
+    # Max similarity of each candidate to anything selected so far, updated
+    # only against the newest pick (each pair is compared at most once)
+    redundancy = {id(c): 0.0 for c in pool}
+    while pool and len(selected) < max_chunks:
+        best = max(pool, key=lambda c: mmr_lambda * c.score - (1 - mmr_lambda) * redundancy[id(c)])
+        pool.remove(best)
+
+        if redundancy[id(best)] >= dedup_threshold:
+            report["dropped_duplicates"] += 1
+        elif used + best.tokens > token_budget:
+            report["dropped_budget"] += 1
+        else:
+            selected.append(best)
+            used += best.tokens
+            for c in pool:
+                redundancy[id(c)] = max(redundancy[id(c)], c.similarity(best))
+
+    report.update({
+        "selected": len(selected),
+        "packed_tokens": used,
+        "baseline_tokens": baseline_tokens,
+        "tokens_saved": baseline_tokens - used,
+    })
+    return [c.match for c in selected], report
@@ -0,0 +1,253 @@
+# utils/embedding_cache.py
+# Content-addressed cache for Titan embeddings, shared by the chat and
+# ingestion Lambdas.
+#
+# Entries are keyed by sha256(model id + whitespace-normalized text), so the
+# same chunk or question is only ever embedded once per model:
+#   1. In-process LRU (survives across invocations of a warm container)
+#   2. Optional DynamoDB table (EMBEDDING_CACHE_TABLE) shared by all Lambdas
+import hashlib
+import json
+import os
+import struct
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import boto3
+from botocore.exceptions import ClientError
+
+from .logs import get_logger
+
+log = get_logger("embedding_cache")
+
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+DDB_BATCH_GET_LIMIT = 100
+DDB_MAX_RETRIES = 3
+SHARED_WRITE_BATCH = 100
+EMBED_MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "6"))
+EMBED_RETRY_BASE_SECONDS = float(os.environ.get("EMBED_RETRY_BASE_SECONDS", "0.25"))
+EMBED_RETRY_MAX_SECONDS = float(os.environ.get("EMBED_RETRY_MAX_SECONDS", "8"))
+THROTTLING_ERROR_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def content_hash(model_id: str, text: str) -> str:
+    return hashlib.sha256(f"{model_id}\n{text}".encode("utf-8")).hexdigest()
+
+
+def retry_throttled(fn: Callable, max_retries: int = EMBED_MAX_RETRIES,
+                    base_delay: float = EMBED_RETRY_BASE_SECONDS,
+                    max_delay: float = EMBED_RETRY_MAX_SECONDS) -> Callable:
+    """Retry `fn` on Bedrock throttling with full-jitter exponential backoff.
+
+    Parallel ingestion hits the account's tokens-per-minute quota long before
+    botocore's built-in retries give up, so throttled calls back off here
+    instead of failing the whole document.
+    """
+    def call(*args, **kwargs):
+        for attempt in range(max_retries + 1):
+            try:
+                return fn(*args, **kwargs)
+            except ClientError as e:
+                code = e.response.get("Error", {}).get("Code")
+                if code not in THROTTLING_ERROR_CODES or attempt == max_retries:
+                    raise
+                time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+    return call
+
+
+def titan_embedder(bedrock_runtime, model_id: str) -> Callable[[str], List[float]]:
+    @retry_throttled
+    def embed(text: str) -> List[float]:
+        response = bedrock_runtime.invoke_model(
+            modelId=model_id,
+            contentType="application/json",
+            accept="application/json",
+            body=json.dumps({ "inputText": text })
+        )
+        body = json.loads(response["body"].read())
+        return body["embedding"]
+    return embed
+
+
+class EmbeddingCache:
+    def __init__(self,
+                 model_id: str,
+                 embed_fn: Callable[[str], List[float]],
+                 table_name: Optional[str] = None,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_id = model_id
+        self.embed_fn = embed_fn
+        self.table_name = table_name
+        self.max_entries = max_entries
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._dynamodb = None
+
+        self.counters = {
+            "memory_hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "shared_errors": 0,
+        }
+
+    def embed(self, text: str) -> List[float]:
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str], concurrency: int = 1) -> List[List[float]]:
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        for i, vector in self.embed_iter(texts, concurrency):
+            results[i] = vector
+        return results
+
+    def embed_iter(self, texts: List[str], concurrency: int = 1) -> Iterator[Tuple[int, List[float]]]:
+        """Yield (position, vector) for `texts` as each one becomes available.
+
+        Cache hits come first; misses are embedded by up to `concurrency`
+        threads and yielded in completion order, not input order.
+        """
+        normalized = [normalize_text(t) for t in texts]
+        keys = [content_hash(self.model_id, t) for t in normalized]
+        positions: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            positions.setdefault(key, []).append(i)
+
+        # 1. In-process tier. Hits are yielded only after the lock is released:
+        # the caller may use this cache (or wait on threads that do) in between.
+        missing = []
+        hits = []
+        with self._lock:
+            for key in positions:
+                vector = self._memory.get(key)
+                if vector is None:
+                    missing.append(key)
+                    continue
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                hits.append((key, vector))
+        for key, vector in hits:
+            for i in positions[key]:
+                yield i, vector
+
+        # 2. Shared tier
+        if missing and self.table_name:
+            shared = self._shared_get(missing)
+            for key, vector in shared.items():
+                self._remember(key, vector)
+                for i in positions[key]:
+                    yield i, vector
+            self.counters["shared_hits"] += len(shared)
+            missing = [key for key in missing if key not in shared]
+
+        # 3. Model
+        if not missing:
+            return
+        text_by_key = {key: normalized[positions[key][0]] for key in missing}
+        computed = {}
+        for key, vector in self._compute(missing, text_by_key, concurrency):
+            computed[key] = vector
+            self._remember(key, vector)
+            self.counters["misses"] += 1
+            if self.table_name and len(computed) >= SHARED_WRITE_BATCH:
+                self._shared_put(computed)
+                computed = {}
+            for i in positions[key]:
+                yield i, vector
+
+        if computed and self.table_name:
+            self._shared_put(computed)
+
+    def stats(self) -> dict:
+        hits = self.counters["memory_hits"] + self.counters["shared_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._memory),
+        }
+
+    # --- Internals ------------------------------------------------------
+
+    def _compute(self, keys: List[str], text_by_key: Dict[str, str],
+                 concurrency: int) -> Iterator[Tuple[str, List[float]]]:
+        if concurrency <= 1 or len(keys) == 1:
+            for key in keys:
+                yield key, self.embed_fn(text_by_key[key])
+            return
+
+        # At most `concurrency` requests in flight; the rest wait in the pool queue
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embed") as pool:
+            futures = {pool.submit(self.embed_fn, text_by_key[key]): key for key in keys}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], future.result()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _resource(self):
+        if self._dynamodb is None:
+            self._dynamodb = boto3.resource("dynamodb")
+        return self._dynamodb
+
+    def _shared_get(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        try:
+            for i in range(0, len(keys), DDB_BATCH_GET_LIMIT):
+                request = {self.table_name: {
+                    "Keys": [{"content_hash": k} for k in keys[i:i + DDB_BATCH_GET_LIMIT]],
+                    "ProjectionExpression": "content_hash, embedding"
+                }}
+                for attempt in range(DDB_MAX_RETRIES):
+                    if attempt:
+                        # Unprocessed keys mean throttling; back off like retry_throttled
+                        time.sleep(random.uniform(0, min(EMBED_RETRY_MAX_SECONDS,
+                                                         EMBED_RETRY_BASE_SECONDS * 2 ** attempt)))
+                    response = self._resource().batch_get_item(RequestItems=request)
+                    for item in response.get("Responses", {}).get(self.table_name, []):
+                        found[item["content_hash"]] = _unpack(item["embedding"])
+                    request = response.get("UnprocessedKeys")
+                    if not request:
+                        break
+        except Exception as e:
+            log.warning("embedding_cache_read_failed", error=str(e))
+            self.counters["shared_errors"] += 1
+        return found
+
+    def _shared_put(self, vectors: Dict[str, List[float]]) -> None:
+        try:
+            with self._resource().Table(self.table_name).batch_writer() as batch:
+                for key, vector in vectors.items():
+                    batch.put_item(Item={
+                        "content_hash": key,
+                        "model_id": self.model_id,
+                        "embedding": struct.pack(f"<{len(vector)}f", *vector)
+                    })
+        except Exception as e:
+            log.warning("embedding_cache_write_failed", error=str(e))
+            self.counters["shared_errors"] += 1
+
+
+def _unpack(raw) -> List[float]:
+    raw = getattr(raw, "value", raw)  # boto3 Binary wrapper
+    return list(struct.unpack(f"<{len(raw) // 4}f", raw))
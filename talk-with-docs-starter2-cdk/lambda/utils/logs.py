@@ -0,0 +1,215 @@
+# utils/logs.py
+# Structured, sampled, redacted logging for the Lambda handlers.
+#
+#   log = get_logger("guardduty_findings")
+#
+#   @log_invocation
+#   def main(event, context):
+#       log.info("batch_processed", messages=len(records), **counts)
+#
+# writes one JSON line per event, tagged with the invocation's request id:
+#   {"ts": "...", "level": "info", "logger": "guardduty_findings", "event": "batch_processed",
+#    "request_id": "...", "function": "...", "messages": 10, ...}
+#
+# - Non-blocking: a call only puts the record on a bounded queue; a listener
+#   thread formats and writes it. Handler threads (thread pools, parallel S3 and
+#   DynamoDB calls) don't wait on stdout. log_invocation drains the queue
+#   before returning, since a frozen container would otherwise hold the lines
+#   until its next invocation. When the queue is full, records are dropped and
+#   counted rather than blocking.
+# - Sampled per invocation: with LOG_SAMPLE_RATE below 1, only that share of
+#   invocations log debug/info events. Warnings and errors are always kept.
+# - Redacted: fields named in LOG_REDACT_FIELDS (at any depth) are replaced
+#   before anything is written.
+import atexit
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "1"))
+LOG_FLUSH_TIMEOUT_SECONDS = float(os.environ.get("LOG_FLUSH_TIMEOUT_SECONDS", "2"))
+LOG_REDACT_FIELDS = os.environ.get(
+    "LOG_REDACT_FIELDS",
+    "authorization,cookie,x_api_key,x_amz_security_token,password,secret,secret_string,token,api_key"
+)
+REDACTED = "[REDACTED]"
+# Parent of every logger from get_logger(); kept apart from the root logger,
+# which the Lambda runtime writes to in its own format
+LOGGER_ROOT = "handler"
+
+
+def _field_key(name: str) -> str:
+    return name.lower().replace("-", "_")
+
+
+REDACT_FIELDS = frozenset(_field_key(f) for f in LOG_REDACT_FIELDS.split(",") if f.strip())
+
+
+def redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: REDACTED if _field_key(str(k)) in REDACT_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+# One invocation runs at a time per container, and handlers log from their
+# worker threads too, so this is process-wide rather than a context variable
+_invocation: Dict[str, Any] = {}
+_sampled = True
+
+
+class JsonFormatter(logging.Formatter):
+    """Runs on the listener thread: redaction and serialization happen there."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name[len(LOGGER_ROOT) + 1:],
+            "event": record.getMessage(),
+        }
+        # Fields never override the keys above
+        for key, value in (getattr(record, "context", None) or {}).items():
+            entry.setdefault(key, value)
+        for key, value in redact(getattr(record, "fields", None) or {}).items():
+            entry.setdefault(key, value)
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so the record is handed over as is; formatting it here
+        # (the default) would put the JSON encoding back on the caller
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructLogger:
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(f"{LOGGER_ROOT}.{name}")
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info=None) -> None:
+        if level < logging.WARNING and not _sampled:
+            return
+        if not self._logger.isEnabledFor(level):
+            return
+        self._logger.log(level, event, exc_info=exc_info,
+                         extra={"fields": fields, "context": _invocation})
+
+    def debug(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, /, **fields: Any) -> None:
+        """error() with the traceback of the exception being handled."""
+        self._log(logging.ERROR, event, fields, exc_info=sys.exc_info())
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(name)
+
+
+def log_invocation(handler):
+    """Tag the handler's events with its request id, sample the invocation,
+    and write out everything it logged before returning."""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        global _invocation, _sampled
+        _invocation = {
+            "request_id": getattr(context, "aws_request_id", None),
+            "function": getattr(context, "function_name", None),
+        }
+        _sampled = LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
+        try:
+            return handler(event, context)
+        finally:
+            flush()
+            _invocation, _sampled = {}, True
+    return wrapper
+
+
+# --- Setup ------------------------------------------------------------------
+
+_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(_queue)
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def start_logging(stream=None) -> None:
+    """Route the handler loggers through the queue; `stream` defaults to stdout."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(JsonFormatter())
+        _listener = QueueListener(_queue, output)
+        _listener.start()
+
+        logger = logging.getLogger(LOGGER_ROOT)
+        logger.setLevel(LOG_LEVEL)
+        logger.addHandler(queue_handler)
+        logger.propagate = False  # the runtime's root handler would write it a second time
+
+
+def flush(timeout: float = LOG_FLUSH_TIMEOUT_SECONDS) -> None:
+    """Wait (up to `timeout` seconds) until every queued record is written."""
+    if _listener is None:
+        return
+    deadline = time.monotonic() + timeout
+    with _queue.all_tasks_done:
+        while _queue.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            _queue.all_tasks_done.wait(remaining)
+
+
+def stop_logging() -> None:
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger(LOGGER_ROOT).removeHandler(queue_handler)
+
+
+def log_stats() -> dict:
+    return {"queued": _queue.qsize(), "dropped": queue_handler.dropped}
+
+
+start_logging()
+atexit.register(stop_logging)
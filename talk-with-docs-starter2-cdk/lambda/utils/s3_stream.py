@@ -0,0 +1,136 @@
+# utils/s3_stream.py
+# Read an S3 object as a sequence of ranged GETs instead of one `.read()`.
+#
+# At most S3_PREFETCH_PARTS parts of S3_PART_SIZE bytes are downloading or
+# waiting to be consumed at any time, so memory stays flat regardless of the
+# object size. Downloads run in background threads and overlap with whatever
+# the caller does with the previous part. Every range is pinned to the ETag
+# seen by HeadObject, so an overwrite mid-read fails instead of mixing versions.
+#
+# `open_object` is the random-access variant for formats that can't be read
+# front to back (PDFs keep their cross-reference table at the end): a seekable,
+# read-only file object that fetches S3_PART_SIZE blocks on demand, keeps the
+# S3_CACHED_PARTS most recent ones, and prefetches the blocks after the one
+# being read.
+import io
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+
+S3_PART_SIZE = int(os.environ.get("S3_PART_SIZE", str(8 * 1024 * 1024)))
+S3_PREFETCH_PARTS = int(os.environ.get("S3_PREFETCH_PARTS", "2"))
+S3_CACHED_PARTS = int(os.environ.get("S3_CACHED_PARTS", "4"))
+
+
+def iter_object(s3, bucket: str, key: str,
+                version_id: Optional[str] = None,
+                part_size: int = S3_PART_SIZE,
+                prefetch: int = S3_PREFETCH_PARTS) -> Iterator[bytes]:
+    """Yield the object's bytes in order, `part_size` bytes at a time."""
+    target, size, etag = _head(s3, bucket, key, version_id)
+
+    def get_range(start: int) -> bytes:
+        return _get_range(s3, target, etag, start, min(start + part_size, size))
+
+    with ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix="s3-range") as pool:
+        pending = deque()
+        try:
+            for start in range(0, size, part_size):
+                pending.append(pool.submit(get_range, start))
+                if len(pending) >= prefetch:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def open_object(s3, bucket: str, key: str,
+                version_id: Optional[str] = None,
+                part_size: int = S3_PART_SIZE,
+                prefetch: int = S3_PREFETCH_PARTS,
+                cached: int = S3_CACHED_PARTS) -> io.BufferedReader:
+    """The object as a seekable binary file; close it to stop prefetching."""
+    raw = S3RangeReader(s3, bucket, key, version_id, part_size, prefetch, cached)
+    return io.BufferedReader(raw, buffer_size=64 * 1024)
+
+
+class S3RangeReader(io.RawIOBase):
+    def __init__(self, s3, bucket: str, key: str, version_id: Optional[str],
+                 part_size: int, prefetch: int, cached: int):
+        self._s3 = s3
+        self._target, self.size, self._etag = _head(s3, bucket, key, version_id)
+        self._part_size = part_size
+        self._prefetch = prefetch
+        self._cached = max(1, cached) + prefetch  # prefetched blocks aren't evicted first
+        self._blocks: "OrderedDict[int, object]" = OrderedDict()  # block -> Future
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix="s3-range")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        self._position = max(0, base + offset)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        if self._position >= self.size:
+            return 0
+        block, offset = divmod(self._position, self._part_size)
+        data = self._block(block).result()
+        count = min(len(buffer), len(data) - offset)
+        buffer[:count] = data[offset:offset + count]
+        self._position += count
+        return count
+
+    def close(self) -> None:
+        if not self.closed:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._blocks.clear()
+        super().close()
+
+    def _block(self, block: int):
+        blocks = self._part_count()
+        with self._lock:
+            for n in range(block, min(block + 1 + self._prefetch, blocks)):
+                if n in self._blocks:
+                    self._blocks.move_to_end(n)
+                else:
+                    start = n * self._part_size
+                    self._blocks[n] = self._pool.submit(
+                        _get_range, self._s3, self._target, self._etag,
+                        start, min(start + self._part_size, self.size)
+                    )
+            self._blocks.move_to_end(block)  # most recently read stays longest
+            while len(self._blocks) > self._cached:
+                self._blocks.popitem(last=False)[1].cancel()
+            return self._blocks[block]
+
+    def _part_count(self) -> int:
+        return -(-self.size // self._part_size)
+
+
+def _head(s3, bucket: str, key: str, version_id: Optional[str]):
+    target = {"Bucket": bucket, "Key": key}
+    if version_id:
+        target["VersionId"] = version_id
+    head = s3.head_object(**target)
+    return target, head["ContentLength"], head["ETag"]
+
+
+def _get_range(s3, target: dict, etag: str, start: int, end: int) -> bytes:
+    """Bytes [start, end) of the object, as long as it still has `etag`."""
+    response = s3.get_object(**target, Range=f"bytes={start}-{end - 1}", IfMatch=etag)
+    return response["Body"].read()
@@ -0,0 +1,157 @@
+# utils/secrets_cache.py
+# Per-container caching for Secrets Manager values and the clients built
+# from them, so nothing expensive runs at import time.
+#
+#   lazy(factory)          build on first use, once, thread-safe
+#   CachedSecret(id)       fetched on first get(); after SECRET_TTL_SECONDS the
+#                          cached value keeps being served while a background
+#                          thread refreshes it (stale-while-revalidate). Past
+#                          SECRET_MAX_STALE_SECONDS, get() blocks on a fetch.
+#   SecretClient(s, build) client rebuilt only when the secret value changes;
+#                          call() retries once with a re-fetched secret when
+#                          the service rejects the key (rotation)
+#
+# Instances live at module level, so every record and every warm invocation
+# in a container shares one fetch.
+import os
+import threading
+import time
+from typing import Any, Callable, Generic, Optional, TypeVar
+
+import boto3
+
+from .logs import get_logger
+
+log = get_logger("secrets_cache")
+
+SECRET_TTL_SECONDS = int(os.environ.get("SECRET_TTL_SECONDS", "300"))
+SECRET_MAX_STALE_SECONDS = int(os.environ.get("SECRET_MAX_STALE_SECONDS", "3600"))
+# Concurrent auth failures after a rotation trigger a single re-fetch
+SECRET_MIN_REFRESH_SECONDS = 5
+SECRET_RETRY_SECONDS = 30  # between failed background refreshes
+
+T = TypeVar("T")
+
+
+class lazy(Generic[T]):
+    def __init__(self, factory: Callable[[], T]):
+        self.factory = factory
+        self._lock = threading.Lock()
+        self._built = False
+        self._value: Optional[T] = None
+
+    def __call__(self) -> T:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._value = self.factory()
+                    self._built = True
+        return self._value
+
+    def reset(self) -> None:
+        with self._lock:
+            self._built = False
+            self._value = None
+
+
+secrets_client = lazy(lambda: boto3.client("secretsmanager"))
+
+
+def is_unauthorized(error: Exception) -> bool:
+    """True for 401/403 responses from Pinecone or botocore clients."""
+    status = getattr(error, "status", None)
+    response = getattr(error, "response", None)
+    if status is None and isinstance(response, dict):
+        status = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return status in (401, 403) or type(error).__name__ in ("UnauthorizedException", "ForbiddenException")
+
+
+class CachedSecret:
+    def __init__(self, secret_id: str,
+                 ttl: float = SECRET_TTL_SECONDS,
+                 max_stale: float = SECRET_MAX_STALE_SECONDS):
+        self.secret_id = secret_id
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+
+        self._lock = threading.Lock()
+        self._value: Optional[str] = None
+        self._fetched_at = 0.0
+        self._refreshing = False
+        self._next_attempt = 0.0
+        self.version_id: Optional[str] = None
+        self.fetches = 0
+
+    def get(self) -> str:
+        age = time.monotonic() - self._fetched_at
+        if self._value is None or age > self.max_stale:
+            with self._lock:
+                if self._value is None or time.monotonic() - self._fetched_at > self.max_stale:
+                    self._fetch()
+        elif age > self.ttl and time.monotonic() >= self._next_attempt:
+            self._refresh_in_background()
+        return self._value
+
+    def refresh(self) -> str:
+        """Re-fetch now, e.g. after the service rejected the cached value."""
+        with self._lock:
+            if time.monotonic() - self._fetched_at > SECRET_MIN_REFRESH_SECONDS:
+                previous = self.version_id
+                self._fetch()
+                if self.version_id != previous:
+                    log.info("secret_rotated", secret_id=self.secret_id, version_id=self.version_id)
+        return self._value
+
+    def _fetch(self) -> None:
+        response = secrets_client().get_secret_value(SecretId=self.secret_id)
+        self._value = response["SecretString"]
+        self.version_id = response.get("VersionId")
+        self._fetched_at = time.monotonic()
+        self.fetches += 1
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self) -> None:
+        try:
+            with self._lock:
+                self._fetch()
+        except Exception as e:
+            # Keep serving the cached value until max_stale; retry a bit later
+            log.warning("secret_refresh_failed", secret_id=self.secret_id, error=str(e))
+            self._next_attempt = time.monotonic() + SECRET_RETRY_SECONDS
+        finally:
+            self._refreshing = False
+
+
+class SecretClient(Generic[T]):
+    def __init__(self, secret: CachedSecret, build: Callable[[str], T]):
+        self.secret = secret
+        self.build = build
+        self._lock = threading.Lock()
+        self._key: Optional[str] = None
+        self._client: Optional[T] = None
+
+    def __call__(self) -> T:
+        value = self.secret.get()
+        if value != self._key:
+            with self._lock:
+                if value != self._key:
+                    self._client = self.build(value)
+                    self._key = value
+        return self._client
+
+    def call(self, fn: Callable[[T], Any]) -> Any:
+        """fn(client), retried once with a re-fetched secret if the key was rejected."""
+        try:
+            return fn(self())
+        except Exception as e:
+            if not is_unauthorized(e):
+                raise
+            log.warning("credentials_rejected", secret_id=self.secret.secret_id)
+            self.secret.refresh()
+            return fn(self())
@@ -0,0 +1,133 @@
+# utils/text_extraction.py
+# Incremental text extraction and chunking for the ingestion Lambda.
+#
+# `iter_pages` turns a document into (page, text) pieces and `iter_chunks`
+# cuts those into paragraph chunks as they arrive, so nothing holds the whole
+# document in memory:
+#   - Plain text comes as a stream of byte parts (utils/s3_stream.iter_object)
+#     and is decoded part by part; a piece may end mid-paragraph.
+#   - PDFs keep their cross-reference table at the end of the file, so they
+#     are read through a seekable file (utils/s3_stream.open_object): pypdf
+#     reads the trailer, then the byte ranges of each page as it is extracted,
+#     while the following blocks download. Byte parts are still accepted and
+#     spooled to /tmp first. Needs `pypdf` in the Lambda bundle.
+import codecs
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
+
+CHUNK_MAX_CHARS = int(os.environ.get("CHUNK_MAX_CHARS", "4000"))
+
+
+@dataclass
+class TextChunk:
+    index: int
+    text: str
+    page: Optional[int]  # 1-based PDF page; None for plain text
+
+
+def is_pdf(filename: str) -> bool:
+    return filename.lower().endswith(".pdf")
+
+
+def iter_pages(source: Union[BinaryIO, Iterable[bytes]], filename: str) -> Iterator[Tuple[Optional[int], str]]:
+    """`source` is an iterable of byte parts, or for PDFs a seekable binary file."""
+    if is_pdf(filename):
+        return _pdf_pages(source)
+    return _text_pieces(source)
+
+
+def _text_pieces(parts: Iterable[bytes]) -> Iterator[Tuple[Optional[int], str]]:
+    # Incremental so multi-byte characters split across parts decode correctly
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending_cr = False
+    for part in parts:
+        text = decoder.decode(part)
+        if pending_cr:
+            text = "\r" + text
+        pending_cr = text.endswith("\r")  # keep \r\n pairs together
+        if pending_cr:
+            text = text[:-1]
+        if text:
+            yield None, text.replace("\r\n", "\n")
+    tail = decoder.decode(b"", final=True) + ("\r" if pending_cr else "")
+    if tail:
+        yield None, tail.replace("\r\n", "\n")
+
+
+def _pdf_pages(source: Union[BinaryIO, Iterable[bytes]]) -> Iterator[Tuple[Optional[int], str]]:
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        raise RuntimeError("PDF extraction requires pypdf in the Lambda bundle")
+
+    if hasattr(source, "seek"):
+        with source:
+            yield from _read_pdf(PdfReader, source)
+        return
+
+    with tempfile.TemporaryFile() as spool:
+        for part in source:
+            spool.write(part)
+        spool.seek(0)
+        yield from _read_pdf(PdfReader, spool)
+
+
+def _read_pdf(reader_class, stream: BinaryIO) -> Iterator[Tuple[Optional[int], str]]:
+    for number, page in enumerate(reader_class(stream).pages, start=1):
+        yield number, page.extract_text() or ""
+
+
+def iter_chunks(pages: Iterable[Tuple[Optional[int], str]],
+                max_chars: int = CHUNK_MAX_CHARS) -> Iterator[TextChunk]:
+    """Split on blank lines; paragraphs over `max_chars` are cut at whitespace.
+
+    A PDF page always ends a paragraph. Plain-text pieces may end mid-paragraph,
+    so the unfinished tail is carried into the next piece (never more than
+    `max_chars`, which keeps memory bounded for text without blank lines).
+    """
+    index = 0
+    carry = ""
+    carry_page = None
+
+    def emit(text: str, page: Optional[int]):
+        nonlocal index
+        for piece in _split_long(text, max_chars):
+            if piece.strip():
+                yield TextChunk(index=index, text=piece, page=page)
+                index += 1
+
+    for page, text in pages:
+        if page is not None:
+            yield from emit(carry, carry_page)
+            carry = ""
+            for paragraph in text.split("\n\n"):
+                yield from emit(paragraph, page)
+            continue
+
+        paragraphs = (carry + text).split("\n\n")
+        carry = paragraphs.pop()
+        for paragraph in paragraphs:
+            yield from emit(paragraph, page)
+        while len(carry) > max_chars:
+            cut = _cut_point(carry, max_chars)
+            yield from emit(carry[:cut], page)
+            carry = carry[cut:]
+        carry_page = page
+
+    yield from emit(carry, carry_page)
+
+
+def _split_long(text: str, max_chars: int) -> Iterator[str]:
+    while len(text) > max_chars:
+        cut = _cut_point(text, max_chars)
+        yield text[:cut]
+        text = text[cut:]
+    yield text
+
+
+def _cut_point(text: str, max_chars: int) -> int:
+    cut = text.rfind(" ", 0, max_chars)
+    return cut + 1 if cut > 0 else max_chars
+
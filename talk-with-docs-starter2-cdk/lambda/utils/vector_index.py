@@ -0,0 +1,151 @@
+# utils/vector_index.py
+# In-process vector index for hot documents.
+#
+# A single document has at most a few thousand chunks, so brute-force top-k
+# over a contiguous float32 matrix of unit vectors is cheaper than a network
+# round trip to the remote vector store. Documents are loaded on first access
+# (in the background, while the caller falls back to the remote store) and
+# kept in an LRU bounded by LOCAL_INDEX_MAX_BYTES.
+#
+# numpy ships in the chat Lambda's layer (layers/numpy). Without it the index
+# stays disabled, logs a warning once per container, and every query goes to
+# the remote store.
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the Lambda bundle
+    np = None
+
+from .logs import get_logger
+
+log = get_logger("vector_index")
+
+LOCAL_INDEX_MAX_BYTES = int(os.environ.get("LOCAL_INDEX_MAX_BYTES", str(256 * 1024 * 1024)))
+LOCAL_INDEX_TTL_SECONDS = int(os.environ.get("LOCAL_INDEX_TTL_SECONDS", "600"))
+
+# (ids, vectors, metadata) for every chunk of a document
+DocumentVectors = Tuple[List[str], Sequence[Sequence[float]], List[dict]]
+
+
+class DocumentIndex:
+    def __init__(self, ids: List[str], vectors, metadata: List[dict]):
+        matrix = np.array(vectors, dtype=np.float32, order="C")  # own copy, normalized in place
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+
+        self.ids = ids
+        self.matrix = matrix
+        self.metadata = metadata
+        self.loaded_at = time.time()
+        self.nbytes = matrix.nbytes + sum(len(str(m)) for m in metadata)
+
+    def search(self, query, top_k: int) -> List[dict]:
+        if not self.ids:
+            return []
+        scores = self.matrix @ query
+        k = min(top_k, len(self.ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Same shape as Pinecone matches
+        return [
+            {"id": self.ids[i], "score": float(scores[i]), "metadata": self.metadata[i], "values": self.matrix[i]}
+            for i in top
+        ]
+
+
+class LocalVectorIndex:
+    def __init__(self,
+                 loader: Callable[[str], Optional[DocumentVectors]],
+                 max_bytes: int = LOCAL_INDEX_MAX_BYTES,
+                 ttl_seconds: int = LOCAL_INDEX_TTL_SECONDS):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = np is not None
+        if not self.enabled:
+            log.warning("local_index_disabled", reason="numpy_not_installed")
+
+        self._documents: "OrderedDict[str, DocumentIndex]" = OrderedDict()
+        self._loading = set()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.counters = {"hits": 0, "misses": 0, "loads": 0, "load_errors": 0, "evictions": 0}
+
+    def query(self, doc_id: str, embedding: List[float], top_k: int) -> Optional[List[dict]]:
+        """Top-k matches for a loaded document, or None if it isn't loaded."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            document = self._documents.get(doc_id)
+            if document is not None and time.time() - document.loaded_at > self.ttl_seconds:
+                self._evict(doc_id)
+                document = None
+            if document is None:
+                self.counters["misses"] += 1
+                return None
+            self._documents.move_to_end(doc_id)
+            self.counters["hits"] += 1
+
+        query = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query /= norm
+        return document.search(query, top_k)
+
+    def warm(self, doc_id: str) -> None:
+        """Load a document's vectors (no-op if loaded or already loading)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            if doc_id in self._documents or doc_id in self._loading:
+                return
+            self._loading.add(doc_id)
+
+        try:
+            loaded = self.loader(doc_id)
+            if loaded and self._add(doc_id, DocumentIndex(*loaded)):
+                self.counters["loads"] += 1
+        except Exception as e:
+            log.warning("local_index_load_failed", doc_id=doc_id, error=str(e))
+            self.counters["load_errors"] += 1
+        finally:
+            with self._lock:
+                self._loading.discard(doc_id)
+
+    def warm_async(self, doc_id: str) -> None:
+        if self.enabled:
+            threading.Thread(target=self.warm, args=(doc_id,), daemon=True).start()
+
+    def invalidate(self, doc_id: str) -> None:
+        with self._lock:
+            self._evict(doc_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self.counters, "documents": len(self._documents), "bytes": self._bytes}
+
+    # --- Internals ------------------------------------------------------
+
+    def _add(self, doc_id: str, document: DocumentIndex) -> bool:
+        if document.nbytes > self.max_bytes:
+            return False
+        with self._lock:
+            self._evict(doc_id)
+            while self._documents and self._bytes + document.nbytes > self.max_bytes:
+                self._evict(next(iter(self._documents)))
+                self.counters["evictions"] += 1
+            self._documents[doc_id] = document
+            self._bytes += document.nbytes
+        return True
+
+    def _evict(self, doc_id: str) -> None:
+        document = self._documents.pop(doc_id, None)
+        if document is not None:
+            self._bytes -= document.nbytes
@@ -0,0 +1,139 @@
+# utils/vector_upsert.py
+# Batched, parallel Pinecone upserts for the ingestion Lambda.
+#
+# Pinecone rejects upsert requests over 2 MB, so vectors are grouped into
+# batches capped by both count (UPSERT_BATCH_SIZE) and estimated request size
+# (UPSERT_MAX_BYTES). Up to UPSERT_CONCURRENCY batches are in flight; adding
+# more blocks until one finishes, so memory stays bounded. A failed batch is
+# retried on its own with jittered backoff instead of resending the document.
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import List, Optional
+
+from .logs import get_logger
+from .secrets_cache import is_unauthorized
+
+log = get_logger("vector_upsert")
+
+UPSERT_BATCH_SIZE = int(os.environ.get("UPSERT_BATCH_SIZE", "100"))
+UPSERT_MAX_BYTES = int(os.environ.get("UPSERT_MAX_BYTES", str(1900 * 1024)))  # under the 2 MB limit
+UPSERT_CONCURRENCY = int(os.environ.get("UPSERT_CONCURRENCY", "4"))
+UPSERT_MAX_RETRIES = int(os.environ.get("UPSERT_MAX_RETRIES", "4"))
+UPSERT_RETRY_BASE_SECONDS = 0.5
+DELETE_BATCH_SIZE = 1000  # Pinecone's limit on ids per delete request
+
+# JSON size of one float is at most ~20 characters ("-0.012345678901234567,")
+FLOAT_BYTES = 22
+REQUEST_OVERHEAD_BYTES = 64
+
+
+def chunk_metadata(doc_id: str, user_id: str, text: str, page: Optional[int]) -> dict:
+    """Metadata read back by chat_handler (`doc_id` filter, `text` context)."""
+    metadata = {"doc_id": doc_id, "user_id": user_id, "text": text}
+    if page is not None:
+        metadata["page"] = page  # Pinecone rejects null metadata values
+    return metadata
+
+
+def estimate_vector_bytes(vector: dict) -> int:
+    size = len(vector["id"]) + len(vector["values"]) * FLOAT_BYTES + 48
+    if vector.get("metadata"):
+        size += len(json.dumps(vector["metadata"], ensure_ascii=False).encode("utf-8"))
+    return size
+
+
+def delete_vectors(index, ids: List[str], namespace: Optional[str] = None) -> int:
+    kwargs = {"namespace": namespace} if namespace else {}
+    for i in range(0, len(ids), DELETE_BATCH_SIZE):
+        index.delete(ids=ids[i:i + DELETE_BATCH_SIZE], **kwargs)
+    return len(ids)
+
+
+class VectorUpserter:
+    def __init__(self,
+                 index,
+                 namespace: Optional[str] = None,
+                 max_count: int = UPSERT_BATCH_SIZE,
+                 max_bytes: int = UPSERT_MAX_BYTES,
+                 concurrency: int = UPSERT_CONCURRENCY,
+                 max_retries: int = UPSERT_MAX_RETRIES):
+        self.index = index
+        self.namespace = namespace
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upsert")
+        self._pending = set()
+        self._batch: List[dict] = []
+        self._batch_bytes = REQUEST_OVERHEAD_BYTES
+        self.counters = {"vectors": 0, "batches": 0, "bytes": 0, "retries": 0}
+        self._lock = threading.Lock()  # `retries` is updated from worker threads
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            for future in self._pending:
+                future.cancel()
+            self._pool.shutdown(wait=True)
+
+    def add(self, vector: dict) -> None:
+        size = estimate_vector_bytes(vector)
+        if self._batch and (len(self._batch) >= self.max_count
+                            or self._batch_bytes + size > self.max_bytes):
+            self._submit()
+        self._batch.append(vector)
+        self._batch_bytes += size
+
+    def flush(self) -> None:
+        """Send the partial batch and wait for everything in flight."""
+        if self._batch:
+            self._submit()
+        while self._pending:
+            self._wait_one()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counters)
+
+    # --- Internals ------------------------------------------------------
+
+    def _submit(self) -> None:
+        while len(self._pending) >= self.concurrency:
+            self._wait_one()
+        batch, size = self._batch, self._batch_bytes
+        self._batch, self._batch_bytes = [], REQUEST_OVERHEAD_BYTES
+        self._pending.add(self._pool.submit(self._send, batch))
+        self.counters["batches"] += 1
+        self.counters["vectors"] += len(batch)
+        self.counters["bytes"] += size
+
+    def _wait_one(self) -> None:
+        done, self._pending = wait(self._pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            future.result()  # re-raises a batch that ran out of retries
+
+    def _send(self, batch: List[dict]) -> None:
+        kwargs = {"namespace": self.namespace} if self.namespace else {}
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.index.upsert(vectors=batch, **kwargs)
+                return
+            except Exception as e:
+                # A rejected API key is not transient; SecretClient.call re-fetches it
+                if attempt == self.max_retries or is_unauthorized(e):
+                    raise
+                with self._lock:
+                    self.counters["retries"] += 1
+                log.warning("upsert_retry", vectors=len(batch), error=str(e))
+                time.sleep(random.uniform(0, UPSERT_RETRY_BASE_SECONDS * 2 ** attempt))
@@ -2,6 +2,8 @@
 
 from aws_cdk import (
     CfnOutput,
+    Duration,
+    RemovalPolicy,
     Stack,
     aws_s3 as s3,
     aws_bedrock as bedrock,
@@ -10,6 +12,9 @@ from aws_cdk import (
     aws_lambda as _lambda,
     aws_events as events,
     aws_events_targets as targets,
+    aws_dynamodb as dynamodb,
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources,
 )
 from constructs import Construct
 
@@ -62,20 +67,52 @@ class BedrockKnowledgeBaseStack(Stack):
             }
         )
 
-        # 3. Lambda function that starts the ingestion job
+        # 3. Coalescing state: ingestion lease, one record per job and one per
+        #    (document, job) pair
+        ingestion_jobs_table = dynamodb.Table(self, "IngestionJobsTable",
+            partition_key={"name": "pk", "type": dynamodb.AttributeType.STRING},
+            sort_key={"name": "sk", "type": dynamodb.AttributeType.STRING},
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at",
+            removal_policy=RemovalPolicy.DESTROY  # Use RETAIN in prod
+        )
+
+        # Upload events wait here; deferred batches come back after the
+        # visibility timeout, for up to max_receive_count tries (~6 hours).
+        # The timeout must cover 6x the function timeout plus the batching
+        # window (6 x 60 s + 60 s), or batches still being handled reappear.
+        ingestion_dlq = sqs.Queue(self, "IngestionRequestDLQ",
+            retention_period=Duration.days(14)
+        )
+        ingestion_queue = sqs.Queue(self, "IngestionRequestQueue",
+            visibility_timeout=Duration.minutes(7),
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=50, queue=ingestion_dlq)
+        )
+
+        # 4. Lambda function that starts the ingestion job
         ingestion_lambda = _lambda.Function(self, "StartIngestionJobLambda",
             runtime=_lambda.Runtime.PYTHON_3_12,
-            handler="handler.main",
-            code=_lambda.Code.from_asset("lambda/start_s3_ingestion_job"),
+            handler="start_s3_ingestion_job.handler.main",
+            code=_lambda.Code.from_asset("lambda"),  # with utils/
+            timeout=Duration.seconds(60),
             environment={
                 "KNOWLEDGE_BASE_ID": KNOWLEDGE_BASE_ID,
-                "DATA_SOURCE_ID": data_source.attr_data_source_id
+                "DATA_SOURCE_ID": data_source.attr_data_source_id,
+                "INGESTION_JOBS_TABLE": ingestion_jobs_table.table_name
             }
         )
 
-        # 4. Permissions
+        # A burst of uploads within the window becomes a single invocation
+        ingestion_lambda.add_event_source(lambda_event_sources.SqsEventSource(ingestion_queue,
+            batch_size=1000,
+            max_batching_window=Duration.seconds(60),
+            max_concurrency=2,
+            report_batch_item_failures=True
+        ))
+
+        # 5. Permissions
         ingestion_lambda.add_to_role_policy(iam.PolicyStatement(
-            actions=["bedrock-agent:StartIngestionJob"],
+            actions=["bedrock:StartIngestionJob", "bedrock:GetIngestionJob"],
             resources=[KNOWLEDGE_BASE_ARN]
         ))
 
@@ -89,8 +126,9 @@ class BedrockKnowledgeBaseStack(Stack):
         ))
 
         upload_bucket.grant_read(ingestion_lambda)
+        ingestion_jobs_table.grant_read_write_data(ingestion_lambda)
 
-        # 5. EventBridge Rule
+        # 6. EventBridge Rule
         rule = events.Rule(self, "S3PutObjectRule",
             event_pattern=events.EventPattern(
                 source=["aws.s3"],
@@ -103,10 +141,16 @@ class BedrockKnowledgeBaseStack(Stack):
             )
         )
 
-        rule.add_target(targets.LambdaFunction(ingestion_lambda))
+        rule.add_target(targets.SqsQueue(ingestion_queue))
+
+        # 7. Outputs
+        # For the server's retrieval (EKSServerStack)
+        self.knowledge_base_id = KNOWLEDGE_BASE_ID
+        self.knowledge_base_arn = knowledge_base.attr_knowledge_base_arn
 
-        # 6. Outputs
         CfnOutput(self, "UploadBucketName", value=upload_bucket.bucket_name)
         CfnOutput(self, "KnowledgeBaseID", value=KNOWLEDGE_BASE_ID)
         CfnOutput(self, "DataSourceID", value=data_source.attr_data_source_id)
-        CfnOutput(self, "IngestionLambdaName", value=ingestion_lambda.function_name)
\ No newline at end of file
+        CfnOutput(self, "IngestionLambdaName", value=ingestion_lambda.function_name)
+        CfnOutput(self, "IngestionJobsTableName", value=ingestion_jobs_table.table_name)
+        CfnOutput(self, "IngestionRequestQueueUrl", value=ingestion_queue.queue_url)
\ No newline at end of file
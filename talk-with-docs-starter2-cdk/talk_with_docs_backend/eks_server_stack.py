@@ -1,12 +1,24 @@
+from typing import Optional
+
 from aws_cdk import Stack
+from aws_cdk import aws_dynamodb as ddb
 from aws_cdk import aws_ecr as ecr
 from aws_cdk import aws_eks as eks
 from aws_cdk import aws_ec2 as ec2
+from aws_cdk import aws_iam as iam
+from aws_cdk import aws_s3 as s3
 from aws_cdk import CfnOutput
 from constructs import Construct
 
 class EKSServerStack(Stack):
-    def __init__(self, scope: Construct, id: str, *, vpc: ec2.IVpc, cluster: eks.Cluster, **kwargs):
+    def __init__(self, scope: Construct, id: str, *, vpc: ec2.IVpc, cluster: eks.Cluster,
+                 document_metadata_table: Optional[ddb.ITable] = None,
+                 chat_message_table: Optional[ddb.ITable] = None,
+                 answer_cache_table: Optional[ddb.ITable] = None,
+                 upload_bucket: Optional[s3.IBucket] = None,
+                 knowledge_base_id: Optional[str] = None,
+                 knowledge_base_arn: Optional[str] = None,
+                 **kwargs):
         super().__init__(scope, id, **kwargs)
 
         app_labels = { "app": "fastapi-server" }
@@ -15,6 +27,59 @@ class EKSServerStack(Stack):
         repo = ecr.Repository.from_repository_name(self, "FastAPIRepo", "fastapi-server")
         repo.grant_pull(cluster.role)
 
+        # Pod identity (IRSA): AWS permissions and the env vars that point at them
+        service_account = eks.ServiceAccount(self, "FastAPIServiceAccount",
+            cluster=cluster,
+            name="fastapi-server"
+        )
+        env = {"AWS_REGION": self.region}
+
+        # /chat answers, history summaries and answer-cache embeddings
+        models = {
+            "BEDROCK_MODEL_ID": "anthropic.claude-3-sonnet-20240229-v1:0",
+            "HISTORY_SUMMARY_MODEL_ID": "anthropic.claude-3-haiku-20240307-v1:0",
+            "EMBEDDING_MODEL_ID": "amazon.titan-embed-text-v1",
+        }
+        env.update(models)
+        service_account.add_to_principal_policy(iam.PolicyStatement(
+            actions=["bedrock:InvokeModel", "bedrock:InvokeModelWithResponseStream"],
+            resources=[f"arn:aws:bedrock:{self.region}::foundation-model/{model_id}"
+                       for model_id in models.values()]
+        ))
+
+        if upload_bucket is not None:
+            # Presigned PUTs and multipart uploads (create/complete/abort) are
+            # signed with the pod's credentials
+            env["UPLOAD_BUCKET_NAME"] = upload_bucket.bucket_name
+            upload_bucket.grant_put(service_account)
+
+        if document_metadata_table is not None:
+            env["DDB_TABLE"] = document_metadata_table.table_name
+            document_metadata_table.grant_read_write_data(service_account)
+            # Push-based upload status (app/status_events.py) reads the table's stream
+            if document_metadata_table.table_stream_arn:
+                env["DDB_STREAM_ARN"] = document_metadata_table.table_stream_arn
+                document_metadata_table.grant_stream_read(service_account)
+
+        if chat_message_table is not None:
+            # Conversation history (app/history.py) reads the session GSI and
+            # writes each exchange; the grant covers the table's indexes
+            env["CHAT_MESSAGE_TABLE"] = chat_message_table.table_name
+            chat_message_table.grant_read_write_data(service_account)
+
+        if answer_cache_table is not None:
+            # Shared tier of the semantic answer cache (app/answer_cache.py)
+            env["ANSWER_CACHE_TABLE"] = answer_cache_table.table_name
+            answer_cache_table.grant_read_write_data(service_account)
+
+        if knowledge_base_id is not None:
+            # Retrieval that grounds /chat answers (app/retrieval.py)
+            env["KNOWLEDGE_BASE_ID"] = knowledge_base_id
+            service_account.add_to_principal_policy(iam.PolicyStatement(
+                actions=["bedrock:Retrieve"],
+                resources=[knowledge_base_arn or "*"]
+            ))
+
         # 2️⃣ Add FastAPI Deployment
         cluster.add_manifest("FastAPIDeployment", {
             "apiVersion": "apps/v1",
@@ -32,11 +97,13 @@ class EKSServerStack(Stack):
                         "labels": app_labels
                     },
                     "spec": {
+                        "serviceAccountName": service_account.service_account_name,
                         "containers": [
                             {
                                 "name": "fastapi-server",
                                 "image": f"{repo.repository_uri}:latest",
-                                "ports": [{ "containerPort": 8000 }]
+                                "ports": [{ "containerPort": 8000 }],
+                                "env": [{ "name": k, "value": v } for k, v in env.items()]
                             }
                         ]
                     }
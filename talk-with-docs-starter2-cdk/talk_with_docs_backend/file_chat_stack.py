@@ -31,7 +31,25 @@ class FileChatStack(Stack):
             index_name="document_session_id-index",
             partition_key=ddb.Attribute(name="document_session_id", type=ddb.AttributeType.STRING)
         )
+        # Newest-first reads of a session's tail (conversation history for /chat)
+        self.chat_message_table.add_global_secondary_index(
+            index_name="document_session_id-created_at-index",
+            partition_key=ddb.Attribute(name="document_session_id", type=ddb.AttributeType.STRING),
+            sort_key=ddb.Attribute(name="created_at", type=ddb.AttributeType.STRING),
+            projection_type=ddb.ProjectionType.ALL
+        )
+
+        # AnswerCache Table (persistent tier of the server's semantic answer cache)
+        self.answer_cache_table = ddb.Table(
+            self, "AnswerCacheTable",
+            partition_key=ddb.Attribute(name="cache_key", type=ddb.AttributeType.STRING),
+            sort_key=ddb.Attribute(name="entry_id", type=ddb.AttributeType.STRING),
+            billing_mode=ddb.BillingMode.PAY_PER_REQUEST,
+            time_to_live_attribute="expires_at",
+            removal_policy=RemovalPolicy.DESTROY  # Cache contents are disposable
+        )
 
         # Outputs
         CfnOutput(self, "DocumentSessionTableName", value=self.document_session_table.table_name)
         CfnOutput(self, "ChatMessageTableName", value=self.chat_message_table.table_name)
+        CfnOutput(self, "AnswerCacheTableName", value=self.answer_cache_table.table_name)
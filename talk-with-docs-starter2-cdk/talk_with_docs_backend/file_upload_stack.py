@@ -9,7 +9,8 @@ from aws_cdk import (
     aws_lambda as _lambda, 
     aws_events as events, 
     aws_events_targets as targets,
-    aws_sqs as sqs
+    aws_sqs as sqs,
+    aws_lambda_event_sources as lambda_event_sources
 )
 
 from constructs import Construct
@@ -42,14 +43,19 @@ class FileUploadStack(Stack):
             removal_policy=RemovalPolicy.RETAIN,
             versioned=True,
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
-            cors=[cors_rule]
+            cors=[cors_rule],
+            # Multipart uploads that are never completed still store (and bill) their parts
+            lifecycle_rules=[s3.LifecycleRule(
+                abort_incomplete_multipart_upload_after=Duration.days(1)
+            )]
         )
 
-        # Final (clean) files bucket
+        # Final (clean) files bucket; the only bucket ingestion reads from
         self.final_bucket = s3.Bucket(
             self, "FinalBucket",
             removal_policy=RemovalPolicy.RETAIN,
             versioned=True,
+            event_bridge_enabled=True,  # Object Created -> Knowledge Base ingestion
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
             cors=[cors_rule]
         )
@@ -71,7 +77,9 @@ class FileUploadStack(Stack):
                 type=ddb.AttributeType.STRING
             ),
             billing_mode=ddb.BillingMode.PAY_PER_REQUEST,
-            removal_policy=RemovalPolicy.RETAIN
+            removal_policy=RemovalPolicy.RETAIN,
+            # Change feed for the server's push-based upload status (DDB_STREAM_ARN)
+            stream=ddb.StreamViewType.NEW_IMAGE
         )
 
         # Add GSI if you want to query by user_id
@@ -108,19 +116,34 @@ class FileUploadStack(Stack):
             removal_policy=RemovalPolicy.RETAIN,  # so we don't lose failed events
         )
 
+        # Findings are buffered here and processed in batches; messages whose
+        # update keeps failing move to the DLQ
+        self.guardduty_queue = sqs.Queue(
+            self, "GuardDutyFindingsQueue",
+            visibility_timeout=Duration.seconds(185),  # 6x the Lambda timeout + the batching window
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=self.guardduty_dlq)
+        )
+
         # Lambda to process GuardDuty findings
         self.guardduty_findings_lambda = _lambda.Function(
             self, "GuardDutyFindingsHandler",
             runtime=_lambda.Runtime.PYTHON_3_11,
-            handler="handler.main",
-            code=_lambda.Code.from_asset("lambda/guardduty_findings"),
+            handler="guardduty_findings.handler.main",
+            code=_lambda.Code.from_asset("lambda"),  # with utils/
             environment={
                 "DDB_TABLE": self.document_metadata_table.table_name,
+                "UPDATE_CONCURRENCY": "16",
             },
-            timeout=Duration.seconds(30),
-            dead_letter_queue=self.guardduty_dlq
+            timeout=Duration.seconds(30)
         )
 
+        self.guardduty_findings_lambda.add_event_source(lambda_event_sources.SqsEventSource(
+            self.guardduty_queue,
+            batch_size=100,
+            max_batching_window=Duration.seconds(5),
+            report_batch_item_failures=True
+        ))
+
         # Grant Lambda permission to update DynamoDB
         self.document_metadata_table.grant_write_data(self.guardduty_findings_lambda)
 
@@ -147,7 +170,61 @@ class FileUploadStack(Stack):
                     }
                 }
             ),
-            targets=[targets.LambdaFunction(self.guardduty_findings_lambda)]
+            targets=[targets.SqsQueue(self.guardduty_queue)]
+        )
+
+        # Promotion of scanned uploads: clean -> final bucket, infected -> quarantine
+        self.promotion_dlq = sqs.Queue(
+            self, "PromotionDLQ",
+            removal_policy=RemovalPolicy.RETAIN,
+        )
+        self.promotion_queue = sqs.Queue(
+            self, "PromotionQueue",
+            visibility_timeout=Duration.minutes(90),  # 6x the Lambda timeout, no batching window
+            dead_letter_queue=sqs.DeadLetterQueue(max_receive_count=5, queue=self.promotion_dlq)
+        )
+
+        self.promotion_lambda = _lambda.Function(
+            self, "PromoteScannedObjectHandler",
+            runtime=_lambda.Runtime.PYTHON_3_11,
+            handler="promote_scanned_object.handler.main",
+            code=_lambda.Code.from_asset("lambda"),  # with utils/
+            environment={
+                "DDB_TABLE": self.document_metadata_table.table_name,
+                "FINAL_BUCKET": self.final_bucket.bucket_name,
+                "QUARANTINE_BUCKET": self.quarantine_bucket.bucket_name,
+                "COPY_CONCURRENCY": "10",
+            },
+            memory_size=512,
+            timeout=Duration.minutes(15)  # multipart copies of multi-GB uploads
+        )
+
+        self.promotion_lambda.add_event_source(lambda_event_sources.SqsEventSource(
+            self.promotion_queue,
+            batch_size=5,
+            report_batch_item_failures=True
+        ))
+
+        self.upload_bucket.grant_read(self.promotion_lambda)
+        self.upload_bucket.grant_delete(self.promotion_lambda)
+        self.final_bucket.grant_put(self.promotion_lambda)
+        self.final_bucket.grant_delete(self.promotion_lambda)
+        self.quarantine_bucket.grant_put(self.promotion_lambda)
+        self.document_metadata_table.grant_write_data(self.promotion_lambda)
+
+        # One scan result per scanned object, clean or not
+        events.Rule(
+            self, "GuardDutyMalwareScanResultRule",
+            event_pattern=events.EventPattern(
+                source=["aws.guardduty"],
+                detail_type=["GuardDuty Malware Protection Object Scan Result"],
+                detail={
+                    "s3ObjectDetails": {
+                        "bucketName": [self.upload_bucket.bucket_name]
+                    }
+                }
+            ),
+            targets=[targets.SqsQueue(self.promotion_queue)]
         )
 
         # Add GSI to document_metadata_table to query by uploaded_at time
@@ -167,6 +244,10 @@ class FileUploadStack(Stack):
         CfnOutput(self, "FinalBucketName", value=self.final_bucket.bucket_name)
         CfnOutput(self, "QuarantineBucketName", value=self.quarantine_bucket.bucket_name)
         CfnOutput(self, "MetadataTableName", value=self.document_metadata_table.table_name)
+        CfnOutput(self, "MetadataTableStreamArn", value=self.document_metadata_table.table_stream_arn)
         CfnOutput(self, "GuardDutyDLQUrl", value=self.guardduty_dlq.queue_url)
+        CfnOutput(self, "GuardDutyFindingsQueueUrl", value=self.guardduty_queue.queue_url)
         CfnOutput(self, "GuardDutyFindingsLambdaName", value=self.guardduty_findings_lambda.function_name)
+        CfnOutput(self, "PromotionQueueUrl", value=self.promotion_queue.queue_url)
+        CfnOutput(self, "PromotionLambdaName", value=self.promotion_lambda.function_name)
 
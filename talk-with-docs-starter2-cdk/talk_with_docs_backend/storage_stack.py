@@ -1,4 +1,4 @@
-from aws_cdk import Stack, CfnOutput, RemovalPolicy
+from aws_cdk import Stack, CfnOutput, RemovalPolicy, Duration
 from aws_cdk import aws_s3 as s3
 from aws_cdk import aws_dynamodb as dynamodb
 from constructs import Construct
@@ -31,17 +31,31 @@ class StorageStack(Stack):
             removal_policy=RemovalPolicy.DESTROY  # Use RETAIN in prod
         )
 
+        # Content-addressed Titan embedding cache shared by the Lambdas
+        self.embedding_cache_table = dynamodb.Table(self, "EmbeddingCacheTable",
+            partition_key={"name": "content_hash", "type": dynamodb.AttributeType.STRING},
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            removal_policy=RemovalPolicy.DESTROY
+        )
+
         # Vectorization Lambda
         self.vectorize_fn = _lambda.Function(self, "UploadVectorizeHandler",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="upload_vectorize_handler.main",
             code=_lambda.Code.from_asset("lambda"),
+            # Large PDFs mean thousands of embedding calls, even in parallel
+            timeout=Duration.minutes(5),
             environment={
                 "TABLE_NAME": self.logs_table.table_name,
                 "PINECONE_SECRET_NAME": "prod/pinecone/api-key",
-                "PINECONE_INDEX_NAME": "talk-with-docs"
+                "PINECONE_INDEX_NAME": "talk-with-docs",
+                "EMBEDDING_CACHE_TABLE": self.embedding_cache_table.table_name,
+                "EMBED_CONCURRENCY": "8"
             }
         )
+        self.embedding_cache_table.grant_read_write_data(self.vectorize_fn)
+        self.logs_table.grant_read_write_data(self.vectorize_fn)  # status + chunk manifests
+        self.upload_bucket.grant_read(self.vectorize_fn)  # HeadObject + ranged GetObject(Version)
 
         self.vectorize_fn.add_permission("AllowS3Invoke",
             principal=iam.ServicePrincipal("s3.amazonaws.com"),
@@ -65,3 +79,4 @@ class StorageStack(Stack):
 
         CfnOutput(self, "UploadBucketName", value=self.upload_bucket.bucket_name)
         CfnOutput(self, "DocsTableName", value=self.logs_table.table_name)
+        CfnOutput(self, "EmbeddingCacheTableName", value=self.embedding_cache_table.table_name)
@@ -6,7 +6,9 @@ from aws_cdk import (
     aws_lambda as _lambda,
     aws_appsync as appsync,
     aws_iam as iam,
-    CfnOutput
+    BundlingOptions,
+    CfnOutput,
+    Duration
 )
 from constructs import Construct
 from aws_cdk.aws_s3_notifications import LambdaDestination
@@ -44,6 +46,12 @@ class TalkWithDocsBackendStack(Stack):
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
         )
 
+        # ✅ DynamoDB Table: content-addressed Titan embedding cache
+        embedding_cache_table = dynamodb.Table(self, "EmbeddingCacheTable",
+            partition_key={"name": "content_hash", "type": dynamodb.AttributeType.STRING},
+            billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST
+        )
+
         # ✅ AppSync API
         graphql_api = appsync.GraphqlApi(self, "DocsAPI",
             name="TalkWithDocsAPI",
@@ -68,15 +76,26 @@ class TalkWithDocsBackendStack(Stack):
             }
         )
 
+        # ✅ Lambda Layer: numpy for the chat handler's in-process vector index
+        numpy_layer = _lambda.LayerVersion(self, "NumpyLayer",
+            code=_lambda.Code.from_asset("layers/numpy", bundling=BundlingOptions(
+                image=_lambda.Runtime.PYTHON_3_12.bundling_image,
+                command=["bash", "-c", "pip install -r requirements.txt -t /asset-output/python"]
+            )),
+            compatible_runtimes=[_lambda.Runtime.PYTHON_3_12]
+        )
+
         # ✅ Lambda: Chat Handler
         chat_fn = _lambda.Function(self, "ChatHandler",
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="chat_handler.main",
             code=_lambda.Code.from_asset("lambda"),
+            layers=[numpy_layer],
             environment={
                 "TABLE_NAME": table.table_name,
                 "PINECONE_SECRET_NAME": "prod/pinecone/api-key",  # 👈 Match your Secrets Manager secret name
-                "PINECONE_INDEX_NAME": "talk-with-docs"
+                "PINECONE_INDEX_NAME": "talk-with-docs",
+                "EMBEDDING_CACHE_TABLE": embedding_cache_table.table_name
             }
         )
 
@@ -97,10 +116,14 @@ class TalkWithDocsBackendStack(Stack):
             runtime=_lambda.Runtime.PYTHON_3_12,
             handler="upload_vectorize_handler.main",
             code=_lambda.Code.from_asset("lambda"),
+            # Large PDFs mean thousands of embedding calls, even in parallel
+            timeout=Duration.minutes(5),
             environment={
                 "TABLE_NAME": table.table_name,
                 "PINECONE_SECRET_NAME": "prod/pinecone/api-key",
-                "PINECONE_INDEX_NAME": "talk-with-docs"
+                "PINECONE_INDEX_NAME": "talk-with-docs",
+                "EMBEDDING_CACHE_TABLE": embedding_cache_table.table_name,
+                "EMBED_CONCURRENCY": "8"
             }
         )
 
@@ -134,6 +157,9 @@ class TalkWithDocsBackendStack(Stack):
         bucket.grant_read_write(upload_fn)
         table.grant_read_write_data(upload_fn)
         table.grant_read_write_data(chat_fn)
+        embedding_cache_table.grant_read_write_data(chat_fn)
+        embedding_cache_table.grant_read_write_data(vectorize_fn)
+        bucket.grant_read(vectorize_fn)  # HeadObject + ranged GetObject(Version)
 
         # ✅ Add Lambda as AppSync Resolvers
         upload_ds = graphql_api.add_lambda_data_source("UploadDataSource", upload_fn)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Lambda code imports its helpers as the top-level `utils` package, as in the
+# Lambda runtime where lambda/ is the working directory
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "lambda"))
@@ -0,0 +1,88 @@
+from botocore.exceptions import ClientError
+
+from utils.chunk_manifest import (
+    chunk_digest,
+    chunk_vector_id,
+    is_newer,
+    load_manifest,
+    save_manifest,
+)
+
+
+class FakeTable:
+    """Enough of a DynamoDB Table for the manifest's get/put calls."""
+
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get((Key["pk"], Key["sk"]))
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeValues=None):
+        key = (Item["pk"], Item["sk"])
+        current = self.items.get(key)
+        if ConditionExpression and current and current.get("sequencer") \
+                and not current["sequencer"] < ExpressionAttributeValues[":s"]:
+            raise ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+        self.items[key] = Item
+
+
+def digests(doc_id, texts):
+    return {chunk_digest(doc_id, text) for text in texts}
+
+
+def test_digest_ignores_whitespace_but_not_document():
+    assert chunk_digest("doc", "Hello  world\n") == chunk_digest("doc", "Hello world")
+    assert chunk_digest("doc", "Hello world") != chunk_digest("other", "Hello world")
+    assert len(chunk_digest("doc", "Hello world")) == 16
+
+
+def test_inserted_page_only_adds_its_own_chunks():
+    before = digests("doc", ["intro", "methods", "results", "conclusion"])
+    after = digests("doc", ["intro", "new appendix", "methods", "results", "conclusion"])
+
+    assert after - before == digests("doc", ["new appendix"])  # embedded and upserted
+    assert before - after == set()  # nothing deleted
+
+
+def test_removed_page_only_deletes_its_own_chunks():
+    before = digests("doc", ["intro", "methods", "results"])
+    after = digests("doc", ["intro", "results"])
+
+    assert after - before == set()
+    stale = {chunk_vector_id("doc", d) for d in before - after}
+    assert stale == {chunk_vector_id("doc", chunk_digest("doc", "methods"))}
+
+
+def test_manifest_round_trip():
+    table = FakeTable()
+    stored = digests("doc", ["a", "b", "c"])
+
+    assert save_manifest(table, "user", "doc", stored, sequencer="0A1B", version_id="v1")
+    manifest = load_manifest(table, "user", "doc")
+
+    assert manifest.exists
+    assert manifest.digests == stored
+    assert manifest.version_id == "v1"
+    assert table.items[("user", "chunks#doc")]["chunk_count"] == 3
+
+
+def test_missing_manifest():
+    manifest = load_manifest(FakeTable(), "user", "doc")
+    assert not manifest.exists
+    assert manifest.digests == set()
+
+
+def test_older_event_does_not_overwrite_newer_manifest():
+    table = FakeTable()
+    assert save_manifest(table, "user", "doc", digests("doc", ["new"]), sequencer="0062E9")
+    assert not save_manifest(table, "user", "doc", digests("doc", ["old"]), sequencer="0062E8")
+    assert load_manifest(table, "user", "doc").digests == digests("doc", ["new"])
+
+
+def test_sequencers_compare_across_lengths():
+    assert is_newer("0062E99A", "0062E9")
+    assert not is_newer("0062E8FF", "0062E9")
+    assert is_newer("0062E9", None)
+    assert is_newer(None, "0062E9")
@@ -0,0 +1,81 @@
+from utils.context_packing import estimate_tokens, pack_context
+
+
+class ScoredVector:
+    """Attribute-style match, as returned by the Pinecone client."""
+
+    def __init__(self, id, score, text, values=None):
+        self.id = id
+        self.score = score
+        self.metadata = {"text": text}
+        self.values = values
+
+
+def match(id, score, text, values=None):
+    return {"id": id, "score": score, "metadata": {"text": text}, "values": values}
+
+
+def ids(selected):
+    return [m["id"] if isinstance(m, dict) else m.id for m in selected]
+
+
+def test_drops_low_scores_and_empty_text():
+    selected, report = pack_context(
+        [match("a", 0.9, "alpha"), match("b", 0.1, "beta"), match("c", 0.8, "")],
+        min_score=0.3
+    )
+    assert ids(selected) == ["a"]
+    assert report["dropped_low_score"] == 2
+
+
+def test_drops_near_duplicates():
+    selected, report = pack_context(
+        [match("a", 0.9, "alpha", [1.0, 0.0]),
+         match("a2", 0.89, "alpha again", [0.999, 0.01]),
+         match("b", 0.5, "beta", [0.0, 1.0])],
+        dedup_threshold=0.95, mmr_lambda=1.0
+    )
+    assert ids(selected) == ["a", "b"]
+    assert report["dropped_duplicates"] == 1
+
+
+def test_mmr_prefers_a_diverse_chunk_over_a_redundant_one():
+    matches = [
+        match("a", 0.90, "alpha", [1.0, 0.0]),
+        match("a-ish", 0.89, "alpha-ish", [0.9, 0.436]),  # ~0.9 similar to a
+        match("b", 0.80, "beta", [0.0, 1.0]),
+    ]
+    selected, _ = pack_context(matches, max_chunks=2, mmr_lambda=0.5, dedup_threshold=0.95)
+    assert ids(selected) == ["a", "b"]
+
+    # Relevance only: the top two scores win
+    selected, _ = pack_context(matches, max_chunks=2, mmr_lambda=1.0, dedup_threshold=0.95)
+    assert ids(selected) == ["a", "a-ish"]
+
+
+def test_falls_back_to_word_overlap_without_vectors():
+    selected, report = pack_context(
+        [ScoredVector("a", 0.9, "the quick brown fox"),
+         ScoredVector("b", 0.8, "the quick brown fox"),
+         ScoredVector("c", 0.7, "an unrelated sentence")],
+        dedup_threshold=0.95
+    )
+    assert ids(selected) == ["a", "c"]
+    assert report["dropped_duplicates"] == 1
+
+
+def test_stops_at_the_token_budget():
+    text = "x" * 400  # 101 tokens
+    selected, report = pack_context(
+        [match(str(i), 0.9 - i / 100, f"{i} {text}") for i in range(4)],
+        token_budget=250, dedup_threshold=1.1
+    )
+    assert ids(selected) == ["0", "1"]
+    assert report["dropped_budget"] == 2
+    assert report["packed_tokens"] <= 250
+    assert report["tokens_saved"] == report["baseline_tokens"] - report["packed_tokens"]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("") == 1
+    assert estimate_tokens("x" * 4000) == 1001
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from utils import secrets_cache
+from utils.secrets_cache import CachedSecret, SecretClient, is_unauthorized, lazy
+
+
+class FakeSecretsManager:
+    def __init__(self, value="key-1"):
+        self.value = value
+        self.version = 1
+        self.calls = 0
+        self.gate = None  # set: calls wait until it is released
+
+    def get_secret_value(self, SecretId):
+        if self.gate is not None:
+            self.gate.wait(2)
+        self.calls += 1
+        return {"SecretString": self.value, "VersionId": f"v{self.version}"}
+
+    def rotate(self, value):
+        self.value = value
+        self.version += 1
+
+
+class Unauthorized(Exception):
+    status = 401
+
+
+@pytest.fixture
+def secrets(monkeypatch):
+    fake = FakeSecretsManager()
+    monkeypatch.setattr(secrets_cache, "secrets_client", lazy(lambda: fake))
+    monkeypatch.setattr(secrets_cache, "SECRET_MIN_REFRESH_SECONDS", 0)
+    return fake
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_lazy_builds_once():
+    built = []
+    value = lazy(lambda: built.append(1) or object())
+    assert value() is value()
+    assert len(built) == 1
+    value.reset()
+    value()
+    assert len(built) == 2
+
+
+def test_secret_is_fetched_once_within_ttl(secrets):
+    secret = CachedSecret("prod/key", ttl=300)
+    assert secret.get() == "key-1"
+    assert secret.get() == "key-1"
+    assert secrets.calls == 1
+    assert secret.version_id == "v1"
+
+
+def test_stale_secret_is_served_while_refreshing(secrets):
+    secret = CachedSecret("prod/key", ttl=0, max_stale=300)
+    secret.get()
+    secrets.rotate("key-2")
+    secrets.gate = threading.Event()
+
+    assert secret.get() == "key-1"  # stale value, refresh started in the background
+    secrets.gate.set()
+    wait_for(lambda: secret.fetches == 2)
+    assert secret.get() == "key-2"
+
+
+def test_secret_past_max_stale_is_fetched_inline(secrets):
+    secret = CachedSecret("prod/key", ttl=0, max_stale=0)
+    secret.get()
+    secrets.rotate("key-2")
+    assert secret.get() == "key-2"
+
+
+def test_client_is_rebuilt_only_when_the_secret_changes(secrets):
+    secret = CachedSecret("prod/key", ttl=300)
+    client = SecretClient(secret, lambda key: {"key": key})
+
+    first = client()
+    assert client() is first
+
+    secrets.rotate("key-2")
+    secret.refresh()
+    assert client() == {"key": "key-2"}
+
+
+def test_rejected_key_is_refetched_and_retried_once(secrets):
+    secret = CachedSecret("prod/key", ttl=300)
+    client = SecretClient(secret, lambda key: key)
+    secret.get()
+    secrets.rotate("key-2")
+
+    seen = []
+
+    def call(key):
+        seen.append(key)
+        if key == "key-1":
+            raise Unauthorized()
+        return "ok"
+
+    assert client.call(call) == "ok"
+    assert seen == ["key-1", "key-2"]
+
+
+def test_key_rejected_twice_raises(secrets):
+    client = SecretClient(CachedSecret("prod/key", ttl=300), lambda key: key)
+    calls = []
+
+    def call(key):
+        calls.append(key)
+        raise Unauthorized()
+
+    with pytest.raises(Unauthorized):
+        client.call(call)
+    assert len(calls) == 2
+
+
+def test_other_errors_are_not_retried(secrets):
+    client = SecretClient(CachedSecret("prod/key"), lambda key: key)
+    calls = []
+
+    def call(key):
+        calls.append(key)
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        client.call(call)
+    assert len(calls) == 1
+    assert secrets.calls == 1
+
+
+def test_is_unauthorized():
+    assert is_unauthorized(Unauthorized())
+    assert is_unauthorized(ClientError(
+        {"Error": {"Code": "AccessDenied"}, "ResponseMetadata": {"HTTPStatusCode": 403}}, "GetObject"))
+    assert not is_unauthorized(ClientError(
+        {"Error": {"Code": "Throttling"}, "ResponseMetadata": {"HTTPStatusCode": 400}}, "GetObject"))
+    assert not is_unauthorized(ValueError())
@@ -0,0 +1,319 @@
+# app/answer_cache.py
+# Semantic answer cache for /chat.
+#
+# Users ask the same few questions about the same document ("summarize this",
+# "what are the key dates"). Answers are cached per (user_id, document_id) and
+# matched by cosine similarity of the question embedding, so a paraphrase of a
+# previous question is served without a new Claude generation.
+#
+# The scope also includes the document's ingest version: `ingest_version` on
+# its DocumentMetadata item, which the promotion Lambda bumps every time a
+# new upload of the document is promoted (or quarantined). Answers about an
+# older version are never served again and age out of the TTL.
+#
+# Tiers:
+#   1. In-process: LRU over all entries, TTL expiry, capped per document.
+#   2. Optional DynamoDB table (ANSWER_CACHE_TABLE) shared across replicas.
+#      A document's entries are loaded into memory on first use and
+#      re-read every ANSWER_CACHE_REFRESH_SECONDS.
+import math
+import os
+import struct
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+
+from .aws import aws_clients, run_aws
+from .embeddings import embed_text
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.92"))
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "5000"))
+ANSWER_CACHE_MAX_PER_DOCUMENT = int(os.getenv("ANSWER_CACHE_MAX_PER_DOCUMENT", "64"))
+ANSWER_CACHE_REFRESH_SECONDS = int(os.getenv("ANSWER_CACHE_REFRESH_SECONDS", "300"))
+ANSWER_CACHE_TABLE = os.getenv("ANSWER_CACHE_TABLE")
+
+Scope = Tuple[str, str, str]  # (user_id, document_id, ingest version)
+
+
+@dataclass
+class CacheEntry:
+    entry_id: str
+    query: str
+    embedding: List[float]  # unit length
+    answer: str
+    expires_at: float
+
+
+@dataclass
+class CacheLookup:
+    entry: Optional[CacheEntry]
+    embedding: Optional[List[float]]
+    similarity: float = 0.0
+    version: Optional[str] = None  # the document's ingest version at lookup time
+
+
+def normalize_query(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _unit(vector: List[float]) -> List[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _dot(a: List[float], b: List[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+class SemanticAnswerCache:
+    def __init__(
+        self,
+        embed: Callable[[str], Awaitable[List[float]]],
+        threshold: float = ANSWER_CACHE_THRESHOLD,
+        ttl_seconds: int = ANSWER_CACHE_TTL_SECONDS,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        max_per_document: int = ANSWER_CACHE_MAX_PER_DOCUMENT,
+        table=None,
+        documents=None
+    ):
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_per_document = max_per_document
+        self.table = table
+        self.documents = documents  # DocumentMetadata table; default: DDB_TABLE at call time
+
+        # Global LRU order (entry_id -> scope) and per-document entries
+        self._lru: "OrderedDict[str, Scope]" = OrderedDict()
+        self._scopes: Dict[Scope, "OrderedDict[str, CacheEntry]"] = {}
+        self._loaded_at: Dict[Scope, float] = {}
+        # (user_id, document_id) -> latest ingest version seen
+        self._versions: Dict[Tuple[str, str], str] = {}
+
+        self.counters = {
+            "hits_exact": 0,
+            "hits_semantic": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "errors": 0,
+        }
+
+    # --- Lookup ---------------------------------------------------------
+
+    async def lookup(self, user_id: str, document_id: str, query: str) -> CacheLookup:
+        try:
+            version = await self._document_version(document_id)
+        except Exception:
+            # Without the version a hit could be stale; skip the cache (and
+            # don't store the answer either)
+            log.exception("answer_cache_version_failed")
+            self.counters["errors"] += 1
+            self.counters["misses"] += 1
+            return CacheLookup(entry=None, embedding=None)
+
+        scope = (user_id, document_id, version)
+        self._drop_older_versions(scope)
+        await self._load_scope(scope)
+        entries = self._live_entries(scope)
+
+        # Exact (normalized) repeats skip the embedding call entirely
+        normalized = normalize_query(query)
+        for entry in entries:
+            if entry.query == normalized:
+                self._touch(scope, entry)
+                self.counters["hits_exact"] += 1
+                return CacheLookup(entry=entry, embedding=entry.embedding, similarity=1.0, version=version)
+
+        try:
+            embedding = _unit(await self.embed(query))
+        except Exception:
+            log.exception("answer_cache_embedding_failed")
+            self.counters["errors"] += 1
+            self.counters["misses"] += 1
+            return CacheLookup(entry=None, embedding=None, version=version)
+
+        best, best_score = None, 0.0
+        for entry in entries:
+            score = _dot(embedding, entry.embedding)
+            if score > best_score:
+                best, best_score = entry, score
+
+        if best is not None and best_score >= self.threshold:
+            self._touch(scope, best)
+            self.counters["hits_semantic"] += 1
+            return CacheLookup(entry=best, embedding=embedding, similarity=best_score, version=version)
+
+        self.counters["misses"] += 1
+        return CacheLookup(entry=None, embedding=embedding, similarity=best_score, version=version)
+
+    # --- Store ----------------------------------------------------------
+
+    async def store(self, user_id: str, document_id: str, version: str, query: str,
+                    embedding: List[float], answer: str) -> None:
+        scope = (user_id, document_id, version)
+        entry = CacheEntry(
+            entry_id=str(uuid.uuid4()),
+            query=normalize_query(query),
+            embedding=embedding,
+            answer=answer,
+            expires_at=time.time() + self.ttl_seconds
+        )
+        self._insert(scope, entry)
+        self.counters["stores"] += 1
+
+        if self.table is not None:
+            try:
+                await run_aws(self.table.put_item, Item=self._to_item(scope, entry))
+            except Exception:
+                log.exception("answer_cache_persist_failed")
+                self.counters["errors"] += 1
+
+    # --- Metrics --------------------------------------------------------
+
+    def stats(self) -> dict:
+        hits = self.counters["hits_exact"] + self.counters["hits_semantic"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._lru),
+            "documents": len(self._scopes),
+            "persistent": self.table is not None,
+        }
+
+    # --- Internals ------------------------------------------------------
+
+    async def _document_version(self, document_id: str) -> str:
+        documents = self.documents
+        if documents is None:
+            table_name = os.getenv("DDB_TABLE")
+            if not table_name:
+                raise RuntimeError("Missing DDB_TABLE environment variable")
+            documents = aws_clients.table(table_name)
+        response = await run_aws(
+            documents.get_item,
+            Key={"document_id": document_id},
+            ProjectionExpression="ingest_version"
+        )
+        # Documents promoted before versions were recorded count as version 0
+        return str(int(response.get("Item", {}).get("ingest_version", 0)))
+
+    def _drop_older_versions(self, scope: Scope) -> None:
+        document = scope[:2]
+        previous = self._versions.get(document)
+        self._versions[document] = scope[2]
+        if previous is None or previous == scope[2]:
+            return
+        old_scope = (*document, previous)
+        for entry_id in list(self._scopes.get(old_scope, {})):
+            self._remove(old_scope, entry_id)
+        self._loaded_at.pop(old_scope, None)
+
+    def _live_entries(self, scope: Scope) -> List[CacheEntry]:
+        entries = self._scopes.get(scope)
+        if not entries:
+            return []
+        now = time.time()
+        for entry_id in [e.entry_id for e in entries.values() if e.expires_at <= now]:
+            self._remove(scope, entry_id)
+            self.counters["expired"] += 1
+        return list(entries.values())
+
+    def _touch(self, scope: Scope, entry: CacheEntry) -> None:
+        self._lru.move_to_end(entry.entry_id)
+        self._scopes[scope].move_to_end(entry.entry_id)
+
+    def _insert(self, scope: Scope, entry: CacheEntry) -> None:
+        entries = self._scopes.setdefault(scope, OrderedDict())
+        entries[entry.entry_id] = entry
+        self._lru[entry.entry_id] = scope
+
+        while len(entries) > self.max_per_document:
+            self._remove(scope, next(iter(entries)))
+            self.counters["evictions"] += 1
+        while len(self._lru) > self.max_entries:
+            entry_id, oldest_scope = next(iter(self._lru.items()))
+            self._remove(oldest_scope, entry_id)
+            self.counters["evictions"] += 1
+
+    def _remove(self, scope: Scope, entry_id: str) -> None:
+        self._lru.pop(entry_id, None)
+        entries = self._scopes.get(scope)
+        if entries is not None:
+            entries.pop(entry_id, None)
+            if not entries:
+                del self._scopes[scope]
+
+    async def _load_scope(self, scope: Scope) -> None:
+        if self.table is None:
+            return
+        now = time.time()
+        if now - self._loaded_at.get(scope, 0) < ANSWER_CACHE_REFRESH_SECONDS:
+            return
+        self._loaded_at[scope] = now
+
+        try:
+            response = await run_aws(
+                self.table.query,
+                KeyConditionExpression=Key("cache_key").eq(self._cache_key(scope))
+            )
+        except Exception:
+            log.exception("answer_cache_load_failed")
+            self.counters["errors"] += 1
+            return
+
+        known = self._scopes.get(scope, {})
+        for item in response.get("Items", []):
+            if item["entry_id"] in known or float(item["expires_at"]) <= now:
+                continue
+            self._insert(scope, self._from_item(item))
+
+    @staticmethod
+    def _cache_key(scope: Scope) -> str:
+        return "#".join(scope)
+
+    def _to_item(self, scope: Scope, entry: CacheEntry) -> dict:
+        return {
+            "cache_key": self._cache_key(scope),
+            "entry_id": entry.entry_id,
+            "query": entry.query,
+            "embedding": struct.pack(f"<{len(entry.embedding)}f", *entry.embedding),
+            "answer": entry.answer,
+            "expires_at": int(entry.expires_at),  # DynamoDB TTL attribute
+        }
+
+    @staticmethod
+    def _from_item(item: dict) -> CacheEntry:
+        raw = item["embedding"]
+        raw = getattr(raw, "value", raw)  # boto3 Binary wrapper
+        return CacheEntry(
+            entry_id=item["entry_id"],
+            query=item["query"],
+            embedding=list(struct.unpack(f"<{len(raw) // 4}f", raw)),
+            answer=item["answer"],
+            expires_at=float(item["expires_at"])
+        )
+
+
+def _persistent_table():
+    if not ANSWER_CACHE_TABLE:
+        return None
+    return aws_clients.table(ANSWER_CACHE_TABLE)
+
+
+answer_cache: Optional[SemanticAnswerCache] = (
+    SemanticAnswerCache(embed=embed_text, table=_persistent_table())
+    if ANSWER_CACHE_ENABLED else None
+)
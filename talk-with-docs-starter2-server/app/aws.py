@@ -0,0 +1,242 @@
+# app/aws.py
+# Shared boto3 clients, and non-blocking access to them from the routes.
+#
+# boto3 has no native asyncio support, so every AWS call made from an
+# `async def` route is pushed onto a dedicated, bounded thread pool instead of
+# running on the uvicorn event loop. Long-lived Bedrock response streams get
+# their own pool so they can never starve short DynamoDB/S3 calls.
+#
+# Clients come from one factory (`aws_clients`), so each service has a single
+# client and connection pool per process, configured once:
+#   - max_pool_connections sized to the thread pools above. botocore's default
+#     is 10; past that, connections are opened per call and thrown away.
+#   - TCP keep-alive and adaptive retries (client-side rate limiting when
+#     AWS throttles)
+#   - connect/read timeouts per service: short for DynamoDB, long enough for
+#     Bedrock generations
+#   - per-call latency recorded in aws_call_duration_seconds (app/metrics.py)
+# Routes receive the factory through the `get_aws_clients` dependency, so
+# tests can swap it per app with app.dependency_overrides. Helpers built at
+# import time (retrieval, answer cache, history, status cache and stream feed)
+# hold the singleton itself: to replace every client, as the load test does,
+# assign app.aws.aws_clients before the rest of app is imported; the
+# dependency returns whatever is assigned there.
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+import boto3
+from botocore.config import Config
+
+from .metrics import track_aws_calls
+
+T = TypeVar("T")
+
+# Max concurrent request/response AWS calls (get_item, put_item, presign, ...)
+AWS_MAX_CONCURRENCY = int(os.getenv("AWS_MAX_CONCURRENCY", "32"))
+# Max concurrent reads from streaming responses (Bedrock response streams)
+AWS_STREAM_CONCURRENCY = int(os.getenv("AWS_STREAM_CONCURRENCY", "64"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=AWS_MAX_CONCURRENCY,
+    thread_name_prefix="aws-io"
+)
+_stream_executor = ThreadPoolExecutor(
+    max_workers=AWS_STREAM_CONCURRENCY,
+    thread_name_prefix="aws-stream"
+)
+
+_END = object()
+
+
+async def run_aws(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking boto3 call on the AWS executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, partial(fn, *args, **kwargs))
+
+
+async def iterate_aws(iterable: Iterable[T]) -> AsyncIterator[T]:
+    """Consume a blocking iterable (e.g. a Bedrock EventStream) without blocking the loop."""
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    while True:
+        item = await loop.run_in_executor(_stream_executor, next, iterator, _END)
+        if item is _END:
+            break
+        yield item
+
+
+def shutdown_aws_executors() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
+    _stream_executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Client factory ---------------------------------------------------------
+
+AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
+# Every pooled call runs on _executor; Bedrock response streams also hold a
+# connection while _stream_executor reads them
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv("AWS_MAX_POOL_CONNECTIONS", str(AWS_MAX_CONCURRENCY)))
+AWS_STREAM_POOL_CONNECTIONS = int(os.getenv(
+    "AWS_STREAM_POOL_CONNECTIONS", str(AWS_MAX_CONCURRENCY + AWS_STREAM_CONCURRENCY)
+))
+AWS_RETRY_MODE = os.getenv("AWS_RETRY_MODE", "adaptive")
+AWS_MAX_ATTEMPTS = int(os.getenv("AWS_MAX_ATTEMPTS", "4"))
+
+# (connect, read) seconds; override with e.g. AWS_TIMEOUT_DYNAMODB="1,5"
+SERVICE_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "dynamodb": (1, 5),
+    "dynamodbstreams": (1, 5),
+    "s3": (2, 15),
+    "bedrock-agent-runtime": (2, 10),
+    "bedrock-runtime": (2, 120),  # max wait for the first byte / next stream event
+}
+DEFAULT_TIMEOUT = (2, 30)
+STREAMING_SERVICES = {"bedrock-runtime"}
+
+
+def service_timeouts(service: str) -> Tuple[float, float]:
+    override = os.getenv("AWS_TIMEOUT_" + service.upper().replace("-", "_"))
+    if override:
+        connect, read = override.split(",")
+        return float(connect), float(read)
+    return SERVICE_TIMEOUTS.get(service, DEFAULT_TIMEOUT)
+
+
+class PoolMetrics:
+    """Per-service request concurrency against the connection pool size."""
+
+    def __init__(self, service: str, pool_size: int, client):
+        self.service = service
+        self.pool_size = pool_size
+        self.client = client
+        self.host = urlparse(client.meta.endpoint_url).hostname or ""
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.saturated = 0  # sent while every pooled connection was busy
+        self.overflows = 0  # connections discarded because the pool was full
+
+    def sent(self, **kwargs) -> None:
+        with self._lock:
+            if self.in_flight >= self.pool_size:
+                self.saturated += 1
+            self.in_flight += 1
+            self.requests += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def received(self, **kwargs) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def connections_in_use(self) -> Optional[int]:
+        # botocore doesn't expose its urllib3 pools; read them for metrics only
+        try:
+            pools = self.client._endpoint.http_session._manager.pools
+            return sum(pool.pool.maxsize - pool.pool.qsize()
+                       for pool in (pools[key] for key in pools.keys()) if pool.pool is not None)
+        except Exception:
+            return None
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "connections_in_use": self.connections_in_use(),
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "saturated_requests": self.saturated,
+            "pool_overflows": self.overflows,
+        }
+
+
+class _PoolOverflowCounter(logging.Handler):
+    # urllib3 only logs when it has to discard a connection for a full pool
+    def __init__(self, clients: "AwsClients"):
+        super().__init__(level=logging.WARNING)
+        self.clients = clients
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if not str(record.msg).startswith("Connection pool is full") or not record.args:
+            return
+        host = str(record.args[0])
+        for metrics in list(self.clients.metrics.values()):
+            if metrics.host and host.endswith(metrics.host):
+                metrics.overflows += 1
+                return
+
+
+class AwsClients:
+    def __init__(self, region: str = AWS_REGION):
+        self.region = region
+        self._session = boto3.session.Session(region_name=region)
+        self._lock = threading.RLock()  # boto3 sessions aren't thread-safe
+        self._clients: Dict[str, Any] = {}
+        self._resources: Dict[str, Any] = {}
+        self.metrics: Dict[str, PoolMetrics] = {}
+        logging.getLogger("urllib3.connectionpool").addHandler(_PoolOverflowCounter(self))
+
+    def config(self, service: str) -> Config:
+        connect_timeout, read_timeout = service_timeouts(service)
+        pool_size = AWS_STREAM_POOL_CONNECTIONS if service in STREAMING_SERVICES else AWS_MAX_POOL_CONNECTIONS
+        return Config(
+            region_name=self.region,
+            max_pool_connections=pool_size,
+            tcp_keepalive=True,
+            retries={"mode": AWS_RETRY_MODE, "total_max_attempts": AWS_MAX_ATTEMPTS},
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout
+        )
+
+    def client(self, service: str):
+        client = self._clients.get(service)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(service)
+                if client is None:
+                    if service == "dynamodb":
+                        # Tables and the low-level client share one pool
+                        client = self.resource("dynamodb").meta.client
+                    else:
+                        client = self._track(service, self._session.client(service, config=self.config(service)))
+                    self._clients[service] = client
+        return client
+
+    def resource(self, service: str):
+        resource = self._resources.get(service)
+        if resource is None:
+            with self._lock:
+                resource = self._resources.get(service)
+                if resource is None:
+                    resource = self._session.resource(service, config=self.config(service))
+                    self._track(service, resource.meta.client)
+                    self._resources[service] = resource
+        return resource
+
+    def table(self, name: str):
+        return self.resource("dynamodb").Table(name)
+
+    def _track(self, service: str, client):
+        metrics = PoolMetrics(service, client.meta.config.max_pool_connections, client)
+        client.meta.events.register("before-send", metrics.sent)
+        client.meta.events.register("response-received", metrics.received)
+        track_aws_calls(service, client)
+        self.metrics[service] = metrics
+        return client
+
+    def stats(self) -> dict:
+        return {service: metrics.stats() for service, metrics in self.metrics.items()}
+
+
+aws_clients = AwsClients()
+
+
+def get_aws_clients() -> AwsClients:
+    """FastAPI dependency; override with app.dependency_overrides in tests."""
+    return aws_clients  # looked up per call, so a reassigned singleton is used
@@ -0,0 +1,24 @@
+# app/embeddings.py
+# Titan text embeddings for server-side features (e.g. the semantic answer cache).
+import json
+import os
+from typing import List
+
+from .aws import aws_clients, run_aws
+
+EMBEDDING_MODEL_ID = os.getenv("EMBEDDING_MODEL_ID", "amazon.titan-embed-text-v1")
+
+
+def _embed(text: str) -> List[float]:
+    response = aws_clients.client("bedrock-runtime").invoke_model(
+        modelId=EMBEDDING_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps({"inputText": text})
+    )
+    body = json.loads(response["body"].read())
+    return body["embedding"]
+
+
+async def embed_text(text: str) -> List[float]:
+    return await run_aws(_embed, text)
@@ -0,0 +1,261 @@
+# app/history.py
+# Token-budgeted conversation history for multi-turn /chat.
+#
+# ChatMessage rows (FileChatStack.chat_message_table) are read newest-first
+# through the `document_session_id-created_at-index` GSI. Each session's
+# assembled window is cached in memory, so later turns only read rows newer
+# than the last one seen. Turns that no longer fit HISTORY_TOKEN_BUDGET are
+# folded into a rolling summary in the background, so the summary is
+# maintained incrementally instead of re-summarizing the whole conversation.
+#
+# /chat writes both turns of each exchange once the answer is complete
+# (record_exchange), in the background so the stream isn't held up by it.
+import asyncio
+import json
+import os
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, List, Optional
+
+from boto3.dynamodb.conditions import Key
+
+from .aws import aws_clients, run_aws
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+CHAT_MESSAGE_TABLE = os.getenv("CHAT_MESSAGE_TABLE")
+HISTORY_INDEX_NAME = "document_session_id-created_at-index"
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "2000"))
+HISTORY_TAIL_LIMIT = int(os.getenv("HISTORY_TAIL_LIMIT", "50"))
+HISTORY_MAX_SESSIONS = int(os.getenv("HISTORY_MAX_SESSIONS", "1000"))
+HISTORY_SUMMARY_MODEL_ID = os.getenv("HISTORY_SUMMARY_MODEL_ID", "anthropic.claude-3-haiku-20240307-v1:0")
+HISTORY_SUMMARY_MAX_TOKENS = int(os.getenv("HISTORY_SUMMARY_MAX_TOKENS", "300"))
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English text; close enough for budgeting
+    return len(text) // 4 + 1
+
+
+def utc_now() -> str:
+    # AWSDateTime; milliseconds keep the two turns of an exchange in order
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+@dataclass
+class Turn:
+    id: str
+    role: str  # 'user' or 'assistant'
+    content: str
+    created_at: str
+    tokens: int
+
+
+@dataclass
+class SessionWindow:
+    user_id: str
+    turns: List[Turn] = field(default_factory=list)
+    summary: str = ""
+    cursor: Optional[str] = None  # created_at of the newest row read
+    unsummarized: List[Turn] = field(default_factory=list)  # evicted, not yet in summary
+    summarizing: bool = False
+
+    def messages(self, current: str) -> List[dict]:
+        """Anthropic messages: alternating roles, starting with user, ending with `current`."""
+        turns = self.turns
+        # A client that stores the question before calling /chat (or a retry of
+        # a question whose answer failed) leaves it as the newest row already
+        if turns and turns[-1].role == "user" and turns[-1].content.strip() == current.strip():
+            turns = turns[:-1]
+
+        messages: List[dict] = []
+        for turn in turns:
+            if not messages and turn.role != "user":
+                continue
+            if messages and messages[-1]["role"] == turn.role:
+                messages[-1]["content"] += "\n\n" + turn.content
+            else:
+                messages.append({"role": turn.role, "content": turn.content})
+
+        if messages and messages[-1]["role"] == "user":
+            messages[-1]["content"] += "\n\n" + current
+        else:
+            messages.append({"role": "user", "content": current})
+        return messages
+
+    def summary_prompt(self) -> Optional[str]:
+        if not self.summary:
+            return None
+        return f"Summary of the earlier conversation:\n{self.summary}"
+
+
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+
+class HistoryManager:
+    def __init__(self,
+                 table,
+                 summarize: Optional[Summarizer] = None,
+                 token_budget: int = HISTORY_TOKEN_BUDGET,
+                 tail_limit: int = HISTORY_TAIL_LIMIT,
+                 max_sessions: int = HISTORY_MAX_SESSIONS):
+        self.table = table
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.tail_limit = tail_limit
+        self.max_sessions = max_sessions
+
+        self._sessions: "OrderedDict[str, SessionWindow]" = OrderedDict()
+        self._tasks = set()
+
+    async def load(self, session_id: str, user_id: str) -> SessionWindow:
+        window = self._sessions.get(session_id)
+        if window is None or window.user_id != user_id:
+            window = SessionWindow(user_id=user_id)
+            self._sessions[session_id] = window
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+        try:
+            rows = await self._read_tail(session_id, window.cursor)
+        except Exception:
+            log.exception("history_read_failed", session_id=session_id)
+            return window
+
+        seen = {t.id for t in window.turns}
+        for row in rows:
+            if row.get("user_id") != user_id or row["id"] in seen:
+                continue
+            content = row.get("content", "")
+            window.turns.append(Turn(
+                id=row["id"],
+                role=row.get("role", "user"),
+                content=content,
+                created_at=row["created_at"],
+                tokens=estimate_tokens(content)
+            ))
+            window.cursor = max(window.cursor or "", row["created_at"])
+
+        self._fit(window)
+        return window
+
+    def record_exchange(self, session_id: str, user_id: str, question: str,
+                        answer: str, asked_at: str) -> None:
+        """Store a completed question/answer pair without waiting for the writes."""
+        task = asyncio.create_task(self._record_exchange(session_id, user_id, question, answer, asked_at))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _record_exchange(self, session_id: str, user_id: str, question: str,
+                               answer: str, asked_at: str) -> None:
+        turns = [
+            Turn(id=str(uuid.uuid4()), role="user", content=question,
+                 created_at=asked_at, tokens=estimate_tokens(question)),
+            Turn(id=str(uuid.uuid4()), role="assistant", content=answer,
+                 created_at=utc_now(), tokens=estimate_tokens(answer)),
+        ]
+        try:
+            for turn in turns:
+                await run_aws(self.table.put_item, Item={
+                    "id": turn.id,
+                    "document_session_id": session_id,
+                    "user_id": user_id,
+                    "role": turn.role,
+                    "content": turn.content,
+                    "created_at": turn.created_at,
+                    "timestamp": turn.created_at
+                })
+        except Exception:
+            log.exception("history_write_failed", session_id=session_id)
+            return
+
+        # Keep the cached window current so the next load doesn't read them back
+        window = self._sessions.get(session_id)
+        if window is not None and window.user_id == user_id:
+            seen = {t.id for t in window.turns}
+            window.turns.extend(t for t in turns if t.id not in seen)
+            window.cursor = max(window.cursor or "", turns[-1].created_at)
+            self._fit(window)
+
+    def _fit(self, window: SessionWindow) -> None:
+        total = sum(t.tokens for t in window.turns)
+        while window.turns and total > self.token_budget:
+            evicted = window.turns.pop(0)
+            total -= evicted.tokens
+            window.unsummarized.append(evicted)
+
+        if window.unsummarized and self.summarize and not window.summarizing:
+            window.summarizing = True
+            task = asyncio.create_task(self._roll_summary(window))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _roll_summary(self, window: SessionWindow) -> None:
+        try:
+            while window.unsummarized:
+                batch, window.unsummarized = window.unsummarized, []
+                try:
+                    window.summary = await self.summarize(window.summary, batch)
+                except Exception:
+                    log.exception("history_summary_failed")
+                    window.unsummarized = batch + window.unsummarized  # retry next turn
+                    return
+        finally:
+            window.summarizing = False
+
+    async def _read_tail(self, session_id: str, cursor: Optional[str]) -> List[dict]:
+        condition = Key("document_session_id").eq(session_id)
+        if cursor:
+            condition = condition & Key("created_at").gt(cursor)
+
+        response = await run_aws(
+            self.table.query,
+            IndexName=HISTORY_INDEX_NAME,
+            KeyConditionExpression=condition,
+            ScanIndexForward=False,  # newest first
+            Limit=self.tail_limit
+        )
+        return list(reversed(response.get("Items", [])))
+
+
+def _summarize(previous: str, turns: List[Turn]) -> str:
+    transcript = "\n".join(f"{t.role}: {t.content}" for t in turns)
+    prompt = (
+        "Update the running summary of a conversation about a document with "
+        "the new messages below. Keep facts, names, numbers and open questions; "
+        "drop pleasantries. Reply with the updated summary only.\n\n"
+        f"<summary>\n{previous}\n</summary>\n\n<new_messages>\n{transcript}\n</new_messages>"
+    )
+    response = aws_clients.client("bedrock-runtime").invoke_model(
+        modelId=HISTORY_SUMMARY_MODEL_ID,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": HISTORY_SUMMARY_MAX_TOKENS,
+            "temperature": 0,
+            "messages": [{"role": "user", "content": prompt}]
+        })
+    )
+    content = json.loads(response["body"].read())
+    return content["content"][0]["text"]
+
+
+async def summarize_turns(previous: str, turns: List[Turn]) -> str:
+    return await run_aws(_summarize, previous, turns)
+
+
+def _history_table():
+    if not CHAT_MESSAGE_TABLE:
+        return None
+    return aws_clients.table(CHAT_MESSAGE_TABLE)
+
+
+_table = _history_table()
+history_manager: Optional[HistoryManager] = (
+    HistoryManager(_table, summarize=summarize_turns) if _table is not None else None
+)
@@ -0,0 +1,218 @@
+# app/logs.py
+# Structured logging that stays off the event loop.
+#
+#   log = get_logger(__name__)
+#   log.info("chat_request", document_id=document_id, message_chars=len(message))
+#
+# writes one JSON line per event:
+#   {"ts": "...", "level": "info", "logger": "app.routes.chat", "event": "chat_request",
+#    "request_id": "...", "path": "/chat", "document_id": "...", "message_chars": 42}
+#
+# - Non-blocking: a call only puts the record on a bounded queue. A listener
+#   thread formats it and writes it to stdout, so a slow log pipe never stalls
+#   a request. When the queue is full, records are dropped and counted rather
+#   than blocking.
+# - Sampled per route: LogContextMiddleware decides once per request whether
+#   its debug/info events are kept (LOG_SAMPLE_RATES, longest path prefix
+#   wins). Warnings and errors are always kept.
+# - Redacted: fields named in LOG_REDACT_FIELDS (at any depth, e.g. inside a
+#   headers dict) are replaced before anything is written.
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import traceback
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional, Tuple
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_SAMPLE_DEFAULT = float(os.getenv("LOG_SAMPLE_DEFAULT", "1"))
+# "<path prefix>=<rate>,...", e.g. "/check-upload-status=0.01,/chat=0.2"
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+LOG_REDACT_FIELDS = os.getenv(
+    "LOG_REDACT_FIELDS",
+    "authorization,cookie,set_cookie,x_api_key,x_amz_security_token,password,secret,token,api_key"
+)
+REDACTED = "[REDACTED]"
+
+
+def _parse_rates(spec: str) -> Tuple[Tuple[str, float], ...]:
+    rates = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        prefix, rate = entry.rsplit("=", 1)
+        rates.append((prefix.strip(), float(rate)))
+    # Longest prefix first
+    return tuple(sorted(rates, key=lambda r: len(r[0]), reverse=True))
+
+
+SAMPLE_RATES = _parse_rates(LOG_SAMPLE_RATES)
+
+
+def _field_key(name: str) -> str:
+    return name.lower().replace("-", "_")
+
+
+REDACT_FIELDS = frozenset(_field_key(f) for f in LOG_REDACT_FIELDS.split(",") if f.strip())
+
+
+def redact(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: REDACTED if _field_key(str(k)) in REDACT_FIELDS else redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [redact(v) for v in value]
+    return value
+
+
+def sample_rate(path: str) -> float:
+    for prefix, rate in SAMPLE_RATES:
+        if path.startswith(prefix):
+            return rate
+    return LOG_SAMPLE_DEFAULT
+
+
+# Per-request context, set by LogContextMiddleware. Outside a request
+# (background tasks) every event is kept.
+_request: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar("log_request", default=None)
+_sampled: contextvars.ContextVar[bool] = contextvars.ContextVar("log_sampled", default=True)
+
+
+class JsonFormatter(logging.Formatter):
+    """Runs on the listener thread: redaction and serialization happen there."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        # Fields never override the keys above
+        for key, value in (getattr(record, "context", None) or {}).items():
+            entry.setdefault(key, value)
+        for key, value in redact(getattr(record, "fields", None) or {}).items():
+            entry.setdefault(key, value)
+        if record.exc_info:
+            entry["exception"] = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so the record is handed over as is; formatting it here
+        # (the default) would put the JSON encoding back on the caller
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructLogger:
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info=None) -> None:
+        if level < logging.WARNING and not _sampled.get():
+            return
+        if not self._logger.isEnabledFor(level):
+            return
+        self._logger.log(level, event, exc_info=exc_info,
+                         extra={"fields": fields, "context": _request.get()})
+
+    def debug(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, /, **fields: Any) -> None:
+        self._log(logging.ERROR, event, fields)
+
+    def exception(self, event: str, /, **fields: Any) -> None:
+        """error() with the traceback of the exception being handled."""
+        self._log(logging.ERROR, event, fields, exc_info=sys.exc_info())
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(name)
+
+
+class LogContextMiddleware:
+    """Tags each request's events with a request id and path, and decides
+    whether its debug/info events are sampled in."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or ())
+        request_id = (headers.get(b"x-request-id") or headers.get(b"x-amzn-trace-id") or b"").decode("latin-1")
+        path = scope.get("path", "")
+        request_token = _request.set({"request_id": request_id or uuid.uuid4().hex[:16], "path": path})
+        rate = sample_rate(path)
+        sampled_token = _sampled.set(rate >= 1 or random.random() < rate)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _sampled.reset(sampled_token)
+            _request.reset(request_token)
+
+
+# --- Setup ------------------------------------------------------------------
+
+_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(_queue)
+_listener: Optional[QueueListener] = None
+
+
+def start_logging(stream=None) -> None:
+    """Route the `app` loggers through the queue; `stream` defaults to stdout."""
+    global _listener
+    if _listener is not None:
+        return
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(JsonFormatter())
+    _listener = QueueListener(_queue, output)
+    _listener.start()
+
+    logger = logging.getLogger("app")
+    logger.setLevel(LOG_LEVEL)
+    logger.addHandler(queue_handler)
+    logger.propagate = False  # uvicorn's own handlers would write it a second time
+
+
+def stop_logging() -> None:
+    """Write out whatever is queued and stop the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logging.getLogger("app").removeHandler(queue_handler)
+
+
+def log_stats() -> dict:
+    return {"queued": _queue.qsize(), "dropped": queue_handler.dropped}
+
+
+start_logging()
+atexit.register(stop_logging)
@@ -1,27 +1,27 @@
-from fastapi import FastAPI, Request
-from fastapi.responses import StreamingResponse
-import boto3
-import json
-import os
-from typing import Generator
+from fastapi import FastAPI
 
 # Routes (Relative Imports)
 from .routes.generate_upload_url import router as upload_router
 from .routes.check_upload_status import router as status_router
 from .routes.chat import router as chat_router
+from .routes.answer_cache_stats import router as answer_cache_stats_router
+from .routes.aws_client_stats import router as aws_client_stats_router
+from .routes.metrics import router as metrics_router
+from .aws import shutdown_aws_executors
+from .logs import LogContextMiddleware, stop_logging
+from .metrics import MetricsMiddleware
+from .status_events import start_status_feed, stop_status_feed
 
 from dotenv import load_dotenv
 load_dotenv()
 
 app = FastAPI()
-
-# Initialize Bedrock client
-bedrock = boto3.client(
-    service_name="bedrock-runtime",
-    region_name=os.getenv("AWS_REGION", "us-east-1")
-)
-
-MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(LogContextMiddleware)
+app.add_event_handler("startup", start_status_feed)
+app.add_event_handler("shutdown", stop_status_feed)
+app.add_event_handler("shutdown", shutdown_aws_executors)
+app.add_event_handler("shutdown", stop_logging)
 
 
 @app.get("/")
@@ -32,3 +32,6 @@ def root():
 app.include_router(upload_router)
 app.include_router(status_router)
 app.include_router(chat_router)
+app.include_router(answer_cache_stats_router)
+app.include_router(aws_client_stats_router)
+app.include_router(metrics_router)
@@ -0,0 +1,297 @@
+# app/metrics.py
+# In-process counters, gauges and histograms, served in the Prometheus text
+# format by GET /metrics (app/routes/metrics.py).
+#
+# Recording is meant to be cheap enough for the chat hot path (one call per
+# Bedrock chunk): label values are resolved once with .labels(...), and an
+# observation is a bisect over fixed buckets plus a few additions under a
+# lock. Observations also come from executor threads (botocore event hooks),
+# hence the locks.
+#
+# What is recorded:
+#   http_request_duration_seconds{method,route,status}  request start to last byte
+#   http_requests_in_flight
+#   aws_call_duration_seconds{service,operation}        per boto3 call, retries included
+#   bedrock_time_to_first_token_seconds                 invoke to first text delta
+#   bedrock_inter_token_seconds                         gap between text deltas
+#   chat_stream_duration_seconds{source}                first to last SSE byte
+#   chat_streams_in_flight
+#   chat_stream_bytes_total{source}                     SSE bytes written
+#   chat_streams_total{source,outcome}
+#
+# `source` is "bedrock" or "cache" (answers replayed from the answer cache).
+import bisect
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Seconds. Request/stream latencies span milliseconds to minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Token gaps and AWS calls sit well under a second
+FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str, **labels: str):
+        """The series for these label values; keep the result around on hot paths."""
+        key = tuple(map(str, values)) if values else tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _unlabeled(self):
+        return self._children.get(()) or self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(list(self._children.items()), key=lambda kv: kv[0]):
+            lines += child.render(self.name, self.labelnames, key)
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabeled().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabeled().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._unlabeled().dec(amount)
+
+    def set(self, value: float) -> None:
+        self._unlabeled().set(value)
+
+
+class _Buckets:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last: above the largest bound
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.total += value
+            self.count += 1
+
+    def render(self, name: str, labelnames, key) -> List[str]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.total, self.count
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.bounds + (math.inf,), counts):
+            cumulative += n
+            labels = _format_labels(labelnames + ("le",), key + (_format_value(bound),))
+            lines.append(f"{name}_bucket{labels} {cumulative}")
+        labels = _format_labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{name}_count{labels} {count}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _Buckets:
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabeled().observe(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency, start to last byte sent",
+    ("method", "route", "status")
+)
+requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests being handled")
+
+aws_call_duration = registry.histogram(
+    "aws_call_duration_seconds", "boto3 call latency including retries",
+    ("service", "operation"), FAST_BUCKETS
+)
+
+bedrock_ttft = registry.histogram(
+    "bedrock_time_to_first_token_seconds", "Bedrock invoke to first text delta"
+)
+bedrock_inter_token = registry.histogram(
+    "bedrock_inter_token_seconds", "Gap between consecutive Bedrock text deltas", buckets=FAST_BUCKETS
+)
+stream_duration = registry.histogram(
+    "chat_stream_duration_seconds", "Chat SSE stream duration", ("source",)
+)
+streams_in_flight = registry.gauge("chat_streams_in_flight", "Chat SSE streams open")
+stream_bytes = registry.counter("chat_stream_bytes_total", "Chat SSE bytes written", ("source",))
+streams_total = registry.counter(
+    "chat_streams_total", "Chat SSE streams by how they ended (complete, error, disconnect)",
+    ("source", "outcome")
+)
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware, so streaming responses pass through untouched.
+
+    Requests are labelled with the route template (/check-upload-status/{document_id}),
+    never the raw path, to keep the number of series bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec()
+            route = scope.get("route")
+            request_duration.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - start)
+
+
+def track_aws_calls(service: str, client) -> None:
+    """Record aws_call_duration_seconds for every call made with `client`."""
+    # Both hooks run on the calling thread; `context` is per call.
+    # after-call also fires for error responses, after-call-error for
+    # connection errors (it isn't given the operation model).
+    def before_call(model, context, **kwargs):
+        context["metrics_call"] = (model.name, time.perf_counter())
+
+    def after_call(context, **kwargs):
+        call = context.pop("metrics_call", None)
+        if call is not None:
+            operation, start = call
+            aws_call_duration.labels(service, operation).observe(time.perf_counter() - start)
+
+    client.meta.events.register("before-call", before_call)
+    client.meta.events.register("after-call", after_call)
+    client.meta.events.register("after-call-error", after_call)
+
+
+class StreamTimer:
+    """Bedrock TTFT and inter-token gaps for one response stream."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last: Optional[float] = None
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self.last is None:
+            bedrock_ttft.observe(now - self.started)
+        else:
+            bedrock_inter_token.observe(now - self.last)
+        self.last = now
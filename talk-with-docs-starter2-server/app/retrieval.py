@@ -0,0 +1,122 @@
+# app/retrieval.py
+# Retrieval stage for /chat: fetch the passages of the user's document that
+# are most relevant to the question before Claude is invoked.
+#
+# The default backend is the Bedrock Knowledge Base built by
+# `BedrockKnowledgeBaseStack`. Other vector stores can be plugged in with
+# `set_retriever()`. Retrieval runs under a latency budget: if it is slow or
+# fails, the chat falls back to answering without document context instead of
+# holding back the first token.
+import asyncio
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+from .aws import aws_clients, run_aws
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+KNOWLEDGE_BASE_ID = os.getenv("KNOWLEDGE_BASE_ID")
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+RETRIEVAL_TIMEOUT_MS = int(os.getenv("RETRIEVAL_TIMEOUT_MS", "800"))
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0"))
+
+
+@dataclass
+class Passage:
+    text: str
+    score: float
+    source: Optional[str] = None
+
+
+class Retriever:
+    """Base class for retrieval backends."""
+
+    async def retrieve(self, query: str, user_id: str, document_id: str, top_k: int) -> List[Passage]:
+        raise NotImplementedError
+
+
+class KnowledgeBaseRetriever(Retriever):
+    """Bedrock Knowledge Base `retrieve`, filtered to a single document."""
+
+    def __init__(self, knowledge_base_id: str, client=None):
+        self.knowledge_base_id = knowledge_base_id
+        self.client = client or aws_clients.client("bedrock-agent-runtime")
+
+    async def retrieve(self, query: str, user_id: str, document_id: str, top_k: int) -> List[Passage]:
+        # Uploads are keyed `{user_id}/{document_id}/{file_title}`, so the KB's
+        # built-in source URI scopes results to the requester's document
+        # without sidecar metadata files.
+        response = await run_aws(
+            self.client.retrieve,
+            knowledgeBaseId=self.knowledge_base_id,
+            retrievalQuery={"text": query},
+            retrievalConfiguration={
+                "vectorSearchConfiguration": {
+                    "numberOfResults": top_k,
+                    "filter": {
+                        "stringContains": {
+                            "key": "x-amz-bedrock-kb-source-uri",
+                            "value": f"/{user_id}/{document_id}/"
+                        }
+                    }
+                }
+            }
+        )
+
+        passages = []
+        for result in response.get("retrievalResults", []):
+            passages.append(Passage(
+                text=result["content"]["text"],
+                score=result.get("score", 0.0),
+                source=result.get("location", {}).get("s3Location", {}).get("uri")
+            ))
+        return passages
+
+
+_retriever: Optional[Retriever] = (
+    KnowledgeBaseRetriever(KNOWLEDGE_BASE_ID) if KNOWLEDGE_BASE_ID else None
+)
+
+
+def set_retriever(retriever: Optional[Retriever]) -> None:
+    global _retriever
+    _retriever = retriever
+
+
+def get_retriever() -> Optional[Retriever]:
+    return _retriever
+
+
+async def retrieve_context(query: str, user_id: str, document_id: str) -> List[Passage]:
+    """Retrieve passages for the user's document, or [] if disabled, slow or failing."""
+    if _retriever is None or not document_id or not query:
+        return []
+
+    try:
+        passages = await asyncio.wait_for(
+            _retriever.retrieve(query, user_id, document_id, RETRIEVAL_TOP_K),
+            timeout=RETRIEVAL_TIMEOUT_MS / 1000
+        )
+    except asyncio.TimeoutError:
+        log.warning("retrieval_timeout", document_id=document_id, timeout_ms=RETRIEVAL_TIMEOUT_MS)
+        return []
+    except Exception:
+        log.exception("retrieval_failed", document_id=document_id)
+        return []
+
+    return [p for p in passages if p.score >= RETRIEVAL_MIN_SCORE]
+
+
+def build_system_prompt(passages: List[Passage]) -> Optional[str]:
+    if not passages:
+        return None
+
+    context = "\n---\n".join(p.text for p in passages)
+    return (
+        "You are answering questions about a document the user uploaded. "
+        "Use the following excerpts from that document to answer. If the "
+        "excerpts do not contain the answer, say so.\n\n"
+        f"<document_excerpts>\n{context}\n</document_excerpts>"
+    )
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+
+from ..answer_cache import answer_cache
+
+router = APIRouter()
+
+@router.get("/answer-cache-stats")
+async def answer_cache_stats():
+    if answer_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **answer_cache.stats()}
@@ -0,0 +1,9 @@
+from fastapi import APIRouter, Depends
+
+from ..aws import AwsClients, get_aws_clients
+
+router = APIRouter()
+
+@router.get("/aws-client-stats")
+async def aws_client_stats(clients: AwsClients = Depends(get_aws_clients)):
+    return clients.stats()
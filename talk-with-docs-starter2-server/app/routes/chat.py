@@ -1,34 +1,104 @@
 # routes/chat.py
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
-from typing import Generator
-import boto3
+from typing import AsyncGenerator
 import os
 import json
+import asyncio
 
-router = APIRouter()
+from ..aws import AwsClients, get_aws_clients, run_aws, iterate_aws
+from ..retrieval import retrieve_context, build_system_prompt
+from ..answer_cache import answer_cache
+from ..sse import sse_stream
+from ..logs import get_logger
+from ..metrics import StreamTimer
+from ..history import history_manager, utc_now
 
-bedrock = boto3.client(
-    service_name="bedrock-runtime",
-    region_name=os.getenv("AWS_REGION", "us-east-1")
-)
+router = APIRouter()
+log = get_logger(__name__)
 
 MODEL_ID = os.getenv("BEDROCK_MODEL_ID", "anthropic.claude-3-sonnet-20240229-v1:0")
 
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Transfer-Encoding": "chunked"
+}
+CACHE_REPLAY_CHUNK_CHARS = 256
+
+
+async def cached_deltas(answer: str) -> AsyncGenerator[str, None]:
+    for i in range(0, len(answer), CACHE_REPLAY_CHUNK_CHARS):
+        yield answer[i:i + CACHE_REPLAY_CHUNK_CHARS]
+
+
+def record_usage(chunk_data: dict, summary: dict) -> None:
+    # Anthropic stream events + Bedrock's invocation metrics on the last chunk
+    usage = summary.setdefault("usage", {})
+    if chunk_data.get("type") == "message_start":
+        usage["input_tokens"] = chunk_data["message"].get("usage", {}).get("input_tokens")
+    elif chunk_data.get("type") == "message_delta":
+        usage["output_tokens"] = chunk_data.get("usage", {}).get("output_tokens")
+        summary["stop_reason"] = chunk_data.get("delta", {}).get("stop_reason")
+
+    metrics = chunk_data.get("amazon-bedrock-invocationMetrics")
+    if metrics:
+        usage["input_tokens"] = metrics.get("inputTokenCount")
+        usage["output_tokens"] = metrics.get("outputTokenCount")
+        summary["invocation_latency_ms"] = metrics.get("invocationLatency")
+        summary["first_byte_latency_ms"] = metrics.get("firstByteLatency")
+
 
 @router.post("/chat")
-async def chat(request: Request) -> StreamingResponse:
+async def chat(request: Request, clients: AwsClients = Depends(get_aws_clients)) -> StreamingResponse:
     user_id = request.headers.get("X-User-Id", "anonymous")
 
     body = await request.json()
     user_input = body.get("message", "")
     document_id = body.get("documentId", "")
+    session_id = body.get("sessionId", "")
+    asked_at = utc_now()
+
+    # The message itself is user content; only its size is logged
+    log.info("chat_request", user_id=user_id, document_id=document_id,
+             session_id=session_id, message_chars=len(user_input))
 
-    print(f"User ID: {user_id}, Document ID: {document_id}")
-    print(f"Request body: {body}")
+    # Ground the answer in the document (bounded by RETRIEVAL_TIMEOUT_MS).
+    # Started first so it overlaps with the history and answer cache lookups.
+    retrieval = asyncio.create_task(retrieve_context(user_input, user_id, document_id))
+
+    history = None
+
+    def remember(answer: str) -> None:
+        if history is not None and user_input and answer:
+            history_manager.record_exchange(session_id, user_id, user_input, answer, asked_at)
+
+    try:
+        if history_manager is not None and session_id:
+            history = await history_manager.load(session_id, user_id)
+
+        # Follow-up questions depend on the conversation, so only stand-alone
+        # questions go through the answer cache
+        cache_lookup = None
+        is_follow_up = history is not None and (history.turns or history.summary)
+        if answer_cache is not None and document_id and user_input and not is_follow_up:
+            cache_lookup = await answer_cache.lookup(user_id, document_id, user_input)
+            if cache_lookup.entry is not None:
+                remember(cache_lookup.entry.answer)
+                return StreamingResponse(
+                    sse_stream(cached_deltas(cache_lookup.entry.answer), {"cached": True}),
+                    media_type="text/event-stream",
+                    headers=STREAM_HEADERS
+                )
+
+        passages = await retrieval
+    finally:
+        # Not needed after a cache hit, and not left running if a lookup raised
+        if not retrieval.done():
+            retrieval.cancel()
 
     payload = {
-        "messages": [{"role": "user", "content": user_input}],
+        "messages": history.messages(user_input) if history else [{"role": "user", "content": user_input}],
         "anthropic_version": "bedrock-2023-05-31",
         "max_tokens": 1024,
         "temperature": 0.7,
@@ -36,27 +106,45 @@ async def chat(request: Request) -> StreamingResponse:
         "top_p": 0.999
     }
 
-    def bedrock_stream() -> Generator[bytes, None, None]:
-        response = bedrock.invoke_model_with_response_stream(
+    system_parts = [build_system_prompt(passages), history.summary_prompt() if history else None]
+    system_prompt = "\n\n".join(p for p in system_parts if p)
+    if system_prompt:
+        payload["system"] = system_prompt
+
+    summary = {"cached": False}
+
+    async def bedrock_deltas() -> AsyncGenerator[str, None]:
+        timer = StreamTimer()
+        response = await run_aws(
+            clients.client("bedrock-runtime").invoke_model_with_response_stream,
             body=json.dumps(payload),
             modelId=MODEL_ID,
             contentType="application/json",
             accept="application/json"
         )
 
-        for event in response.get("body"):
+        answer = []
+        async for event in iterate_aws(response.get("body")):
             chunk = event.get("chunk")
             if chunk:
                 chunk_data = json.loads(chunk.get("bytes").decode())
+                record_usage(chunk_data, summary)
                 if "delta" in chunk_data and "text" in chunk_data["delta"]:
-                    yield chunk_data["delta"]["text"].encode("utf-8")
+                    timer.token()
+                    answer.append(chunk_data["delta"]["text"])
+                    yield chunk_data["delta"]["text"]
+
+        remember("".join(answer))
+
+        # Only cache complete answers that were grounded in the document
+        if cache_lookup is not None and cache_lookup.embedding is not None and passages:
+            await answer_cache.store(
+                user_id, document_id, cache_lookup.version, user_input,
+                cache_lookup.embedding, "".join(answer)
+            )
 
     return StreamingResponse(
-        bedrock_stream(),
+        sse_stream(bedrock_deltas(), summary),
         media_type="text/event-stream",
-        headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "Transfer-Encoding": "chunked"
-        }
+        headers=STREAM_HEADERS
     )
@@ -1,42 +1,204 @@
-from fastapi import Request, APIRouter, HTTPException
-import boto3
+from fastapi import Depends, Request, APIRouter, HTTPException
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from typing import AsyncGenerator, List
+import asyncio
 import os
 
+from ..aws import AwsClients, get_aws_clients, run_aws
+from ..logs import get_logger
+from ..sse import SSEEncoder
+from ..status_cache import StatusCache, status_cache
+from ..status_events import (
+    STATUS_FALLBACK_POLL_SECONDS,
+    StatusWatch,
+    is_final,
+    status_broker,
+    status_etag,
+    status_view,
+)
+
 router = APIRouter()
+log = get_logger(__name__)
 
-dynamodb = boto3.resource("dynamodb", region_name=os.getenv("AWS_REGION", "us-east-1"))
+STATUS_MAX_WAIT_SECONDS = float(os.getenv("STATUS_MAX_WAIT_SECONDS", "30"))
+STATUS_STREAM_MAX_SECONDS = float(os.getenv("STATUS_STREAM_MAX_SECONDS", "900"))
+STATUS_HEARTBEAT_SECONDS = float(os.getenv("STATUS_HEARTBEAT_SECONDS", "15"))
+STATUS_BATCH_MAX_IDS = int(os.getenv("STATUS_BATCH_MAX_IDS", "500"))
+# Consecutive failed re-reads before an open status stream gives up
+STATUS_STREAM_MAX_ERRORS = int(os.getenv("STATUS_STREAM_MAX_ERRORS", "3"))
 
-@router.get("/check-upload-status/{document_id}")
-async def check_upload_status(document_id: str, request: Request):
+# With the cache disabled, batch reads still go through BatchGetItem
+status_reader = status_cache or StatusCache(ttl_seconds=0, max_entries=0)
+
+STREAM_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no"
+}
+
+
+async def read_status(clients: AwsClients, document_id: str) -> dict:
     ddb_table_name = os.getenv("DDB_TABLE")
     if not ddb_table_name:
         raise RuntimeError("Missing DDB_TABLE environment variable")
 
-    table = dynamodb.Table(ddb_table_name)
+    table = clients.table(ddb_table_name)
 
     try:
-        response = table.get_item(Key={"document_id": document_id})
+        response = await run_aws(table.get_item, Key={"document_id": document_id})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error querying DynamoDB: {str(e)}")
 
-    item = response.get("Item")
+    return status_view(response.get("Item"))
 
-    if not item:
-        return {"status": "NOT_FOUND"}
 
+def authorize(view: dict, request_user: str) -> None:
     # Authorization check - API Gateway handles authentication
     # Get user ID from the header set by API Gateway
-    print('All headers:', dict(request.headers))
+    if view["status"] == "NOT_FOUND":
+        return
+    if not request_user or view.get("user_id") != request_user:
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+
+async def next_view(clients: AwsClients, watch: StatusWatch, document_id: str, timeout: float):
+    """The document's next status, or None if nothing changed within `timeout`.
+
+    Changes come from the status feed; while no feed is live the item is
+    re-read every STATUS_FALLBACK_POLL_SECONDS instead.
+    """
+    if not status_broker.live:
+        timeout = min(timeout, STATUS_FALLBACK_POLL_SECONDS)
+    item = await watch.next(timeout)
+    if item is not None:
+        return status_view(item)
+    if not status_broker.live:
+        return await read_status(clients, document_id)
+    return None
+
+
+@router.get("/check-upload-status/{document_id}")
+async def check_upload_status(document_id: str, request: Request, wait: float = 0,
+                              clients: AwsClients = Depends(get_aws_clients)):
+    """Current status. With `?wait=<seconds>` and `If-None-Match`, long-polls
+    until the status differs from that ETag (304 if it doesn't in time)."""
     request_user = request.headers.get("X-User-Id")
-    print('request_user before check:', request_user)
-    print('item user_id:', item.get("user_id"))
-    if not request_user or item.get("user_id") != request_user:
+    seen = request.headers.get("If-None-Match")
+
+    with status_broker.watch(document_id) as watch:
+        view = await read_status(clients, document_id)
+        authorize(view, request_user)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(wait, STATUS_MAX_WAIT_SECONDS)
+        while seen == status_etag(view) and not is_final(view):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return Response(status_code=304, headers={"ETag": seen})
+            changed = await next_view(clients, watch, document_id, remaining)
+            if changed is not None:
+                authorize(changed, request_user)
+                view = changed
+
+    if seen == status_etag(view):
+        return Response(status_code=304, headers={"ETag": seen})
+    return JSONResponse(view, headers={"ETag": status_etag(view)})
+
+
+async def status_stream(clients: AwsClients, watch: StatusWatch, document_id: str,
+                        request_user: str, view: dict) -> AsyncGenerator[bytes, None]:
+    encoder = SSEEncoder()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STATUS_STREAM_MAX_SECONDS
+    errors = 0
+    try:
+        yield encoder.encode(view, event="status")
+        last_write = loop.time()
+        while not is_final(view):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                changed = await next_view(clients, watch, document_id, min(remaining, STATUS_HEARTBEAT_SECONDS))
+                errors = 0
+            except Exception as e:
+                # The response has started, so an HTTPException can't be
+                # sent; keep the last view and re-read on the next turn
+                errors += 1
+                detail = getattr(e, "detail", None) or str(e)
+                log.warning("status_stream_read_failed", document_id=document_id,
+                            attempt=errors, error=detail)
+                if errors >= STATUS_STREAM_MAX_ERRORS:
+                    yield encoder.encode({"error": "Could not read the document status"}, event="error")
+                    return
+                changed = None
+            if changed is None or changed == view:
+                # Keeps proxies from closing an idle connection
+                if loop.time() - last_write >= STATUS_HEARTBEAT_SECONDS:
+                    yield b": keep-alive\n\n"
+                    last_write = loop.time()
+                continue
+            if changed["status"] != "NOT_FOUND" and changed.get("user_id") != request_user:
+                break
+            view = changed
+            yield encoder.encode(view, event="status")
+            last_write = loop.time()
+
+        # Tells EventSource clients not to reconnect
+        yield encoder.encode({"final": is_final(view), "status": view["status"]}, event="done")
+    finally:
+        watch.close()
+
+
+@router.get("/check-upload-status/{document_id}/events")
+async def check_upload_status_events(document_id: str, request: Request,
+                                     clients: AwsClients = Depends(get_aws_clients)) -> StreamingResponse:
+    """Server-Sent Events: one `status` event now and one per change, until
+    the document reaches a final state (then `done`)."""
+    request_user = request.headers.get("X-User-Id")
+
+    watch = status_broker.watch(document_id)
+    try:
+        view = await read_status(clients, document_id)
+        authorize(view, request_user)
+    except Exception:
+        watch.close()
+        raise
+
+    return StreamingResponse(
+        status_stream(clients, watch, document_id, request_user, view),
+        media_type="text/event-stream",
+        headers=STREAM_HEADERS
+    )
+
+
+class BatchStatusRequest(BaseModel):
+    document_ids: List[str]
+
+
+@router.post("/check-upload-status/batch")
+async def check_upload_status_batch(request: Request, body: BatchStatusRequest):
+    """Status of many documents in one round trip. Documents owned by someone
+    else are reported as UNAUTHORIZED; ids DynamoDB kept throttling are
+    listed in `unprocessed` for the client to retry."""
+    request_user = request.headers.get("X-User-Id")
+    if not request_user:
         raise HTTPException(status_code=403, detail="Unauthorized")
-    print('request_user after check:', request_user)
-    return {
-        "status": item.get("scan_status", "UNKNOWN"),
-        "file_title": item.get("file_title"),
-        "s3_key": item.get("s3_key"),
-        "user_id": item.get("user_id"),
-        "upload_timestamp": item.get("upload_timestamp"),
-    }
+    if len(body.document_ids) > STATUS_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {STATUS_BATCH_MAX_IDS} document ids per request")
+
+    try:
+        result = await status_reader.get_many(body.document_ids)
+    except RuntimeError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error querying DynamoDB: {str(e)}")
+
+    documents = {}
+    for document_id, item in result.items.items():
+        view = status_view(item)
+        if view["status"] != "NOT_FOUND" and view.get("user_id") != request_user:
+            view = {"status": "UNAUTHORIZED"}
+        documents[document_id] = view
+    return {"documents": documents, "unprocessed": result.unprocessed}
@@ -1,15 +1,29 @@
-from fastapi import Request, APIRouter
+from fastapi import Depends, HTTPException, Request, APIRouter
+from botocore.exceptions import ClientError
+import asyncio
+import math
+import random
 import uuid
-import boto3
 import os
 from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
+
+from ..aws import AwsClients, get_aws_clients, run_aws
+from ..logs import get_logger
 
 router = APIRouter()
+log = get_logger(__name__)
 
-s3 = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
-dynamodb = boto3.resource("dynamodb")
+MB = 1024 * 1024
+UPLOAD_URL_EXPIRES_SECONDS = int(os.getenv("UPLOAD_URL_EXPIRES_SECONDS", "3600"))
+# Files at least this large (by file_size) are uploaded in parts
+UPLOAD_MULTIPART_THRESHOLD = int(os.getenv("UPLOAD_MULTIPART_THRESHOLD", str(64 * MB)))
+UPLOAD_PART_SIZE = max(int(os.getenv("UPLOAD_PART_SIZE", str(16 * MB))), 5 * MB)  # S3 minimum: 5 MB
+UPLOAD_MAX_PARTS = 10000  # S3 limit
+UPLOAD_BATCH_MAX_FILES = int(os.getenv("UPLOAD_BATCH_MAX_FILES", "100"))
+BATCH_WRITE_SIZE = 25  # BatchWriteItem limit
+BATCH_WRITE_MAX_RETRIES = 5
 
 class UploadRequest(BaseModel):
     file_title: str
@@ -17,32 +31,29 @@ class UploadRequest(BaseModel):
     file_size: Optional[int] = None
     page_count: Optional[int] = None
 
-@router.post("/generate-upload-url")
-async def generate_upload_url(request: Request, body: UploadRequest):
+class BatchUploadRequest(BaseModel):
+    files: List[UploadRequest]
+
+class UploadedPart(BaseModel):
+    part_number: int
+    etag: str
+
+class CompleteUploadRequest(BaseModel):
+    document_id: str
+    upload_id: str
+    parts: List[UploadedPart]
+
+
+def upload_config():
     # Defer env var access until inside the route
     upload_bucket = os.getenv("UPLOAD_BUCKET_NAME")
     ddb_table_name = os.getenv("DDB_TABLE")
     if not ddb_table_name or not upload_bucket:
         raise RuntimeError("Missing DDB_TABLE or UPLOAD_BUCKET_NAME environment variable")
+    return upload_bucket, ddb_table_name
 
-    table = dynamodb.Table(ddb_table_name)
-
-    user_id = request.headers.get("X-User-Id", "anonymous")  # fallback
-    document_id = str(uuid.uuid4())
-    object_key = f"{user_id}/{document_id}/{body.file_title}"
-
-    # 1. Generate pre-signed URL
-    presigned_url = s3.generate_presigned_url(
-        "put_object",
-        Params={
-            "Bucket": upload_bucket,
-            "Key": object_key,
-            "ContentType": body.file_type
-        },
-        ExpiresIn=3600
-    )
 
-    # 2. Create metadata entry in DynamoDB
+def metadata_item(user_id: str, document_id: str, object_key: str, body: UploadRequest) -> dict:
     item = {
         "document_id": document_id,
         "user_id": user_id,
@@ -52,17 +63,231 @@ async def generate_upload_url(request: Request, body: UploadRequest):
         "scan_status": "PENDING",
         "upload_timestamp": datetime.utcnow().replace(microsecond=0).isoformat() + "Z" # UTC Timezone
     }
-    
+
     # Add optional fields if provided
     if body.file_size is not None:
         item["file_size"] = body.file_size
     if body.page_count is not None:
         item["page_count"] = body.page_count
-        
-    table.put_item(Item=item)
+    return item
+
+
+def part_size_for(file_size: int) -> int:
+    # Large files need bigger parts to stay within S3's part limit
+    size = max(UPLOAD_PART_SIZE, math.ceil(file_size / UPLOAD_MAX_PARTS))
+    return math.ceil(size / MB) * MB
+
+
+def presign_parts(s3, bucket: str, key: str, upload_id: str, part_count: int) -> List[dict]:
+    # Signing is local (no request to S3), so all parts are signed in one executor call
+    return [
+        {
+            "part_number": n,
+            "url": s3.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": n},
+                ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+            )
+        }
+        for n in range(1, part_count + 1)
+    ]
+
+
+async def prepare_upload(s3, upload_bucket: str, user_id: str, body: UploadRequest):
+    """(metadata item, upload instructions) for one file."""
+    document_id = str(uuid.uuid4())
+    object_key = f"{user_id}/{document_id}/{body.file_title}"
+    item = metadata_item(user_id, document_id, object_key, body)
+
+    if body.file_size is None or body.file_size < UPLOAD_MULTIPART_THRESHOLD:
+        url = await run_aws(
+            s3.generate_presigned_url,
+            "put_object",
+            Params={"Bucket": upload_bucket, "Key": object_key, "ContentType": body.file_type},
+            ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+        )
+        return item, {"document_id": document_id, "file_title": body.file_title,
+                      "upload_mode": "single", "upload_url": url}
+
+    upload = await run_aws(
+        s3.create_multipart_upload,
+        Bucket=upload_bucket,
+        Key=object_key,
+        ContentType=body.file_type
+    )
+    upload_id = upload["UploadId"]
+    part_size = part_size_for(body.file_size)
+    parts = await run_aws(
+        presign_parts, s3, upload_bucket, object_key, upload_id, math.ceil(body.file_size / part_size)
+    )
+    item["upload_id"] = upload_id
+    return item, {"document_id": document_id, "file_title": body.file_title,
+                  "upload_mode": "multipart", "upload_id": upload_id,
+                  "part_size": part_size, "parts": parts}
+
+
+async def batch_write(clients: AwsClients, table_name: str, requests: List[dict]) -> None:
+    dynamodb = clients.resource("dynamodb")
+
+    async def write(chunk: List[dict]) -> None:
+        request = {table_name: chunk}
+        for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, 0.025 * 2 ** attempt))
+            response = await run_aws(dynamodb.batch_write_item, RequestItems=request)
+            request = response.get("UnprocessedItems") or {}
+            if not request:
+                return
+        raise RuntimeError(f"{len(request[table_name])} metadata items still unprocessed after retries")
+
+    # Every chunk finishes (or fails) before this returns, so a cleanup after
+    # a failure can't race a write that is still in flight
+    results = await asyncio.gather(*(write(requests[i:i + BATCH_WRITE_SIZE])
+                                     for i in range(0, len(requests), BATCH_WRITE_SIZE)),
+                                   return_exceptions=True)
+    failed = next((r for r in results if isinstance(r, BaseException)), None)
+    if failed is not None:
+        raise failed
+
+
+async def batch_put(clients: AwsClients, table_name: str, items: List[dict]) -> None:
+    await batch_write(clients, table_name, [{"PutRequest": {"Item": item}} for item in items])
+
+
+async def delete_items(clients: AwsClients, table_name: str, items: List[dict]) -> None:
+    # Other chunks of a failed batch_put (or part of the failed one) were
+    # written; don't leave them behind as PENDING documents nobody uploads.
+    # Deleting an item that was never written is a no-op.
+    try:
+        await batch_write(clients, table_name,
+                          [{"DeleteRequest": {"Key": {"document_id": item["document_id"]}}} for item in items])
+    except Exception:
+        log.exception("metadata_cleanup_failed", document_ids=[item["document_id"] for item in items])
+
+
+async def abort_uploads(s3, upload_bucket: str, items: List[dict]) -> None:
+    # Don't leave orphaned multipart uploads behind
+    for item in items:
+        if "upload_id" not in item:
+            continue
+        try:
+            await run_aws(s3.abort_multipart_upload, Bucket=upload_bucket,
+                          Key=item["s3_key"], UploadId=item["upload_id"])
+        except Exception:
+            log.exception("multipart_abort_failed", upload_id=item["upload_id"], s3_key=item["s3_key"])
+
+
+@router.post("/generate-upload-url")
+async def generate_upload_url(request: Request, body: UploadRequest,
+                              clients: AwsClients = Depends(get_aws_clients)):
+    upload_bucket, ddb_table_name = upload_config()
+    table = clients.table(ddb_table_name)
+
+    user_id = request.headers.get("X-User-Id", "anonymous")  # fallback
+    document_id = str(uuid.uuid4())
+    object_key = f"{user_id}/{document_id}/{body.file_title}"
+
+    # 1. Generate pre-signed URL
+    presigned_url = await run_aws(
+        clients.client("s3").generate_presigned_url,
+        "put_object",
+        Params={
+            "Bucket": upload_bucket,
+            "Key": object_key,
+            "ContentType": body.file_type
+        },
+        ExpiresIn=UPLOAD_URL_EXPIRES_SECONDS
+    )
+
+    # 2. Create metadata entry in DynamoDB
+    await run_aws(table.put_item, Item=metadata_item(user_id, document_id, object_key, body))
 
     return {
         "upload_url": presigned_url,
         "document_id": document_id,
         "upload_bucket": upload_bucket
     }
+
+
+@router.post("/generate-upload-urls")
+async def generate_upload_urls(request: Request, body: BatchUploadRequest,
+                               clients: AwsClients = Depends(get_aws_clients)):
+    """Upload URLs for several files, with one metadata write per 25 files.
+
+    Files of at least UPLOAD_MULTIPART_THRESHOLD bytes get a multipart upload:
+    PUT each part to its URL (in parallel), then POST the parts' ETags to
+    /complete-multipart-upload.
+    """
+    if not body.files or len(body.files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Send between 1 and {UPLOAD_BATCH_MAX_FILES} files")
+
+    upload_bucket, ddb_table_name = upload_config()
+    user_id = request.headers.get("X-User-Id", "anonymous")  # fallback
+    s3 = clients.client("s3")
+
+    prepared = await asyncio.gather(
+        *(prepare_upload(s3, upload_bucket, user_id, f) for f in body.files),
+        return_exceptions=True
+    )
+    items = [p[0] for p in prepared if not isinstance(p, BaseException)]
+
+    failed = next((p for p in prepared if isinstance(p, BaseException)), None)
+    try:
+        if failed is not None:
+            raise failed
+        await batch_put(clients, ddb_table_name, items)
+    except Exception as e:
+        if failed is None:
+            await delete_items(clients, ddb_table_name, items)
+        await abort_uploads(s3, upload_bucket, items)
+        raise HTTPException(status_code=500, detail=f"Error preparing uploads: {str(e)}")
+
+    return {
+        "upload_bucket": upload_bucket,
+        "uploads": [upload for _, upload in prepared]
+    }
+
+
+@router.post("/complete-multipart-upload")
+async def complete_multipart_upload(request: Request, body: CompleteUploadRequest,
+                                    clients: AwsClients = Depends(get_aws_clients)):
+    upload_bucket, ddb_table_name = upload_config()
+    table = clients.table(ddb_table_name)
+
+    item = (await run_aws(table.get_item, Key={"document_id": body.document_id})).get("Item")
+    if not item or item.get("upload_id") != body.upload_id:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    if item.get("user_id") != request.headers.get("X-User-Id"):
+        raise HTTPException(status_code=403, detail="Unauthorized")
+
+    try:
+        await run_aws(
+            clients.client("s3").complete_multipart_upload,
+            Bucket=upload_bucket,
+            Key=item["s3_key"],
+            UploadId=body.upload_id,
+            MultipartUpload={"Parts": [
+                {"PartNumber": part.part_number, "ETag": part.etag}
+                for part in sorted(body.parts, key=lambda p: p.part_number)
+            ]}
+        )
+    except ClientError as e:
+        code = e.response["Error"]["Code"]
+        if code == "NoSuchUpload":
+            raise HTTPException(status_code=404, detail="Upload not found")
+        if code in ("InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+            raise HTTPException(status_code=400, detail=e.response["Error"].get("Message", code))
+        raise
+
+    try:
+        await run_aws(
+            table.update_item,
+            Key={"document_id": body.document_id},
+            UpdateExpression="REMOVE upload_id",
+            ConditionExpression="upload_id = :u",
+            ExpressionAttributeValues={":u": body.upload_id}
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+    return {"document_id": body.document_id, "s3_key": item["s3_key"], "status": "UPLOADED"}
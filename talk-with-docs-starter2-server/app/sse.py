@@ -0,0 +1,146 @@
+# app/sse.py
+# Server-Sent Events framing for streamed chat answers.
+#
+# Bedrock emits many tiny deltas (often a few bytes each). Writing each one as
+# its own chunk means a syscall and a proxy flush per token, so deltas are
+# coalesced: the first one is sent immediately (time-to-first-token is
+# unchanged) and later ones are batched until SSE_COALESCE_MS has passed or
+# SSE_COALESCE_BYTES have accumulated.
+#
+# Wire format:
+#   id: <n>
+#   data: {"text": "..."}
+#
+#   event: done
+#   id: <n>
+#   data: {"usage": {...}, "events": ..., "deltas": ..., "bytes": ...}
+import asyncio
+import json
+import os
+import time
+from typing import AsyncIterator, Optional
+
+from .logs import get_logger
+from .metrics import stream_bytes, stream_duration, streams_in_flight, streams_total
+
+log = get_logger(__name__)
+
+SSE_COALESCE_MS = float(os.getenv("SSE_COALESCE_MS", "30"))
+SSE_COALESCE_BYTES = int(os.getenv("SSE_COALESCE_BYTES", "512"))
+
+
+class SSEEncoder:
+    def __init__(self):
+        self.next_id = 1
+
+    def encode(self, data: dict, event: Optional[str] = None) -> bytes:
+        lines = []
+        if event:
+            lines.append(f"event: {event}")
+        lines.append(f"id: {self.next_id}")
+        # json.dumps never emits raw newlines, so one data line is enough
+        lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(",", ":")))
+        self.next_id += 1
+        return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+async def coalesce(deltas: AsyncIterator[str],
+                   window_ms: float = SSE_COALESCE_MS,
+                   max_bytes: int = SSE_COALESCE_BYTES,
+                   stats: Optional[dict] = None) -> AsyncIterator[str]:
+    """Merge text deltas by time window and size; the first delta is never delayed."""
+    stats = stats if stats is not None else {}
+    stats.setdefault("deltas", 0)
+    loop = asyncio.get_running_loop()
+    window = window_ms / 1000
+    wake = asyncio.Event()
+    buffer = []
+    size = 0
+    flushed = False
+    finished = False
+    error = None
+    timer = None
+
+    # One producer task per stream; per delta the only cost is an append.
+    async def pump():
+        nonlocal size, finished, error, timer
+        try:
+            async for text in deltas:
+                stats["deltas"] += 1
+                buffer.append(text)
+                size += len(text.encode("utf-8"))
+                if not flushed or size >= max_bytes:
+                    wake.set()
+                elif timer is None:
+                    timer = loop.call_later(window, wake.set)
+        except Exception as e:
+            error = e
+        finally:
+            finished = True
+            wake.set()
+
+    producer = asyncio.ensure_future(pump())
+    try:
+        while True:
+            await wake.wait()
+            wake.clear()
+            if timer is not None:
+                timer.cancel()
+                timer = None
+
+            if buffer:
+                text = "".join(buffer)
+                buffer.clear()
+                size = 0
+                flushed = True
+                yield text
+
+            if error is not None:
+                raise error
+            if finished and not buffer:
+                break
+    finally:
+        producer.cancel()
+        if timer is not None:
+            timer.cancel()
+
+
+async def sse_stream(deltas: AsyncIterator[str], summary: dict) -> AsyncIterator[bytes]:
+    """Frame coalesced deltas as SSE, then a `done` event carrying `summary`.
+
+    `summary` is read after the deltas are exhausted, so producers can fill in
+    usage stats while streaming.
+    """
+    encoder = SSEEncoder()
+    stats = {"events": 0, "deltas": 0, "bytes": 0}
+    source = "cache" if summary.get("cached") else "bedrock"
+    started = time.perf_counter()
+    written = 0
+    outcome = "disconnect"  # unless we reach the end
+    streams_in_flight.inc()
+
+    try:
+        try:
+            async for text in coalesce(deltas, stats=stats):
+                frame = encoder.encode({"text": text})
+                stats["events"] += 1
+                stats["bytes"] += len(frame)
+                written += len(frame)
+                yield frame
+        except Exception:
+            log.exception("chat_stream_failed", source=source)
+            outcome = "error"
+            frame = encoder.encode({"error": "An error occurred while generating the response"}, event="error")
+            written += len(frame)
+            yield frame
+            return
+
+        frame = encoder.encode({**summary, **stats}, event="done")
+        written += len(frame)
+        outcome = "complete"
+        yield frame
+    finally:
+        streams_in_flight.dec()
+        stream_duration.labels(source).observe(time.perf_counter() - started)
+        stream_bytes.labels(source).inc(written)
+        streams_total.labels(source, outcome).inc()
@@ -0,0 +1,168 @@
+# app/status_cache.py
+# Read-through cache for DocumentMetadata items, used by the batch status
+# endpoint (POST /check-upload-status/batch).
+#
+# A dashboard refresh asks for many documents at once. Misses are read with
+# BatchGetItem: up to STATUS_BATCH_GET_SIZE keys per call, all calls in
+# parallel, and keys DynamoDB returns as UnprocessedKeys retried with
+# exponential backoff. Items (and "not found") are cached for
+# STATUS_CACHE_TTL_SECONDS.
+#
+# Staleness: entries are invalidated early only while the status feed
+# (app/status_events.py) is polling, and it polls only while some request
+# is watching a document (GET /check-upload-status/{id} or its /events
+# stream). The cache never starts or keeps the feed running. With no
+# active watcher, batch readers can therefore see a status up to the full
+# STATUS_CACHE_TTL_SECONDS old after it changed. Lower the TTL, or set
+# STATUS_CACHE_ENABLED=false, where that is too stale.
+import asyncio
+import os
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .aws import aws_clients, run_aws
+from .status_events import status_broker
+
+STATUS_CACHE_ENABLED = os.getenv("STATUS_CACHE_ENABLED", "true").lower() == "true"
+STATUS_CACHE_TTL_SECONDS = float(os.getenv("STATUS_CACHE_TTL_SECONDS", "5"))
+STATUS_CACHE_MAX_ENTRIES = int(os.getenv("STATUS_CACHE_MAX_ENTRIES", "10000"))
+STATUS_BATCH_GET_SIZE = 100  # BatchGetItem limit
+STATUS_BATCH_MAX_RETRIES = int(os.getenv("STATUS_BATCH_MAX_RETRIES", "5"))
+STATUS_BATCH_RETRY_BASE_MS = 25
+
+# Only what status_view() needs; keeps reads small
+STATUS_ATTRIBUTES = ("document_id", "user_id", "scan_status", "processing_status",
+                     "file_title", "s3_key", "upload_timestamp")
+
+
+@dataclass
+class CachedItem:
+    item: Optional[dict]  # None: the document doesn't exist
+    expires_at: float
+
+
+@dataclass
+class BatchResult:
+    items: Dict[str, Optional[dict]]
+    unprocessed: List[str]  # still throttled after STATUS_BATCH_MAX_RETRIES
+
+
+class StatusCache:
+    def __init__(self, table_name: Optional[str] = None,  # default: DDB_TABLE at call time
+                 ttl_seconds: float = STATUS_CACHE_TTL_SECONDS,
+                 max_entries: int = STATUS_CACHE_MAX_ENTRIES,
+                 resource=None):
+        self.table_name = table_name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.resource = resource or aws_clients.resource("dynamodb")
+
+        self._entries: "OrderedDict[str, CachedItem]" = OrderedDict()
+        # document id -> when it was last invalidated, so a read that started
+        # before a change can't cache the old item afterwards
+        self._invalidated: Dict[str, float] = {}
+
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "batch_calls": 0,
+            "retries": 0,
+            "unprocessed": 0,
+            "invalidations": 0,
+        }
+
+    async def get_many(self, document_ids: Iterable[str]) -> BatchResult:
+        now = time.monotonic()
+        items: Dict[str, Optional[dict]] = {}
+        missing = []
+        for document_id in dict.fromkeys(document_ids):
+            entry = self._entries.get(document_id)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(document_id)
+                items[document_id] = entry.item
+                self.counters["hits"] += 1
+            else:
+                missing.append(document_id)
+        self.counters["misses"] += len(missing)
+
+        unprocessed: List[str] = []
+        if missing:
+            started = time.monotonic()
+            chunks = [missing[i:i + STATUS_BATCH_GET_SIZE]
+                      for i in range(0, len(missing), STATUS_BATCH_GET_SIZE)]
+            for found, left in await asyncio.gather(*(self._batch_get(chunk) for chunk in chunks)):
+                for document_id, item in found.items():
+                    items[document_id] = item
+                    self._store(document_id, item, started)
+                unprocessed += left
+
+        return BatchResult(items=items, unprocessed=unprocessed)
+
+    def invalidate(self, document_id: str) -> None:
+        self._entries.pop(document_id, None)
+        self._invalidated[document_id] = time.monotonic()
+        self.counters["invalidations"] += 1
+
+    def on_change(self, item: dict) -> None:
+        document_id = item.get("document_id")
+        if document_id is not None:
+            self.invalidate(document_id)
+
+    def stats(self) -> dict:
+        return {**self.counters, "entries": len(self._entries)}
+
+    def _store(self, document_id: str, item: Optional[dict], started: float) -> None:
+        if self._invalidated.get(document_id, 0.0) >= started:
+            return  # changed while we were reading it
+        self._entries[document_id] = CachedItem(item=item, expires_at=time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(document_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        self._prune_invalidated()
+
+    def _prune_invalidated(self) -> None:
+        # Reads finish well within the TTL; older markers can't matter anymore
+        cutoff = time.monotonic() - self.ttl_seconds
+        if len(self._invalidated) > self.max_entries:
+            self._invalidated = {k: t for k, t in self._invalidated.items() if t >= cutoff}
+
+    async def _batch_get(self, document_ids: List[str]) -> Tuple[Dict[str, Optional[dict]], List[str]]:
+        """Items for up to STATUS_BATCH_GET_SIZE ids (None if missing) and the ids left unprocessed."""
+        table_name = self.table_name or os.getenv("DDB_TABLE")
+        if not table_name:
+            raise RuntimeError("Missing DDB_TABLE environment variable")
+        request = {table_name: {
+            "Keys": [{"document_id": document_id} for document_id in document_ids],
+            "ProjectionExpression": ", ".join(f"#a{i}" for i in range(len(STATUS_ATTRIBUTES))),
+            "ExpressionAttributeNames": {f"#a{i}": name for i, name in enumerate(STATUS_ATTRIBUTES)},
+        }}
+        found: Dict[str, Optional[dict]] = {}
+        for attempt in range(STATUS_BATCH_MAX_RETRIES + 1):
+            if attempt:
+                # Full jitter, as in the AWS SDK retry strategy
+                self.counters["retries"] += 1
+                await asyncio.sleep(random.uniform(0, STATUS_BATCH_RETRY_BASE_MS * 2 ** attempt) / 1000)
+            self.counters["batch_calls"] += 1
+            response = await run_aws(self.resource.batch_get_item, RequestItems=request)
+            for item in response.get("Responses", {}).get(table_name, []):
+                found[item["document_id"]] = item
+            request = response.get("UnprocessedKeys") or {}
+            if not request:
+                break
+
+        left = {key["document_id"] for key in request.get(table_name, {}).get("Keys", [])}
+        self.counters["unprocessed"] += len(left)
+        for document_id in document_ids:
+            if document_id not in found and document_id not in left:
+                found[document_id] = None
+        return found, sorted(left)
+
+
+status_cache: Optional[StatusCache] = (
+    StatusCache() if STATUS_CACHE_ENABLED else None
+)
+if status_cache is not None:
+    status_broker.add_listener(status_cache.on_change)
@@ -0,0 +1,292 @@
+# app/status_events.py
+# Push-based document status for /check-upload-status (SSE and long-poll).
+#
+# Instead of every client polling get_item until scan_status changes, each
+# connection subscribes to an in-process broker and is woken when its
+# document's item changes. The broker is fed by a change feed:
+#
+#   DynamoStreamFeed  the DocumentMetadata table's DynamoDB Stream
+#                     (DDB_STREAM_ARN). One poller per replica reads every
+#                     shard, only while someone is watching, so the cost
+#                     no longer grows with the number of clients (and is
+#                     zero when nobody is waiting on a status).
+#   LocalStatusFeed   in-process stand-in for tests and benchmarks;
+#                     emit(item) publishes as if the table had changed.
+#
+# Without a running feed, watchers fall back to re-reading their item every
+# STATUS_FALLBACK_POLL_SECONDS.
+import asyncio
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Set
+
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.exceptions import ClientError
+
+from .aws import aws_clients, run_aws
+from .logs import get_logger
+
+log = get_logger(__name__)
+
+DDB_STREAM_ARN = os.getenv("DDB_STREAM_ARN")
+STATUS_POLL_MS = int(os.getenv("STATUS_POLL_MS", "500"))
+STATUS_SHARD_REFRESH_SECONDS = int(os.getenv("STATUS_SHARD_REFRESH_SECONDS", "60"))
+STATUS_FEED_RETRY_SECONDS = 5
+STATUS_FALLBACK_POLL_SECONDS = float(os.getenv("STATUS_FALLBACK_POLL_SECONDS", "5"))
+STATUS_WATCH_QUEUE = 16  # pending changes per connection; older ones are dropped first
+# A watch ends once the document reaches one of these states
+STATUS_FINAL_STATES = set(os.getenv(
+    "STATUS_FINAL_STATES",
+    "PROMOTED,INGESTED,QUARANTINED,THREATS_FOUND,UNSUPPORTED,ACCESS_DENIED,FAILED"
+).split(","))
+
+_deserializer = TypeDeserializer()
+
+
+def status_view(item: Optional[dict]) -> dict:
+    """What clients see of a DocumentMetadata item."""
+    if not item or item.get("deleted"):
+        return {"status": "NOT_FOUND"}
+    return {
+        "status": item.get("scan_status", "UNKNOWN"),
+        "processing_status": item.get("processing_status"),
+        "file_title": item.get("file_title"),
+        "s3_key": item.get("s3_key"),
+        "user_id": item.get("user_id"),
+        "upload_timestamp": item.get("upload_timestamp"),
+    }
+
+
+def status_etag(view: dict) -> str:
+    digest = hashlib.sha256(json.dumps(view, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return f'W/"{digest[:16]}"'
+
+
+def is_final(view: dict) -> bool:
+    return (view["status"] == "NOT_FOUND"
+            or view["status"] in STATUS_FINAL_STATES
+            or view.get("processing_status") in STATUS_FINAL_STATES)
+
+
+class StatusWatch:
+    def __init__(self, broker: "StatusBroker", document_id: str):
+        self.document_id = document_id
+        self._broker = broker
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=STATUS_WATCH_QUEUE)
+
+    def put(self, item: dict) -> None:
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(item)
+
+    async def next(self, timeout: float) -> Optional[dict]:
+        """The next published item for this document, or None after `timeout` seconds."""
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._broker._remove(self)
+
+    def __enter__(self) -> "StatusWatch":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class StatusBroker:
+    def __init__(self):
+        self._watches: Dict[str, Set[StatusWatch]] = {}
+        # See every change published while the feed runs, but don't keep it running
+        self._listeners: List[Callable[[dict], None]] = []
+        self._active = asyncio.Event()
+        self.live = False  # a feed is delivering changes
+        self.published = 0
+        self.delivered = 0
+
+    def watch(self, document_id: str) -> StatusWatch:
+        """Subscribe before reading the item, so no change in between is missed."""
+        watch = StatusWatch(self, document_id)
+        self._watches.setdefault(document_id, set()).add(watch)
+        self._active.set()
+        return watch
+
+    def _remove(self, watch: StatusWatch) -> None:
+        watches = self._watches.get(watch.document_id)
+        if watches is None:
+            return
+        watches.discard(watch)
+        if not watches:
+            del self._watches[watch.document_id]
+        if not self.active():
+            self._active.clear()
+
+    def add_listener(self, listener: Callable[[dict], None]) -> None:
+        self._listeners.append(listener)
+
+    def watching(self) -> int:
+        return len(self._watches)
+
+    def active(self) -> bool:
+        return bool(self._watches)
+
+    async def wait_for_watchers(self) -> None:
+        await self._active.wait()
+
+    def publish(self, item: dict) -> None:
+        self.published += 1
+        for listener in self._listeners:
+            listener(item)
+        for watch in self._watches.get(item.get("document_id"), ()):
+            watch.put(item)
+            self.delivered += 1
+
+    def stats(self) -> dict:
+        return {
+            "live": self.live,
+            "documents": len(self._watches),
+            "connections": sum(len(w) for w in self._watches.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+        }
+
+
+class LocalStatusFeed:
+    def __init__(self, broker: StatusBroker):
+        self.broker = broker
+
+    def start(self) -> None:
+        self.broker.live = True
+
+    async def stop(self) -> None:
+        self.broker.live = False
+
+    def emit(self, item: dict) -> None:
+        self.broker.publish(item)
+
+
+class DynamoStreamFeed:
+    """Publishes the NEW_IMAGE of every stream record while the broker is active."""
+
+    def __init__(self, stream_arn: str, broker: StatusBroker, client=None):
+        self.stream_arn = stream_arn
+        self.broker = broker
+        self.client = client or aws_clients.client("dynamodbstreams")
+        self._iterators: Dict[str, str] = {}  # shard id -> next shard iterator
+        self._task: Optional[asyncio.Task] = None
+        self.records = 0
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.broker.wait_for_watchers()
+            try:
+                await self._poll_while_watched()
+            except Exception:
+                log.exception("status_feed_failed", retry_in_seconds=STATUS_FEED_RETRY_SECONDS)
+                await asyncio.sleep(STATUS_FEED_RETRY_SECONDS)
+
+    async def _poll_while_watched(self) -> None:
+        loop = asyncio.get_running_loop()
+        # Watchers read their item after subscribing; until the broker is
+        # live they also re-read it on their own, so LATEST misses nothing
+        await self._refresh_shards("LATEST")
+        self.broker.live = True
+        try:
+            next_refresh = loop.time() + STATUS_SHARD_REFRESH_SECONDS
+            while self.broker.active():
+                if loop.time() >= next_refresh:
+                    # Shards opened since the last refresh are read from their start
+                    await self._refresh_shards("TRIM_HORIZON")
+                    next_refresh = loop.time() + STATUS_SHARD_REFRESH_SECONDS
+                counts = await asyncio.gather(*(
+                    self._read_shard(shard_id, iterator)
+                    for shard_id, iterator in list(self._iterators.items())
+                ))
+                if not any(counts):
+                    await asyncio.sleep(STATUS_POLL_MS / 1000)
+        finally:
+            self.broker.live = False
+            self._iterators.clear()
+
+    async def _open_shards(self) -> List[str]:
+        shards = []
+        kwargs = {"StreamArn": self.stream_arn}
+        while True:
+            description = (await run_aws(self.client.describe_stream, **kwargs))["StreamDescription"]
+            shards += [s["ShardId"] for s in description["Shards"]
+                       if "EndingSequenceNumber" not in s["SequenceNumberRange"]]
+            last = description.get("LastEvaluatedShardId")
+            if not last:
+                return shards
+            kwargs["ExclusiveStartShardId"] = last
+
+    async def _refresh_shards(self, iterator_type: str) -> None:
+        # Closed shards stay in _iterators until they are drained
+        for shard_id in await self._open_shards():
+            if shard_id not in self._iterators:
+                self._iterators[shard_id] = await self._shard_iterator(shard_id, iterator_type)
+
+    async def _shard_iterator(self, shard_id: str, iterator_type: str) -> str:
+        response = await run_aws(
+            self.client.get_shard_iterator,
+            StreamArn=self.stream_arn,
+            ShardId=shard_id,
+            ShardIteratorType=iterator_type
+        )
+        return response["ShardIterator"]
+
+    async def _read_shard(self, shard_id: str, iterator: str) -> int:
+        try:
+            response = await run_aws(self.client.get_records, ShardIterator=iterator, Limit=1000)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ExpiredIteratorException":
+                raise
+            log.warning("stream_iterator_expired", shard_id=shard_id, resume_at="LATEST")
+            self._iterators[shard_id] = await self._shard_iterator(shard_id, "LATEST")
+            return 0
+
+        for record in response["Records"]:
+            change = record["dynamodb"]
+            # Deletes carry no NewImage: publish the key so watchers see NOT_FOUND
+            image = change.get("NewImage") or change["Keys"]
+            item = {k: _deserializer.deserialize(v) for k, v in image.items()}
+            if record["eventName"] == "REMOVE":
+                item = {"document_id": item["document_id"], "deleted": True}
+            self.broker.publish(item)
+        self.records += len(response["Records"])
+
+        next_iterator = response.get("NextShardIterator")
+        if next_iterator:
+            self._iterators[shard_id] = next_iterator
+        else:
+            del self._iterators[shard_id]  # closed shard, fully read
+        return len(response["Records"])
+
+
+status_broker = StatusBroker()
+status_feed = DynamoStreamFeed(DDB_STREAM_ARN, status_broker) if DDB_STREAM_ARN else None
+
+
+async def start_status_feed() -> None:
+    if status_feed is not None:
+        status_feed.start()
+
+
+async def stop_status_feed() -> None:
+    if status_feed is not None:
+        await status_feed.stop()
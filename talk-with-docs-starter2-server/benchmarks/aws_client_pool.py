@@ -0,0 +1,115 @@
+# benchmarks/aws_client_pool.py
+# Connection churn and latency for concurrent DynamoDB calls at different
+# client pool sizes (app.aws.AwsClients).
+#
+# Requests arrive in bursts of --concurrency calls. A local HTTP server answers
+# GetItem after --ddb-ms and counts the TCP connections it accepts. When a
+# burst ends, the pool keeps at most max_pool_connections idle connections and
+# closes the rest (pool_overflows), so the next burst opens them again. Against
+# AWS, each of those is a new TLS handshake. With the pool sized to the AWS
+# executor, connections are opened once and reused.
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.aws_client_pool --bursts 100 --concurrency 32 --pool-sizes 10,32
+import argparse
+import http.server
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DynamoHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    latency = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with DynamoHandler.lock:
+            DynamoHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+        body = b'{"Item": {"document_id": {"S": "doc"}, "scan_status": {"S": "PENDING"}}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-amz-json-1.0")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(pool_size: int, args) -> dict:
+    from app import aws
+
+    aws.AWS_MAX_POOL_CONNECTIONS = pool_size
+    clients = aws.AwsClients()
+    client = clients.client("dynamodb")
+    DynamoHandler.connections = 0
+
+    latencies = []
+
+    def call(i):
+        start = time.perf_counter()
+        client.get_item(TableName="DocumentMetadata", Key={"document_id": {"S": f"doc-{i}"}})
+        latencies.append(time.perf_counter() - start)
+
+    calls = args.bursts * args.concurrency
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for burst in range(args.bursts):
+            list(pool.map(call, range(burst * args.concurrency, (burst + 1) * args.concurrency)))
+            time.sleep(args.gap_ms / 1000)
+    elapsed = time.perf_counter() - start - args.bursts * args.gap_ms / 1000
+
+    stats = clients.stats()["dynamodb"]
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        "pool_size": pool_size,
+        "calls_per_sec": round(calls / elapsed),
+        "p50_ms": ms(statistics.median(latencies)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "connections_opened": DynamoHandler.connections,
+        "pool_overflows": stats["pool_overflows"],
+        "saturated_requests": stats["saturated_requests"],
+        "peak_in_flight": stats["peak_in_flight"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DynamoDB client pool size vs. connection churn")
+    parser.add_argument("--bursts", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=32, help="calls per burst (AWS_MAX_CONCURRENCY)")
+    parser.add_argument("--gap-ms", type=float, default=20, help="idle time between bursts")
+    parser.add_argument("--ddb-ms", type=float, default=5, help="GetItem latency")
+    parser.add_argument("--pool-sizes", default="10,32", help="10 is botocore's default")
+    args = parser.parse_args()
+
+    DynamoHandler.latency = args.ddb_ms / 1000
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), DynamoHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    os.environ["AWS_ENDPOINT_URL_DYNAMODB"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "local")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "local")
+
+    for pool_size in (int(size) for size in args.pool_sizes.split(",")):
+        result = run(pool_size, args)
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
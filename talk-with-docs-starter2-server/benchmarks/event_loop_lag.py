@@ -0,0 +1,116 @@
+# benchmarks/event_loop_lag.py
+# Event-loop lag and latency under mixed status-poll + chat load.
+#
+# Compares calling a (fake) synchronous DynamoDB `get_item` directly from the
+# event loop against routing it through `app.aws.run_aws`. Chat streams are
+# simulated as token emitters; their inter-token gap shows how much a blocked
+# loop stalls every in-flight `/chat` response.
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.event_loop_lag --polls 400 --streams 20 --ddb-ms 15
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.aws import run_aws
+
+
+class FakeTable:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+
+    def get_item(self, Key):
+        time.sleep(self.latency)  # blocking, like boto3
+        return {"Item": {"document_id": Key["document_id"], "scan_status": "PENDING"}}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+async def monitor_lag(stop: asyncio.Event, samples: list, interval: float = 0.005):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append(time.perf_counter() - start - interval)
+
+
+async def status_poll(table: FakeTable, mode: str, latencies: list, i: int):
+    start = time.perf_counter()
+    if mode == "blocking":
+        table.get_item(Key={"document_id": str(i)})
+    else:
+        await run_aws(table.get_item, Key={"document_id": str(i)})
+    latencies.append(time.perf_counter() - start)
+
+
+async def chat_stream(tokens: int, token_ms: float, gaps: list):
+    last = time.perf_counter()
+    for _ in range(tokens):
+        await asyncio.sleep(token_ms / 1000)  # model emitting a token
+        now = time.perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def run(mode: str, args) -> dict:
+    table = FakeTable(args.ddb_ms)
+    lag, poll_latencies, gaps = [], [], []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(stop, lag))
+
+    start = time.perf_counter()
+    streams = [
+        asyncio.create_task(chat_stream(args.tokens, args.token_ms, gaps))
+        for _ in range(args.streams)
+    ]
+
+    async def poller():
+        for i in range(args.polls):
+            asyncio.create_task(status_poll(table, mode, poll_latencies, i))
+            await asyncio.sleep(1 / args.poll_rps)
+
+    await asyncio.gather(poller(), *streams)
+    while len(poll_latencies) < args.polls:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await monitor
+
+    ms = lambda v: round(v * 1000, 2)
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 2),
+        "loop_lag_p50_ms": ms(percentile(lag, 50)),
+        "loop_lag_p99_ms": ms(percentile(lag, 99)),
+        "loop_lag_max_ms": ms(max(lag, default=0)),
+        "poll_p50_ms": ms(percentile(poll_latencies, 50)),
+        "poll_p99_ms": ms(percentile(poll_latencies, 99)),
+        "token_gap_mean_ms": ms(statistics.fmean(gaps)) if gaps else 0,
+        "token_gap_p99_ms": ms(percentile(gaps, 99)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Event-loop lag under mixed status-poll + chat load")
+    parser.add_argument("--polls", type=int, default=400, help="status polls to issue")
+    parser.add_argument("--poll-rps", type=float, default=200, help="status poll arrival rate")
+    parser.add_argument("--ddb-ms", type=float, default=15, help="fake get_item latency")
+    parser.add_argument("--streams", type=int, default=20, help="concurrent chat streams")
+    parser.add_argument("--tokens", type=int, default=100, help="tokens per chat stream")
+    parser.add_argument("--token-ms", type=float, default=20, help="delay between tokens")
+    args = parser.parse_args()
+
+    for mode in ("blocking", "executor"):
+        result = asyncio.run(run(mode, args))
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
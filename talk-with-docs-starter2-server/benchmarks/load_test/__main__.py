@@ -0,0 +1,261 @@
+# benchmarks/load_test/__main__.py
+# Load test of the whole server, offline: starts benchmarks.load_test.server
+# (app.main against local AWS stand-ins) in a subprocess and drives a mix of
+# traffic at a target rate for --duration seconds.
+#
+#   chat          POST /chat, streamed to the end
+#   upload        POST /generate-upload-url
+#   status        GET  /check-upload-status/{id}
+#   status_batch  POST /check-upload-status/batch with --batch-ids ids
+#
+# Requests are sent open-loop (on schedule, whether or not earlier ones have
+# finished), so a slow server shows up as latency rather than as a lower
+# send rate. Reported:
+#   - per kind: requests, achieved RPS, p50/p99 latency, errors
+#   - chat: time to first token p50/p99, streams that ended in an error event
+#   - server: event-loop lag p50/p99/max, RSS, and memory per open chat stream
+#     ((RSS at the most streams open - RSS after warm-up) / streams)
+#   - client: how late requests went out (if high, the client is the bottleneck)
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.load_test --rps 100 --duration 30 --mix chat=1,upload=2,status=6,status_batch=1
+#   python -m benchmarks.load_test --rps 50 --token-ms 30 --error-rate 0.05 --stream-error-rate 0.02
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import httpx
+
+from .server import parse_args as server_args
+
+KINDS = ("chat", "upload", "status", "status_batch")
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def parse_mix(spec: str) -> dict:
+    mix = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        kind, weight = entry.split("=")
+        if kind not in KINDS:
+            raise SystemExit(f"Unknown request kind {kind!r}; expected one of {', '.join(KINDS)}")
+        mix[kind] = float(weight)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port: int, passthrough: list, log_file) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.load_test.server", "--port", str(port), *passthrough],
+        env=os.environ.copy(), stdout=log_file, stderr=subprocess.STDOUT,
+    )
+
+
+async def wait_until_up(client: httpx.AsyncClient, server: subprocess.Popen, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"Server exited with code {server.returncode}")
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise SystemExit("Server did not start")
+
+
+class Results:
+    def __init__(self):
+        self.latency = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.ttft = []
+        self.stream_errors = 0
+        self.lateness = []
+
+    def record(self, kind: str, seconds: float, ok: bool, sample: dict) -> None:
+        self.latency[kind].append(seconds)
+        if not ok:
+            self.errors[kind] += 1
+        if "ttft" in sample:
+            self.ttft.append(sample["ttft"])
+        if sample.get("stream_error"):
+            self.stream_errors += 1
+
+
+class Traffic:
+    def __init__(self, client: httpx.AsyncClient, args, results: Results):
+        self.client = client
+        self.args = args
+        self.results = results
+        self.rng = random.Random(args.seed)
+
+    def _user_document(self):
+        i = self.rng.randrange(self.args.seed_documents)
+        return f"user-{i % self.args.users}", f"seed-{i}"
+
+    async def chat(self, sample: dict) -> bool:
+        user, document_id = self._user_document()
+        start = time.perf_counter()
+        body = {"message": "What does section 12 say about notice periods?",
+                "documentId": document_id, "sessionId": f"session-{self.rng.randrange(10 ** 6)}"}
+        async with self.client.stream("POST", "/chat", json=body, headers={"X-User-Id": user}) as response:
+            if response.status_code != 200:
+                return False
+            event = None
+            async for line in response.aiter_lines():
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    if event == "error":
+                        sample["stream_error"] = True
+                        return False
+                    if event is None and "ttft" not in sample:
+                        sample["ttft"] = time.perf_counter() - start
+                elif not line:
+                    event = None
+        return True
+
+    async def upload(self, sample: dict) -> bool:
+        user, _ = self._user_document()
+        response = await self.client.post(
+            "/generate-upload-url",
+            json={"file_title": "contract.pdf", "file_type": "application/pdf", "file_size": 2_400_000},
+            headers={"X-User-Id": user},
+        )
+        return response.status_code == 200
+
+    async def status(self, sample: dict) -> bool:
+        user, document_id = self._user_document()
+        response = await self.client.get(f"/check-upload-status/{document_id}", headers={"X-User-Id": user})
+        # Documents of other users answer 403, which is still a served request
+        return response.status_code in (200, 403)
+
+    async def status_batch(self, sample: dict) -> bool:
+        user, _ = self._user_document()
+        ids = [f"seed-{self.rng.randrange(self.args.seed_documents)}" for _ in range(self.args.batch_ids)]
+        response = await self.client.post("/check-upload-status/batch", json={"document_ids": ids},
+                                          headers={"X-User-Id": user})
+        return response.status_code == 200
+
+    async def send(self, kind: str, record: bool) -> None:
+        start = time.perf_counter()
+        sample = {}
+        try:
+            ok = await getattr(self, kind)(sample)
+        except httpx.HTTPError:
+            ok = False
+        if record:
+            self.results.record(kind, time.perf_counter() - start, ok, sample)
+
+
+async def drive(traffic: Traffic, mix: dict, rps: float, duration: float, record: bool) -> float:
+    """Send requests at `rps` for `duration` seconds; returns the time taken
+    until every request finished."""
+    kinds, weights = list(mix), list(mix.values())
+    interval = 1 / rps
+    tasks = []
+    start = time.perf_counter()
+    for n in range(int(rps * duration)):
+        due = start + n * interval
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif record:
+            traffic.results.lateness.append(-delay)
+        kind = traffic.rng.choices(kinds, weights)[0]
+        tasks.append(asyncio.create_task(traffic.send(kind, record)))
+    await asyncio.gather(*tasks)
+    return time.perf_counter() - start
+
+
+def report(results: Results, stats: dict, elapsed: float) -> None:
+    ms = lambda v: round(v * 1000, 1)
+    for kind, samples in sorted(results.latency.items()):
+        print(f"kind={kind}  requests={len(samples)}  rps={round(len(samples) / elapsed, 1)}  "
+              f"p50_ms={ms(percentile(samples, 50))}  p99_ms={ms(percentile(samples, 99))}  "
+              f"errors={results.errors[kind]}")
+    if results.latency.get("chat"):
+        print(f"chat_ttft_p50_ms={ms(percentile(results.ttft, 50))}  "
+              f"chat_ttft_p99_ms={ms(percentile(results.ttft, 99))}  "
+              f"chat_stream_errors={results.stream_errors}")
+
+    lag = stats["lag_seconds"]
+    print(f"loop_lag_p50_ms={ms(percentile(lag, 50))}  loop_lag_p99_ms={ms(percentile(lag, 99))}  "
+          f"loop_lag_max_ms={ms(max(lag, default=0))}")
+
+    mb = lambda b: round(b / 2 ** 20, 1)
+    streams = stats["peak_streams"]
+    per_stream = (stats["rss_at_peak_streams"] - stats["baseline_rss"]) / streams if streams else 0
+    print(f"rss_baseline_mb={mb(stats['baseline_rss'])}  rss_peak_mb={mb(stats['peak_rss'])}  "
+          f"peak_streams={streams}  kb_per_stream={round(per_stream / 1024, 1)}")
+
+    late = results.lateness
+    sent = sum(len(s) for s in results.latency.values())
+    print(f"client_late_sends={len(late)}/{sent}  client_late_p99_ms={ms(percentile(late, 99))}  "
+          f"bedrock={json.dumps(stats['aws']['bedrock-runtime'], separators=(',', ':'))}")
+
+
+async def run(args, passthrough: list) -> None:
+    port = free_port()
+    log_file = open(args.server_log, "w")
+    server = start_server(port, passthrough, log_file)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits,
+                                     timeout=httpx.Timeout(60)) as client:
+            await wait_until_up(client, server)
+            results = Results()
+            traffic = Traffic(client, args, results)
+            mix = parse_mix(args.mix)
+            if args.warmup:
+                await drive(traffic, mix, args.rps, args.warmup, record=False)
+            await client.post("/_load-test/reset")
+            elapsed = await drive(traffic, mix, args.rps, args.duration, record=True)
+            stats = (await client.get("/_load-test/stats")).json()
+        report(results, stats, elapsed)
+    finally:
+        server.terminate()
+        server.wait()
+        log_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test against local AWS stand-ins; server options (--tokens, --token-ms, "
+                    "--first-token-ms, --error-rate, --stream-error-rate, --ddb-ms, --retrieval-ms, "
+                    "--users, --seed-documents) are passed through to the server"
+    )
+    parser.add_argument("--rps", type=float, default=50)
+    parser.add_argument("--duration", type=float, default=20, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", default="chat=1,upload=2,status=6,status_batch=1")
+    parser.add_argument("--batch-ids", type=int, default=20, help="document ids per status_batch request")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--server-log", default=os.devnull,
+                        help="file for the server's output (injected errors are logged with tracebacks)")
+    args, passthrough = parser.parse_known_args()
+    server = server_args(passthrough)  # validates them, and the driver needs the seeding
+    args.users, args.seed_documents = server.users, server.seed_documents
+    asyncio.run(run(args, passthrough))
+
+
+if __name__ == "__main__":
+    main()
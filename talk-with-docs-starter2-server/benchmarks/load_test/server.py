@@ -0,0 +1,177 @@
+# benchmarks/load_test/server.py
+# The real app (app.main) served by uvicorn, with every AWS dependency
+# replaced by the stand-ins in stand_ins.py. Started by the load-test driver
+# (python -m benchmarks.load_test) in its own process, so the client's work
+# doesn't show up in the server's event-loop lag or memory.
+#
+# Adds two routes for the driver:
+#   GET  /_load-test/stats  event-loop lag samples, RSS, peak open chat
+#                           streams and the stand-ins' counters
+#   POST /_load-test/reset  clears the samples after warm-up
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.load_test.server --port 8765 --tokens 200 --token-ms 20
+import argparse
+import asyncio
+import os
+import resource
+import time
+
+TABLE = "load-test-documents"
+BUCKET = "load-test-uploads"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Talk with Docs server against local AWS stand-ins")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tokens", type=int, default=200, help="text deltas per chat answer")
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of chats throttled by Bedrock")
+    parser.add_argument("--stream-error-rate", type=float, default=0.0,
+                        help="share of chat streams that break off half way")
+    parser.add_argument("--ddb-ms", type=float, default=8)
+    parser.add_argument("--retrieval-ms", type=float, default=120)
+    parser.add_argument("--seed-documents", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=50)
+    return parser.parse_args(argv)
+
+
+def configure_env() -> None:
+    # Read by app modules at import time, so set before app.main is imported.
+    # Everything the stand-ins don't cover stays off.
+    os.environ.update({
+        "DDB_TABLE": TABLE,
+        "UPLOAD_BUCKET_NAME": BUCKET,
+        "ANSWER_CACHE_ENABLED": "false",
+        "CHAT_MESSAGE_TABLE": "",
+        "DDB_STREAM_ARN": "",
+        "KNOWLEDGE_BASE_ID": "",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "load-test")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "load-test")
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak rather than current, where /proc isn't available (kB on Linux, bytes on macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+class LoadMonitor:
+    """Samples event-loop lag (a 5 ms sleep that wakes up late), RSS and the
+    number of open chat streams."""
+
+    def __init__(self, streams_gauge, interval: float = 0.005, memory_every: int = 20):
+        self.streams = streams_gauge
+        self.interval = interval
+        self.memory_every = memory_every
+        self._task = None
+        self.reset()
+
+    def reset(self) -> None:
+        self.lag = []
+        self.baseline_rss = rss_bytes()
+        self.peak_rss = self.baseline_rss
+        self.peak_streams = 0
+        self.rss_at_peak_streams = self.baseline_rss
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _run(self) -> None:
+        ticks = 0
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag.append(time.perf_counter() - start - self.interval)
+            ticks += 1
+            if ticks % self.memory_every == 0:
+                self._sample_memory()
+
+    def _sample_memory(self) -> None:
+        rss = rss_bytes()
+        streams = int(self.streams._unlabeled().value)
+        self.peak_rss = max(self.peak_rss, rss)
+        if streams >= self.peak_streams:
+            self.peak_streams = streams
+            self.rss_at_peak_streams = rss
+
+    def stats(self) -> dict:
+        return {
+            "lag_seconds": self.lag,
+            "baseline_rss": self.baseline_rss,
+            "peak_rss": self.peak_rss,
+            "peak_streams": self.peak_streams,
+            "rss_at_peak_streams": self.rss_at_peak_streams,
+        }
+
+
+def build_app(args):
+    configure_env()
+    from app import aws, retrieval
+    from .stand_ins import FakeBedrockRuntime, InMemoryDynamoDB, InMemoryS3, LocalAwsClients, LocalRetriever
+
+    dynamodb = InMemoryDynamoDB(args.ddb_ms)
+    clients = LocalAwsClients(
+        FakeBedrockRuntime(args.tokens, args.first_token_ms, args.token_ms,
+                           args.error_rate, args.stream_error_rate),
+        dynamodb,
+        InMemoryS3(),
+    )
+    table = dynamodb.Table(TABLE)
+    for i in range(args.seed_documents):
+        table.items[f"seed-{i}"] = {
+            "document_id": f"seed-{i}",
+            "user_id": f"user-{i % args.users}",
+            "file_title": f"report-{i}.pdf",
+            "s3_key": f"user-{i % args.users}/seed-{i}/report-{i}.pdf",
+            "scan_status": "PROMOTED",
+            "processing_status": "INGESTED",
+        }
+
+    # Swapped in before app.main (and the routes) import aws_clients
+    aws.aws_clients = clients
+    retrieval.set_retriever(LocalRetriever(args.retrieval_ms))
+
+    from app.main import app
+    from app.metrics import streams_in_flight
+
+    monitor = LoadMonitor(streams_in_flight)
+    app.add_event_handler("startup", monitor.start)
+    app.add_event_handler("shutdown", monitor.stop)
+
+    @app.get("/_load-test/stats")
+    async def load_test_stats():
+        return {**monitor.stats(), "aws": clients.stats()}
+
+    @app.post("/_load-test/reset")
+    async def load_test_reset():
+        monitor.reset()
+        return {"reset": True}
+
+    return app
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = build_app(args)
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
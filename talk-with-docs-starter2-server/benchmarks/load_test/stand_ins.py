@@ -0,0 +1,217 @@
+# benchmarks/load_test/stand_ins.py
+# Local stand-ins for the AWS services the server calls, handed to the app
+# as app.aws.aws_clients (LocalAwsClients) and through
+# app.retrieval.set_retriever (LocalRetriever).
+#
+# They block like boto3 does (time.sleep), so the load goes through the same
+# executors, pools and threads as in production:
+#   - bedrock-runtime: invoke_model_with_response_stream returns an event
+#     stream of --tokens text deltas, --first-token-ms then --token-ms apart.
+#     A share of calls is throttled (--error-rate); a share of streams breaks
+#     off half way (--stream-error-rate).
+#   - dynamodb: in-memory tables (get/put/update item, batch get/write) with
+#     --ddb-ms per call
+#   - s3: presigned URLs and multipart bookkeeping, no network
+import asyncio
+import json
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from app.retrieval import Passage
+
+
+class ModelStreamError(Exception):
+    """What botocore raises when Bedrock sends an exception event mid-stream."""
+
+
+class FakeResponseStream:
+    def __init__(self, tokens: int, first_token_s: float, token_s: float, fail_at: Optional[int]):
+        self.tokens = tokens
+        self.first_token_s = first_token_s
+        self.token_s = token_s
+        self.fail_at = fail_at
+
+    @staticmethod
+    def _event(data: dict) -> dict:
+        return {"chunk": {"bytes": json.dumps(data).encode()}}
+
+    def __iter__(self):
+        yield self._event({"type": "message_start", "message": {"usage": {"input_tokens": 512}}})
+        time.sleep(self.first_token_s)
+        for i in range(self.tokens):
+            if i == self.fail_at:
+                raise ModelStreamError("modelStreamErrorException: the model stream was interrupted")
+            if i:
+                time.sleep(self.token_s)
+            yield self._event({"type": "content_block_delta", "delta": {"text": f"token{i} "}})
+        yield self._event({
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn"},
+            "usage": {"output_tokens": self.tokens},
+        })
+
+
+class FakeBedrockRuntime:
+    def __init__(self, tokens: int, first_token_ms: float, token_ms: float,
+                 error_rate: float = 0.0, stream_error_rate: float = 0.0, seed: int = 7):
+        self.tokens = tokens
+        self.first_token_s = first_token_ms / 1000
+        self.token_s = token_ms / 1000
+        self.error_rate = error_rate
+        self.stream_error_rate = stream_error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters = {"invocations": 0, "throttled": 0, "broken_streams": 0}
+
+    def _roll(self) -> float:
+        with self._lock:
+            return self._rng.random()
+
+    def invoke_model_with_response_stream(self, body, modelId, **kwargs):
+        with self._lock:
+            self.counters["invocations"] += 1
+        if self._roll() < self.error_rate:
+            with self._lock:
+                self.counters["throttled"] += 1
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException", "Message": "Too many requests"}},
+                "InvokeModelWithResponseStream"
+            )
+        fail_at = None
+        if self._roll() < self.stream_error_rate:
+            fail_at = self.tokens // 2
+            with self._lock:
+                self.counters["broken_streams"] += 1
+        return {"body": FakeResponseStream(self.tokens, self.first_token_s, self.token_s, fail_at)}
+
+
+class InMemoryTable:
+    def __init__(self, name: str, latency_s: float, key: str = "document_id"):
+        self.name = name
+        self.latency = latency_s
+        self.key = key
+        self.items: Dict[str, dict] = {}
+
+    def get_item(self, Key, **kwargs):
+        time.sleep(self.latency)
+        item = self.items.get(Key[self.key])
+        return {"Item": dict(item)} if item else {}
+
+    def put_item(self, Item, **kwargs):
+        time.sleep(self.latency)
+        self.items[Item[self.key]] = dict(Item)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues=None, **kwargs):
+        # Enough for "SET a = :a, b = :b" and "REMOVE a"
+        time.sleep(self.latency)
+        item = self.items.setdefault(Key[self.key], dict(Key))
+        values = ExpressionAttributeValues or {}
+        action, _, assignments = UpdateExpression.partition(" ")
+        for assignment in assignments.split(","):
+            name, _, placeholder = (part.strip() for part in assignment.partition("="))
+            if action == "SET":
+                item[name] = values[placeholder]
+            elif action == "REMOVE":
+                item.pop(name, None)
+        return {}
+
+
+class InMemoryDynamoDB:
+    """Stands in for both the resource and the low-level client."""
+
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.tables: Dict[str, InMemoryTable] = {}
+        self._lock = threading.Lock()
+
+    def Table(self, name: str) -> InMemoryTable:
+        with self._lock:
+            if name not in self.tables:
+                self.tables[name] = InMemoryTable(name, self.latency)
+            return self.tables[name]
+
+    def batch_get_item(self, RequestItems):
+        time.sleep(self.latency)
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.Table(name)
+            responses[name] = [dict(table.items[k[table.key]]) for k in request["Keys"]
+                               if k[table.key] in table.items]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def batch_write_item(self, RequestItems):
+        time.sleep(self.latency)
+        for name, requests in RequestItems.items():
+            table = self.Table(name)
+            for request in requests:
+                item = request["PutRequest"]["Item"]
+                table.items[item[table.key]] = dict(item)
+        return {"UnprocessedItems": {}}
+
+
+class InMemoryS3:
+    def __init__(self):
+        self.uploads: Dict[str, str] = {}  # upload id -> key
+        self._lock = threading.Lock()
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn=3600, **kwargs):
+        query = f"uploadId={Params['UploadId']}&partNumber={Params['PartNumber']}" if "UploadId" in Params else ""
+        return f"http://s3.local/{Params['Bucket']}/{Params['Key']}?{query}X-Amz-Expires={ExpiresIn}"
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        with self._lock:
+            upload_id = f"upload-{len(self.uploads) + 1}"
+            self.uploads[upload_id] = Key
+        return {"UploadId": upload_id}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            if self.uploads.pop(UploadId, None) != Key:
+                raise ClientError({"Error": {"Code": "NoSuchUpload"}}, "CompleteMultipartUpload")
+        return {}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            self.uploads.pop(UploadId, None)
+        return {}
+
+
+class LocalAwsClients:
+    """Same surface as app.aws.AwsClients, backed by the stand-ins above."""
+
+    def __init__(self, bedrock: FakeBedrockRuntime, dynamodb: InMemoryDynamoDB, s3: InMemoryS3):
+        self._clients = {"bedrock-runtime": bedrock, "dynamodb": dynamodb, "s3": s3}
+        self.dynamodb = dynamodb
+
+    def client(self, service: str):
+        return self._clients[service]
+
+    def resource(self, service: str):
+        return self._clients[service]
+
+    def table(self, name: str) -> InMemoryTable:
+        return self.dynamodb.Table(name)
+
+    def stats(self) -> dict:
+        return {"bedrock-runtime": dict(self._clients["bedrock-runtime"].counters)}
+
+
+class LocalRetriever:
+    """Knowledge Base retrieval with a fixed latency and canned passages."""
+
+    def __init__(self, latency_ms: float, passages: int = 3):
+        self.latency = latency_ms / 1000
+        self.passages = passages
+
+    async def retrieve(self, query: str, user_id: str, document_id: str, top_k: int) -> List[Passage]:
+        await asyncio.sleep(self.latency)
+        return [
+            Passage(text=f"Passage {i} of {document_id}. " * 20, score=0.9 - i * 0.1,
+                    source=f"s3://final/{user_id}/{document_id}/file.pdf")
+            for i in range(min(self.passages, top_k))
+        ]
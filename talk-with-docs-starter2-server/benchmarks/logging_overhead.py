@@ -0,0 +1,123 @@
+# benchmarks/logging_overhead.py
+# Per-request logging cost on the event loop: the old synchronous prints of
+# the chat request (user id line + full body) vs. app/logs.py (queued,
+# redacted JSON written by a listener thread), with and without sampling.
+#
+# stdout is replaced by a sink that takes --sink-us per write, like a log pipe
+# whose reader (container runtime, log driver) is falling behind. Reported:
+# time the request spent logging (mean/p99), and for the queued logger, how
+# many lines were written vs. dropped because the queue was full.
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.logging_overhead --requests 5000 --sink-us 50 --sample 0.1
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import threading
+import time
+
+USER_ID = "user-1"
+BODY = {
+    "message": "What does the termination clause in section 12 say about notice periods? " * 4,
+    "documentId": "5f0c6f7e-8d5e-4a47-9a3c-1b2f7d1c9e10",
+    "sessionId": "b7e1c2d4-1f3a-4c5b-8d9e-0a1b2c3d4e5f",
+}
+
+
+class SlowSink:
+    def __init__(self, write_us: float):
+        self.delay = write_us / 1e6
+        self.writes = 0
+        self._lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        with self._lock:
+            self.writes += 1
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def drive(handle, args) -> list:
+    """Time `handle()` once per request, yielding to the loop between requests."""
+    durations = []
+    for _ in range(args.requests):
+        start = time.perf_counter()
+        await handle()
+        durations.append(time.perf_counter() - start)
+        await asyncio.sleep(0)
+    return durations
+
+
+def run_print(args) -> dict:
+    sink = SlowSink(args.sink_us)
+
+    async def handle():
+        # What chat.py used to do on every message
+        print(f"User ID: {USER_ID}, Document ID: {BODY['documentId']}")
+        print(f"Request body: {BODY}")
+
+    with contextlib.redirect_stdout(sink):
+        durations = asyncio.run(drive(handle, args))
+    return summarize("print", durations, sink)
+
+
+def run_logger(args, sample: float) -> dict:
+    os.environ["LOG_SAMPLE_RATES"] = f"/chat={sample}"
+    from app import logs
+    logs.SAMPLE_RATES = logs._parse_rates(os.environ["LOG_SAMPLE_RATES"])
+    logs.stop_logging()
+    sink = SlowSink(args.sink_us)
+    logs.start_logging(sink)
+    dropped_before = logs.queue_handler.dropped
+    log = logs.get_logger("app.routes.chat")
+
+    async def endpoint(scope, receive, send):
+        log.info("chat_request", user_id=USER_ID, document_id=BODY["documentId"],
+                 session_id=BODY["sessionId"], message_chars=len(BODY["message"]))
+
+    middleware = logs.LogContextMiddleware(endpoint)
+    scope = {"type": "http", "path": "/chat", "headers": [(b"authorization", b"Bearer secret")]}
+
+    async def handle():
+        await middleware(scope, None, None)
+
+    durations = asyncio.run(drive(handle, args))
+    logs.stop_logging()  # drains the queue
+    result = summarize(f"logger(sample={sample})", durations, sink)
+    result["dropped"] = logs.queue_handler.dropped - dropped_before
+    return result
+
+
+def summarize(mode: str, durations: list, sink: SlowSink) -> dict:
+    us = lambda v: round(v * 1e6, 1)
+    return {
+        "mode": mode,
+        "mean_us": us(statistics.mean(durations)),
+        "p99_us": us(percentile(durations, 99)),
+        "lines_written": sink.writes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request logging overhead: print vs. queued logger")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sink-us", type=float, default=50, help="time per stdout write")
+    parser.add_argument("--sample", type=float, default=0.1, help="LOG_SAMPLE_RATES rate for /chat")
+    args = parser.parse_args()
+
+    for result in (run_print(args), run_logger(args, 1.0), run_logger(args, args.sample)):
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/metrics_overhead.py
+# Cost of recording metrics (app/metrics.py) on the hot paths.
+#
+# Reported:
+#   - ns per histogram observation and counter increment, from one thread and
+#     from --threads threads at once (botocore hooks record from the AWS
+#     executor threads, so the locks are contended)
+#   - ns per chat token: a stream of --tokens deltas through sse_stream with
+#     and without the per-token StreamTimer, i.e. what TTFT/inter-token
+#     tracking adds to each Bedrock chunk
+#   - ms to render /metrics with --series label combinations
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.metrics_overhead --ops 200000 --threads 8 --tokens 20000
+import argparse
+import asyncio
+import threading
+import time
+
+from app.metrics import Counter, Histogram, Registry, StreamTimer
+from app.sse import sse_stream
+
+
+def ns_per_op(fn, ops: int, threads: int = 1) -> float:
+    per_thread = ops // threads
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+async def stream_ns_per_token(tokens: int, timed: bool) -> float:
+    async def deltas():
+        timer = StreamTimer()
+        for i in range(tokens):
+            if timed:
+                timer.token()
+            yield "tok "
+            if i % 64 == 0:
+                await asyncio.sleep(0)  # let the coalescer flush now and then
+
+    start = time.perf_counter()
+    async for _ in sse_stream(deltas(), {"cached": False}):
+        pass
+    return (time.perf_counter() - start) / tokens * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics recording overhead")
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--tokens", type=int, default=20000)
+    parser.add_argument("--series", type=int, default=200, help="label combinations to render")
+    args = parser.parse_args()
+
+    histogram = Histogram("bench_seconds", "benchmark histogram", ("route",))
+    series = histogram.labels("/chat")
+    counter = Counter("bench_total", "benchmark counter")
+
+    for threads in (1, args.threads):
+        result = {
+            "threads": threads,
+            "observe_ns": round(ns_per_op(lambda: series.observe(0.042), args.ops, threads)),
+            "labels_observe_ns": round(ns_per_op(lambda: histogram.labels("/chat").observe(0.042), args.ops, threads)),
+            "counter_inc_ns": round(ns_per_op(lambda: counter.inc(), args.ops, threads)),
+        }
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+    plain = min(asyncio.run(stream_ns_per_token(args.tokens, timed=False)) for _ in range(3))
+    timed = min(asyncio.run(stream_ns_per_token(args.tokens, timed=True)) for _ in range(3))
+    print(f"stream_ns_per_token={round(plain)}  with_timer_ns_per_token={round(timed)}  "
+          f"added_ns_per_token={round(timed - plain)}")
+
+    registry = Registry()
+    wide = registry.histogram("bench_request_seconds", "benchmark", ("method", "route", "status"))
+    for i in range(args.series):
+        wide.labels("GET", f"/route-{i}", "200").observe(0.01)
+    start = time.perf_counter()
+    text = registry.render()
+    print(f"series={args.series}  render_ms={round((time.perf_counter() - start) * 1000, 2)}  "
+          f"render_kb={round(len(text) / 1024, 1)}")
+
+
+if __name__ == "__main__":
+    main()
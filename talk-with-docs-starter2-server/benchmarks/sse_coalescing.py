@@ -0,0 +1,117 @@
+# benchmarks/sse_coalescing.py
+# Writes per response, CPU per stream and time-to-first-token for the chat
+# stream: one raw write per Bedrock delta (previous behaviour) vs. the SSE
+# encoder with delta coalescing (app/sse.py).
+#
+# Streams are driven through Starlette's StreamingResponse with an ASGI `send`
+# that writes each body chunk to a real socket (drained by a background
+# thread), so every counted write costs a send() syscall like it would in
+# uvicorn.
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.sse_coalescing --streams 50 --tokens 300 --token-ms 8
+import argparse
+import asyncio
+import random
+import socket
+import statistics
+import threading
+import time
+
+from fastapi.responses import StreamingResponse
+
+from app.sse import sse_stream
+
+
+async def fake_deltas(tokens: int, token_ms: float, seed: int):
+    # Bedrock deltas arrive in bursts: exponential gaps around --token-ms
+    rng = random.Random(seed)
+    for i in range(tokens):
+        await asyncio.sleep(rng.expovariate(1000 / token_ms))
+        yield f"tok{i} "
+
+
+async def raw_stream(deltas):
+    async for text in deltas:
+        yield text.encode("utf-8")
+
+
+def socket_sink():
+    writer, reader = socket.socketpair()
+
+    def drain():
+        while reader.recv(65536):
+            pass
+
+    threading.Thread(target=drain, daemon=True).start()
+    return writer
+
+
+async def drive(body, sink) -> dict:
+    stats = {"writes": 0, "bytes": 0, "ttft": None}
+    start = time.perf_counter()
+
+    async def receive():
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            if stats["ttft"] is None:
+                stats["ttft"] = time.perf_counter() - start
+            sink.sendall(message["body"])
+            stats["writes"] += 1
+            stats["bytes"] += len(message["body"])
+
+    response = StreamingResponse(body, media_type="text/event-stream")
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    return stats
+
+
+async def consume(deltas) -> dict:
+    async for _ in deltas:
+        pass
+    return {"writes": 0, "bytes": 0, "ttft": 0.0}
+
+
+async def run(mode: str, args) -> dict:
+    def body(i):
+        deltas = fake_deltas(args.tokens, args.token_ms, seed=i)
+        return raw_stream(deltas) if mode == "raw" else sse_stream(deltas, {})
+
+    if mode == "producer":
+        # CPU spent by the fake Bedrock source alone, to subtract from the others
+        cpu_start = time.thread_time()
+        await asyncio.gather(*(consume(fake_deltas(args.tokens, args.token_ms, seed=i))
+                               for i in range(args.streams)))
+        return {"mode": mode, "cpu_ms_per_stream": round((time.thread_time() - cpu_start) * 1000 / args.streams, 2)}
+
+    sink = socket_sink()
+    cpu_start = time.thread_time()
+    results = await asyncio.gather(*(drive(body(i), sink) for i in range(args.streams)))
+    cpu = time.thread_time() - cpu_start
+    sink.close()
+
+    return {
+        "mode": mode,
+        "writes_per_response": statistics.fmean(r["writes"] for r in results),
+        "bytes_per_response": statistics.fmean(r["bytes"] for r in results),
+        "cpu_ms_per_stream": round(cpu * 1000 / args.streams, 2),
+        "ttft_mean_ms": round(statistics.fmean(r["ttft"] for r in results) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE coalescing: writes and CPU per stream")
+    parser.add_argument("--streams", type=int, default=50, help="concurrent chat streams")
+    parser.add_argument("--tokens", type=int, default=300, help="deltas per stream")
+    parser.add_argument("--token-ms", type=float, default=8, help="mean gap between deltas")
+    args = parser.parse_args()
+
+    for mode in ("producer", "raw", "sse"):
+        result = asyncio.run(run(mode, args))
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
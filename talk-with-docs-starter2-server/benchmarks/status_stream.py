@@ -0,0 +1,163 @@
+# benchmarks/status_stream.py
+# Upload status: clients polling check-upload-status vs. long-poll and SSE
+# subscriptions fed by a change feed (app/status_events.py).
+#
+# Each document goes PENDING -> NO_THREATS_FOUND -> PROMOTED at random times
+# within --lifecycle-s. Writes go to an in-memory table and are published
+# through LocalStatusFeed, standing in for the DynamoDB Stream. Reported:
+# get_item calls and how long after each change clients saw it.
+#
+# Usage (from talk-with-docs-starter2-server/):
+#   python -m benchmarks.status_stream --documents 50 --clients 2 --poll-s 1
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from starlette.requests import Request
+
+from app.routes import check_upload_status as route
+from app.status_events import LocalStatusFeed, status_broker
+
+USER_ID = "user-1"
+
+
+class FakeTable:
+    def __init__(self, latency_ms: float):
+        self.latency = latency_ms / 1000
+        self.items = {}
+        self.reads = 0
+
+    def get_item(self, Key):
+        time.sleep(self.latency)  # blocking, like boto3
+        self.reads += 1
+        item = self.items.get(Key["document_id"])
+        return {"Item": dict(item)} if item else {}
+
+
+class FakeClients:
+    def __init__(self, table: FakeTable):
+        self._table = table
+
+    def table(self, name):
+        return self._table
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def request(headers: dict) -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/", "query_string": b"",
+                    "headers": [(k.lower().encode(), v.encode()) for k, v in headers.items()]})
+
+
+async def lifecycle(table: FakeTable, feed, document_id: str, changed_at: dict, args, rng):
+    for status, field in (("NO_THREATS_FOUND", "scan_status"), ("PROMOTED", "processing_status")):
+        await asyncio.sleep(rng.uniform(0.2, 0.5) * args.lifecycle_s)
+        table.items[document_id][field] = status
+        changed_at[(document_id, status)] = time.perf_counter()
+        if feed is not None:
+            feed.emit(dict(table.items[document_id]))
+
+
+def seen(view: dict, document_id: str, changed_at: dict, delays: list, last: set):
+    for status in (view["status"], view.get("processing_status")):
+        if (document_id, status) in changed_at and status not in last:
+            last.add(status)
+            delays.append(time.perf_counter() - changed_at[(document_id, status)])
+
+
+async def poll_client(clients: FakeClients, document_id: str, changed_at: dict, delays: list, args):
+    observed = set()
+    while True:
+        view = await route.check_upload_status(document_id, request({"X-User-Id": USER_ID}), clients=clients)
+        view = json.loads(view.body)
+        seen(view, document_id, changed_at, delays, observed)
+        if view.get("processing_status") == "PROMOTED":
+            return
+        await asyncio.sleep(args.poll_s)
+
+
+async def long_poll_client(clients: FakeClients, document_id: str, changed_at: dict, delays: list, args):
+    observed = set()
+    etag = None
+    while True:
+        headers = {"X-User-Id": USER_ID, **({"If-None-Match": etag} if etag else {})}
+        response = await route.check_upload_status(document_id, request(headers), wait=25, clients=clients)
+        if response.status_code == 304:
+            continue
+        etag = response.headers["etag"]
+        view = json.loads(response.body)
+        seen(view, document_id, changed_at, delays, observed)
+        if view.get("processing_status") == "PROMOTED":
+            return
+
+
+async def sse_client(clients: FakeClients, document_id: str, changed_at: dict, delays: list, args):
+    observed = set()
+    response = await route.check_upload_status_events(document_id, request({"X-User-Id": USER_ID}), clients=clients)
+    async for frame in response.body_iterator:
+        lines = frame.decode().strip().split("\n")
+        if lines[0] == "event: status":
+            seen(json.loads(lines[-1][len("data: "):]), document_id, changed_at, delays, observed)
+
+
+async def run(mode: str, args) -> dict:
+    rng = random.Random(7)
+    table = FakeTable(args.ddb_ms)
+    clients = FakeClients(table)
+    feed = None
+    if mode != "poll":
+        feed = LocalStatusFeed(status_broker)
+        feed.start()
+
+    client = {"poll": poll_client, "long-poll": long_poll_client, "sse": sse_client}[mode]
+    changed_at, delays, tasks = {}, [], []
+    for d in range(args.documents):
+        document_id = f"doc-{d}"
+        table.items[document_id] = {"document_id": document_id, "user_id": USER_ID, "scan_status": "PENDING"}
+        tasks += [client(clients, document_id, changed_at, delays, args) for _ in range(args.clients)]
+
+    start = time.perf_counter()
+    writers = [lifecycle(table, feed, f"doc-{d}", changed_at, args, rng) for d in range(args.documents)]
+    await asyncio.gather(*tasks, *writers)
+    elapsed = time.perf_counter() - start
+    if feed is not None:
+        await feed.stop()
+
+    ms = lambda v: round(v * 1000, 1)
+    return {
+        "mode": mode,
+        "elapsed_s": round(elapsed, 2),
+        "get_item_calls": table.reads,
+        "reads_per_client": round(table.reads / (args.documents * args.clients), 1),
+        "notify_p50_ms": ms(percentile(delays, 50)),
+        "notify_p99_ms": ms(percentile(delays, 99)),
+        "changes_seen": len(delays),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload status: polling vs. long-poll vs. SSE")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=2, help="watchers per document (tabs, devices)")
+    parser.add_argument("--lifecycle-s", type=float, default=6, help="scale of scan + promotion time")
+    parser.add_argument("--poll-s", type=float, default=1, help="client polling interval")
+    parser.add_argument("--ddb-ms", type=float, default=5, help="fake get_item latency")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DDB_TABLE", "DocumentMetadata")
+    for mode in ("poll", "long-poll", "sse"):
+        result = asyncio.run(run(mode, args))
+        print("  ".join(f"{k}={v}" for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
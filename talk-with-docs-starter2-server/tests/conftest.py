@@ -0,0 +1,13 @@
+import os
+
+import pytest
+
+# boto3 clients are created at import time; no test reaches AWS
+os.environ.setdefault("AWS_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "test")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "test")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
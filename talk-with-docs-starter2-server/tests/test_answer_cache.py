@@ -0,0 +1,156 @@
+import time
+
+import pytest
+
+from app.answer_cache import SemanticAnswerCache
+
+
+class FakeEmbedder:
+    """Maps known questions to fixed vectors and counts calls."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.calls = 0
+
+    async def __call__(self, text):
+        self.calls += 1
+        return self.vectors[text]
+
+
+class FakeDocuments:
+    def __init__(self):
+        self.versions = {}
+
+    def get_item(self, Key, ProjectionExpression):
+        version = self.versions.get(Key["document_id"])
+        return {"Item": {"ingest_version": version}} if version is not None else {}
+
+
+class FakeAnswerTable:
+    def __init__(self):
+        self.items = []
+
+    def put_item(self, Item):
+        self.items.append(Item)
+
+    def query(self, KeyConditionExpression):
+        key = KeyConditionExpression.get_expression()["values"][1]
+        return {"Items": [item for item in self.items if item["cache_key"] == key]}
+
+
+QUESTIONS = {
+    "Summarize this document": [1.0, 0.0, 0.0],
+    "Give me a summary of the document": [0.96, 0.28, 0.0],
+    "What are the key dates?": [0.0, 0.0, 1.0],
+}
+
+
+@pytest.fixture
+def embed():
+    return FakeEmbedder(QUESTIONS)
+
+
+@pytest.fixture
+def documents():
+    return FakeDocuments()
+
+
+async def ask_and_store(cache, question, answer, user="alice", document="doc"):
+    lookup = await cache.lookup(user, document, question)
+    assert lookup.entry is None
+    await cache.store(user, document, lookup.version, question, lookup.embedding, answer)
+
+
+@pytest.mark.anyio
+async def test_exact_repeat_skips_the_embedding(embed, documents):
+    cache = SemanticAnswerCache(embed, documents=documents)
+    await ask_and_store(cache, "Summarize this document", "It is about caching.")
+
+    lookup = await cache.lookup("alice", "doc", "  summarize THIS document ")
+
+    assert lookup.entry.answer == "It is about caching."
+    assert embed.calls == 1
+    assert cache.stats()["hits_exact"] == 1
+
+
+@pytest.mark.anyio
+async def test_paraphrase_above_the_threshold_hits(embed, documents):
+    cache = SemanticAnswerCache(embed, documents=documents, threshold=0.9)
+    await ask_and_store(cache, "Summarize this document", "It is about caching.")
+
+    hit = await cache.lookup("alice", "doc", "Give me a summary of the document")
+    miss = await cache.lookup("alice", "doc", "What are the key dates?")
+
+    assert hit.entry.answer == "It is about caching."
+    assert hit.similarity == pytest.approx(0.96)
+    assert miss.entry is None and miss.embedding is not None
+
+
+@pytest.mark.anyio
+async def test_answers_are_scoped_per_user_and_document(embed, documents):
+    cache = SemanticAnswerCache(embed, documents=documents)
+    await ask_and_store(cache, "Summarize this document", "Alice's answer")
+
+    assert (await cache.lookup("bob", "doc", "Summarize this document")).entry is None
+    assert (await cache.lookup("alice", "other", "Summarize this document")).entry is None
+
+
+@pytest.mark.anyio
+async def test_reingested_document_invalidates_its_answers(embed, documents):
+    table = FakeAnswerTable()
+    cache = SemanticAnswerCache(embed, documents=documents, table=table)
+    await ask_and_store(cache, "Summarize this document", "About version 0")
+    assert table.items[0]["cache_key"] == "alice#doc#0"
+
+    documents.versions["doc"] = 1
+    lookup = await cache.lookup("alice", "doc", "Summarize this document")
+
+    assert lookup.entry is None
+    assert lookup.version == "1"
+    assert cache.stats()["entries"] == 0  # version 0 entries dropped from memory
+
+
+@pytest.mark.anyio
+async def test_entries_are_shared_through_the_table(embed, documents):
+    table = FakeAnswerTable()
+    await ask_and_store(SemanticAnswerCache(embed, documents=documents, table=table),
+                        "Summarize this document", "Stored by another replica")
+
+    other_replica = SemanticAnswerCache(embed, documents=documents, table=table)
+    lookup = await other_replica.lookup("alice", "doc", "Summarize this document")
+
+    assert lookup.entry.answer == "Stored by another replica"
+
+
+@pytest.mark.anyio
+async def test_expired_entries_are_not_served(embed, documents):
+    cache = SemanticAnswerCache(embed, documents=documents, ttl_seconds=-1)
+    await ask_and_store(cache, "Summarize this document", "Too old")
+
+    assert (await cache.lookup("alice", "doc", "Summarize this document")).entry is None
+    assert cache.stats()["expired"] == 1
+
+
+@pytest.mark.anyio
+async def test_per_document_cap_evicts_the_oldest(embed, documents):
+    cache = SemanticAnswerCache(embed, documents=documents, max_per_document=1)
+    await ask_and_store(cache, "Summarize this document", "first")
+    await ask_and_store(cache, "What are the key dates?", "second")
+
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["evictions"] == 1
+    assert (await cache.lookup("alice", "doc", "What are the key dates?")).entry.answer == "second"
+
+
+@pytest.mark.anyio
+async def test_unknown_version_skips_the_cache(embed):
+    class FailingDocuments:
+        def get_item(self, **kwargs):
+            raise RuntimeError("DynamoDB unavailable")
+
+    cache = SemanticAnswerCache(embed, documents=FailingDocuments())
+    lookup = await cache.lookup("alice", "doc", "Summarize this document")
+
+    assert lookup.entry is None and lookup.embedding is None  # nothing will be stored
+    assert cache.stats()["errors"] == 1
+    assert embed.calls == 0
@@ -0,0 +1,75 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routes import check_upload_status
+from app.status_cache import BatchResult
+
+
+class FakeStatusReader:
+    def __init__(self, items, unprocessed=()):
+        self.items = items
+        self.unprocessed = list(unprocessed)
+        self.requested = None
+
+    async def get_many(self, document_ids):
+        self.requested = list(document_ids)
+        return BatchResult(
+            items={d: self.items.get(d) for d in document_ids if d not in self.unprocessed},
+            unprocessed=self.unprocessed
+        )
+
+
+def document(document_id, user_id, status="PENDING"):
+    return {"document_id": document_id, "user_id": user_id, "scan_status": status,
+            "file_title": f"{document_id}.pdf", "s3_key": f"{user_id}/{document_id}/{document_id}.pdf"}
+
+
+@pytest.fixture
+def reader(monkeypatch):
+    reader = FakeStatusReader({
+        "mine": document("mine", "alice", "NO_THREATS_FOUND"),
+        "theirs": document("theirs", "bob"),
+    }, unprocessed=["throttled"])
+    monkeypatch.setattr(check_upload_status, "status_reader", reader)
+    return reader
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(check_upload_status.router)
+    return TestClient(app)
+
+
+def test_batch_reports_only_the_callers_documents(client, reader):
+    response = client.post(
+        "/check-upload-status/batch",
+        json={"document_ids": ["mine", "theirs", "missing", "throttled"]},
+        headers={"X-User-Id": "alice"}
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["documents"]["mine"]["status"] == "NO_THREATS_FOUND"
+    assert body["documents"]["mine"]["user_id"] == "alice"
+    assert body["documents"]["theirs"] == {"status": "UNAUTHORIZED"}
+    assert body["documents"]["missing"] == {"status": "NOT_FOUND"}
+    assert body["unprocessed"] == ["throttled"]
+
+
+def test_batch_requires_a_user(client, reader):
+    response = client.post("/check-upload-status/batch", json={"document_ids": ["mine"]})
+    assert response.status_code == 403
+    assert reader.requested is None
+
+
+def test_batch_rejects_too_many_ids(client, reader, monkeypatch):
+    monkeypatch.setattr(check_upload_status, "STATUS_BATCH_MAX_IDS", 2)
+    response = client.post(
+        "/check-upload-status/batch",
+        json={"document_ids": ["a", "b", "c"]},
+        headers={"X-User-Id": "alice"}
+    )
+    assert response.status_code == 400
+    assert reader.requested is None
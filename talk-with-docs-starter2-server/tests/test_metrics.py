@@ -0,0 +1,49 @@
+import pytest
+
+from app.metrics import Registry
+
+
+def test_counters_and_gauges_render_with_labels():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests", ("route",))
+    in_flight = registry.gauge("in_flight", "Open requests")
+
+    requests.labels("/chat").inc()
+    requests.labels(route="/chat").inc(2)
+    requests.labels('/a"b\\c').inc()
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a\\"b\\\\c"} 1',
+        'requests_total{route="/chat"} 3',
+        "# HELP in_flight Open requests",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ("source",), buckets=(0.1, 1))
+    series = latency.labels("cache")
+    for value in (0.05, 0.1, 0.5, 3):
+        series.observe(value)
+
+    assert registry.render().splitlines()[2:] == [
+        'latency_seconds_bucket{source="cache",le="0.1"} 2',
+        'latency_seconds_bucket{source="cache",le="1"} 3',
+        'latency_seconds_bucket{source="cache",le="+Inf"} 4',
+        'latency_seconds_sum{source="cache"} 3.65',
+        'latency_seconds_count{source="cache"} 4',
+    ]
+
+
+def test_metric_names_are_unique():
+    registry = Registry()
+    registry.counter("requests_total", "Requests")
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests")
@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+import pytest
+
+from app.sse import SSEEncoder, coalesce, sse_stream
+
+
+async def deltas(*texts, pause=0.0, fail=False):
+    for text in texts:
+        yield text
+        await asyncio.sleep(pause)
+    if fail:
+        raise RuntimeError("stream broke")
+
+
+async def collect(stream):
+    return [item async for item in stream]
+
+
+def parse(frames):
+    events = []
+    for frame in frames:
+        fields = dict(line.split(": ", 1) for line in frame.decode().strip().split("\n"))
+        events.append((fields.get("event"), int(fields["id"]), json.loads(fields["data"])))
+    return events
+
+
+@pytest.mark.anyio
+async def test_first_delta_is_sent_alone_and_the_rest_are_merged():
+    stats = {}
+    chunks = await collect(coalesce(deltas("a", "b", "c", "d"), window_ms=1000, stats=stats))
+    assert chunks == ["a", "bcd"]
+    assert stats["deltas"] == 4
+
+
+@pytest.mark.anyio
+async def test_flushes_when_max_bytes_accumulate():
+    chunks = await collect(coalesce(deltas("a", "bb", "cc", "dd"), window_ms=1000, max_bytes=4))
+    assert chunks == ["a", "bbcc", "dd"]
+
+
+@pytest.mark.anyio
+async def test_flushes_when_the_window_passes():
+    chunks = await collect(coalesce(deltas("a", "b", "c", pause=0.05), window_ms=5))
+    assert chunks == ["a", "b", "c"]
+
+
+@pytest.mark.anyio
+async def test_producer_errors_surface_after_buffered_text():
+    stream = coalesce(deltas("a", "b", fail=True), window_ms=1000)
+    assert await stream.__anext__() == "a"
+    assert await stream.__anext__() == "b"
+    with pytest.raises(RuntimeError):
+        await stream.__anext__()
+
+
+def test_encoder_numbers_events():
+    encoder = SSEEncoder()
+    assert encoder.encode({"text": "hi\nthere"}) == b'id: 1\ndata: {"text":"hi\\nthere"}\n\n'
+    assert encoder.encode({}, event="done") == b"event: done\nid: 2\ndata: {}\n\n"
+
+
+@pytest.mark.anyio
+async def test_stream_ends_with_done_event_carrying_the_summary():
+    summary = {"cached": False}
+
+    async def answer():
+        yield "Hello"
+        yield ", world"
+        summary["usage"] = {"output_tokens": 3}  # filled in while streaming
+
+    events = parse(await collect(sse_stream(answer(), summary)))
+
+    text = "".join(data["text"] for event, _, data in events if event is None)
+    assert text == "Hello, world"
+    event, last_id, data = events[-1]
+    assert event == "done"
+    assert last_id == len(events)
+    assert data["usage"] == {"output_tokens": 3}
+    assert data["deltas"] == 2
+    assert data["events"] == len(events) - 1
+
+
+@pytest.mark.anyio
+async def test_stream_reports_errors_as_an_error_event():
+    events = parse(await collect(sse_stream(deltas("partial", fail=True), {"cached": True})))
+    assert events[0][2] == {"text": "partial"}
+    assert events[-1][0] == "error"
+    assert "done" not in [event for event, _, _ in events]
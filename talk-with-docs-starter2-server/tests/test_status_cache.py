@@ -0,0 +1,104 @@
+import pytest
+
+from app import status_cache as status_cache_module
+from app.status_cache import StatusCache
+from app.status_events import StatusBroker
+
+
+class FakeDynamoDB:
+    """batch_get_item over a dict; the first `throttle` calls leave half the keys unprocessed."""
+
+    def __init__(self, items, throttle=0):
+        self.items = items
+        self.throttle = throttle
+        self.calls = []
+
+    def batch_get_item(self, RequestItems):
+        (table_name, request), = RequestItems.items()
+        keys = [key["document_id"] for key in request["Keys"]]
+        self.calls.append(keys)
+        unprocessed = []
+        if self.throttle:
+            self.throttle -= 1
+            keys, unprocessed = keys[:len(keys) // 2], keys[len(keys) // 2:]
+        response = {"Responses": {table_name: [self.items[k] for k in keys if k in self.items]}}
+        if unprocessed:
+            response["UnprocessedKeys"] = {table_name: {
+                **request, "Keys": [{"document_id": k} for k in unprocessed]
+            }}
+        return response
+
+
+def items(*ids):
+    return {d: {"document_id": d, "user_id": "alice", "scan_status": "PENDING"} for d in ids}
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(status_cache_module, "STATUS_BATCH_RETRY_BASE_MS", 0)
+
+
+@pytest.mark.anyio
+async def test_reads_misses_in_batches_of_100():
+    ids = [f"doc-{i}" for i in range(150)]
+    dynamodb = FakeDynamoDB(items(*ids[:-1]))
+    cache = StatusCache(table_name="docs", resource=dynamodb)
+
+    result = await cache.get_many(ids)
+
+    assert sorted(len(keys) for keys in dynamodb.calls) == [50, 100]
+    assert result.items[ids[0]]["document_id"] == ids[0]
+    assert result.items[ids[-1]] is None  # doesn't exist
+    assert result.unprocessed == []
+
+
+@pytest.mark.anyio
+async def test_retries_unprocessed_keys():
+    dynamodb = FakeDynamoDB(items("a", "b", "c", "d"), throttle=2)
+    cache = StatusCache(table_name="docs", resource=dynamodb)
+
+    result = await cache.get_many(["a", "b", "c", "d"])
+
+    assert len(dynamodb.calls) == 3
+    assert set(result.items) == {"a", "b", "c", "d"}
+    assert cache.stats()["retries"] == 2
+
+
+@pytest.mark.anyio
+async def test_reports_keys_still_unprocessed_after_retries(monkeypatch):
+    monkeypatch.setattr(status_cache_module, "STATUS_BATCH_MAX_RETRIES", 1)
+    dynamodb = FakeDynamoDB(items("a", "b", "c", "d"), throttle=10)
+    cache = StatusCache(table_name="docs", resource=dynamodb)
+
+    result = await cache.get_many(["a", "b", "c", "d"])
+
+    assert result.unprocessed == ["d"]
+    assert "d" not in result.items
+    assert (await cache.get_many(["d"])).unprocessed == ["d"]  # not cached as missing
+
+
+@pytest.mark.anyio
+async def test_serves_repeats_from_cache_until_invalidated():
+    dynamodb = FakeDynamoDB(items("a"))
+    cache = StatusCache(table_name="docs", resource=dynamodb)
+    broker = StatusBroker()
+    broker.add_listener(cache.on_change)
+
+    await cache.get_many(["a"])
+    await cache.get_many(["a"])
+    assert len(dynamodb.calls) == 1
+    assert cache.stats()["hits"] == 1
+
+    broker.publish({"document_id": "a", "scan_status": "NO_THREATS_FOUND"})
+    await cache.get_many(["a"])
+    assert len(dynamodb.calls) == 2
+
+
+@pytest.mark.anyio
+async def test_entries_expire_after_the_ttl():
+    dynamodb = FakeDynamoDB(items("a"))
+    cache = StatusCache(table_name="docs", resource=dynamodb, ttl_seconds=0)
+
+    await cache.get_many(["a"])
+    await cache.get_many(["a"])
+    assert len(dynamodb.calls) == 2
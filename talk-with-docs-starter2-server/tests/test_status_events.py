@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from app.status_events import (
+    STATUS_WATCH_QUEUE,
+    LocalStatusFeed,
+    StatusBroker,
+    is_final,
+    status_etag,
+    status_view,
+)
+
+
+@pytest.mark.anyio
+async def test_watchers_get_changes_for_their_document_only():
+    broker = StatusBroker()
+    with broker.watch("a") as watch_a, broker.watch("b") as watch_b:
+        broker.publish({"document_id": "a", "scan_status": "NO_THREATS_FOUND"})
+
+        assert (await watch_a.next(1))["scan_status"] == "NO_THREATS_FOUND"
+        assert await watch_b.next(0.01) is None
+    assert broker.stats()["delivered"] == 1
+
+
+@pytest.mark.anyio
+async def test_listeners_see_every_change_without_keeping_the_broker_active():
+    broker = StatusBroker()
+    seen = []
+    broker.add_listener(seen.append)
+
+    broker.publish({"document_id": "a"})
+
+    assert seen == [{"document_id": "a"}]
+    assert not broker.active()
+
+
+@pytest.mark.anyio
+async def test_broker_is_active_while_someone_watches():
+    broker = StatusBroker()
+    waiter = asyncio.ensure_future(broker.wait_for_watchers())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+
+    watch = broker.watch("a")
+    await asyncio.wait_for(waiter, 1)
+    assert broker.active() and broker.watching() == 1
+
+    watch.close()
+    assert not broker.active()
+    assert broker.stats()["connections"] == 0
+
+
+@pytest.mark.anyio
+async def test_slow_watchers_drop_the_oldest_changes():
+    broker = StatusBroker()
+    with broker.watch("a") as watch:
+        for i in range(STATUS_WATCH_QUEUE + 3):
+            broker.publish({"document_id": "a", "n": i})
+        assert (await watch.next(1))["n"] == 3
+
+
+@pytest.mark.anyio
+async def test_local_feed_publishes_and_marks_the_broker_live():
+    broker = StatusBroker()
+    feed = LocalStatusFeed(broker)
+    feed.start()
+    assert broker.live
+
+    with broker.watch("a") as watch:
+        feed.emit({"document_id": "a", "scan_status": "THREATS_FOUND"})
+        assert (await watch.next(1))["scan_status"] == "THREATS_FOUND"
+
+    await feed.stop()
+    assert not broker.live
+
+
+def test_status_view_and_final_states():
+    assert status_view(None) == {"status": "NOT_FOUND"}
+    assert status_view({"document_id": "a", "deleted": True}) == {"status": "NOT_FOUND"}
+
+    view = status_view({"document_id": "a", "user_id": "alice", "scan_status": "PENDING"})
+    assert view["status"] == "PENDING" and view["user_id"] == "alice"
+    assert not is_final(view)
+    assert is_final({**view, "processing_status": "PROMOTED"})
+    assert is_final({"status": "NOT_FOUND"})
+
+    assert status_etag(view) == status_etag(dict(view))
+    assert status_etag(view) != status_etag({**view, "status": "NO_THREATS_FOUND"})
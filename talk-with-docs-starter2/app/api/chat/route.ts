@@ -3,7 +3,7 @@ import { NextRequest } from 'next/server';
 export const runtime = 'edge';
 
 export async function POST(req: NextRequest) {
-  const { prompt, documentId } = await req.json();
+  const { prompt, documentId, sessionId } = await req.json();
 
   // Set up SSE response headers
   const encoder = new TextEncoder();
@@ -23,7 +23,7 @@ export async function POST(req: NextRequest) {
               'Content-Type': 'application/json',
               'Cookie': req.headers.get('cookie') || '',
             },
-            body: JSON.stringify({ prompt, documentId }),
+            body: JSON.stringify({ prompt, documentId, sessionId }),
           });
           
           if (response.body) {
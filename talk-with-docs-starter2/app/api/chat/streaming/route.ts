@@ -22,13 +22,14 @@ export async function POST(req: NextRequest) {
     const cognitoIdToken = req.cookies.get("cognito.id-token")?.value;
   
 
-  const { prompt, documentId } = await req.json();
+  const { prompt, documentId, sessionId } = await req.json();
   const serverUrl = process.env.SERVER_URL!;
   const serverChatUrl = `${serverUrl}/chat`
 
   const secureBody = {
     message: prompt,
     documentId: documentId,
+    sessionId: sessionId,
     userId: userId, // From verified session
   };
 
@@ -61,14 +62,28 @@ export async function POST(req: NextRequest) {
 
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let buffer = "";
 
+        // The server sends SSE frames (`id:`/`event:`/`data:` lines separated by
+        // a blank line). Re-emit each frame's JSON payload as a bare `data:` event.
         while (true) {
           const { done, value } = await reader.read();
           if (done) break;
 
-          const text = decoder.decode(value, { stream: true });
-          
-          controller.enqueue(encoder.encode(`data: ${JSON.stringify({ text })}\n\n`));
+          buffer += decoder.decode(value, { stream: true });
+          const frames = buffer.split("\n\n");
+          buffer = frames.pop() ?? "";
+
+          for (const frame of frames) {
+            const data = frame
+              .split("\n")
+              .filter((line) => line.startsWith("data: "))
+              .map((line) => line.slice(6))
+              .join("\n");
+            if (data) {
+              controller.enqueue(encoder.encode(`data: ${data}\n\n`));
+            }
+          }
         }
       } catch (error) {
         console.error("Error in streaming:", error);
@@ -64,7 +64,7 @@ export function DocumentChat({ documentId, sessionId }: DocumentChatProps) {
     ]);
 
     // Send message to API
-    await sendMessage(prompt, documentId);
+    await sendMessage(prompt, documentId, sessionId);
   };
 
   // Update assistant message with streaming response
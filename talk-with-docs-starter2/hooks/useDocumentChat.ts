@@ -6,7 +6,7 @@ export function useDocumentChat() {
   const [error, setError] = useState<string | null>(null);
   const accumulatedText = useRef('');
 
-  const sendMessage = useCallback(async (prompt: string, documentId: string) => {
+  const sendMessage = useCallback(async (prompt: string, documentId: string, sessionId?: string) => {
     setIsLoading(true);
     setResponse('');
     setError(null);
@@ -18,7 +18,7 @@ export function useDocumentChat() {
         headers: {
           'Content-Type': 'application/json',
         },
-        body: JSON.stringify({ prompt, documentId }),
+        body: JSON.stringify({ prompt, documentId, sessionId }),
       });
 
       if (!res.ok) throw new Error('Failed to send message');